@@ -0,0 +1,32 @@
+import argparse
+
+from common import main, best_of, counter_loop_source, nested_loop_source, parse, prepare, test_programs
+
+
+def report(label: str, code: str, engines, repeat: int, runs: int = 1) -> None:
+    tree = parse(code)
+    print(label)
+    baseline = None
+    for engine in engines:
+        compile_time, execute = best_of(repeat, lambda: prepare(tree, engine))
+        elapsed, _ = best_of(repeat, lambda: [execute() for _ in range(runs)])
+        if baseline is None:
+            baseline = elapsed
+        print(f"  {engine:<8} {elapsed * 1000:10.2f} ms  {baseline / elapsed:6.2f}x"
+              f"  (compilação {compile_time * 1000:.2f} ms)")
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Compara os motores de execução do Arbor")
+    arg_parser.add_argument("--iterations", type=int, default=200000)
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    arg_parser.add_argument("--runs", type=int, default=200, help="execuções por medição dos programas de tests/")
+    arg_parser.add_argument("--engines", nargs="+", default=list(main.ENGINES), choices=main.ENGINES)
+    args = arg_parser.parse_args()
+
+    for name, code in test_programs():
+        report(f"{name} ({args.runs} execuções)", code, args.engines, args.repeat, args.runs)
+    report(f"grow while ({args.iterations} iterações)", counter_loop_source(args.iterations),
+           args.engines, args.repeat)
+    report(f"grow while aninhado ({args.iterations // 100} x 100)",
+           nested_loop_source(args.iterations // 100, 100), args.engines, args.repeat)
@@ -0,0 +1,79 @@
+import argparse
+import random
+import re
+import time
+
+from common import main, synthetic_source
+
+
+def flat_source(size: int) -> str:
+    # Instruções sintéticas no nível superior até chegar a 'size' caracteres
+    statements = 1000
+    while True:
+        code = synthetic_source(statements)
+        if len(code) >= size:
+            return code
+        statements = statements * size // len(code) + 100
+
+
+def nested_source(size: int) -> str:
+    # O mesmo código dentro de um único grow while: toda edição cai no mesmo bloco grande
+    body = "".join(f"    {line}\n" for line in flat_source(size).splitlines())
+    return f"seed rodada = 0\ngrow while rodada < 1 {{\n{body}    rodada = rodada + 1\n}}\nprint rodada\n"
+
+
+def edits(code: str, count: int, rng: random.Random):
+    # Edições de um caractere que mantêm o programa válido: trocar um dígito, ou inserir um
+    # espaço e apagá-lo em seguida
+    digits = [match.start() for match in re.finditer(r"\d", code)]
+    spaces = [match.start() for match in re.finditer(r" ", code)]
+    for _ in range(count):
+        if rng.random() < 0.5:
+            yield rng.choice(digits), 1, str(rng.randrange(10))
+        else:
+            offset = rng.choice(spaces)
+            yield offset, 0, " "
+            yield offset, 1, ""
+
+
+def measure(code: str, count: int, seed: int):
+    start = time.perf_counter()
+    expected = main.Parser().run(code)
+    full = time.perf_counter() - start
+
+    start = time.perf_counter()
+    document = main.IncrementalParser(code)
+    load = time.perf_counter() - start
+
+    times = []
+    reparsed = []
+    for offset, removed, inserted in edits(code, count, random.Random(seed)):
+        start = time.perf_counter()
+        document.edit(offset, removed, inserted)
+        times.append(time.perf_counter() - start)
+        reparsed.append(document.reparsed)
+    expected = main.AstCodec.toBinary(main.Parser().run(document.source))
+    if main.AstCodec.toBinary(document.tree) != expected:
+        raise SystemExit("Erro: a árvore incremental difere da análise completa")
+    return full, load, times, reparsed
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(
+        description="Compara a análise completa com a incremental em edições de um caractere")
+    arg_parser.add_argument("--size", type=int, default=1 << 20, help="tamanho do código em caracteres")
+    arg_parser.add_argument("--edits", type=int, default=200)
+    arg_parser.add_argument("--seed", type=int, default=1)
+    args = arg_parser.parse_args()
+
+    for name, source in (("nível superior", flat_source), ("bloco único", nested_source)):
+        code = source(args.size)
+        full, load, times, reparsed = measure(code, args.edits, args.seed)
+        times.sort()
+        mean = sum(times) / len(times)
+        print(f"{name}: {len(code)} caracteres")
+        print(f"  análise completa   {full * 1000:10.2f} ms")
+        print(f"  carga incremental  {load * 1000:10.2f} ms")
+        print(f"  edição (média)     {mean * 1000:10.3f} ms  ({full / mean:8.0f}x)"
+              f"  p99 {times[int(len(times) * 0.99)] * 1000:8.3f} ms"
+              f"  reanalisados {sum(reparsed) / len(reparsed):8.1f} caracteres")
@@ -0,0 +1,63 @@
+import argparse
+
+from common import best_of, counter_loop_source, main, nested_loop_source, parse, prepare
+
+
+class LastValueSink:
+    # Guarda só o último valor impresso, para conferir que as duas versões calculam o mesmo resultado
+    def __init__(self):
+        self.value = None
+
+    def write(self, value) -> None:
+        self.value = value
+
+    def flush(self) -> None:
+        pass
+
+
+def inclusive_loop_source(iterations: int) -> str:
+    # Limite numa variável, comparação inclusiva e passo maior que 1
+    return (
+        "seed i = 0\n"
+        f"seed n = {iterations * 3}\n"
+        "seed total = 0\n"
+        "grow while i <= n {\n"
+        "    total = total + i\n"
+        "    i = i + 3\n"
+        "}\n"
+        "print total + i\n"
+    )
+
+
+def measure(code: str, engine: str, repeat: int, counted: bool):
+    main.COUNTED_LOOPS = counted
+    sink = LastValueSink()
+    run = prepare(parse(code), engine, sink)
+    elapsed, _ = best_of(repeat, run)
+    return elapsed, sink.value
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(
+        description="Compara grow while contadores executados como range com o loop genérico")
+    arg_parser.add_argument("--iterations", type=int, default=200000)
+    arg_parser.add_argument("--engines", choices=main.ENGINES, nargs="+", default=list(main.ENGINES))
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    args = arg_parser.parse_args()
+
+    side = max(1, int(args.iterations ** 0.5))
+    shapes = [
+        ("grow while i < N", counter_loop_source(args.iterations), args.iterations),
+        ("grow while i <= n, passo 3", inclusive_loop_source(args.iterations), args.iterations + 1),
+        (f"aninhado ({side} x {side})", nested_loop_source(side, side), side * side),
+    ]
+    for name, code, iterations in shapes:
+        print(name)
+        for engine in args.engines:
+            generic_time, expected = measure(code, engine, args.repeat, False)
+            counted_time, result = measure(code, engine, args.repeat, True)
+            if result != expected:
+                raise SystemExit(f"Erro: {engine} calculou {result} com range, {expected} no loop genérico")
+            print(f"  {engine:<8} genérico {iterations / generic_time:14,.0f} iterações/s"
+                  f"   range {iterations / counted_time:14,.0f} iterações/s  ({generic_time / counted_time:5.2f}x)")
+    main.COUNTED_LOOPS = True
@@ -0,0 +1,55 @@
+import argparse
+import gc
+import time
+import tracemalloc
+
+from common import main, synthetic_source
+from legacy_lexer import materialize
+
+
+def allocated(build):
+    # Memória ainda alocada pelo resultado de build() e o tempo gasto para construí-lo
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size, elapsed
+
+
+def report(statements: int) -> None:
+    code = synthetic_source(statements)
+    tokens = main.Lexer.tokenize(code)
+    _, token_size, _ = allocated(lambda: materialize(tokens))
+    tree, tree_size, _ = allocated(lambda: main.Parser().run(code))
+    nodes = main.count_nodes(tree)
+    del tree
+
+    def check():
+        tree = main.Parser().run(code)
+        main.Resolver().run(tree)
+        main.TypeChecker().run(tree)
+        return tree
+
+    start = time.perf_counter()
+    tree = check()
+    analysis = time.perf_counter() - start
+    start = time.perf_counter()
+    main.execute(tree, main.Frame(tree.layout, runtime=main.Runtime(main.CaptureSink())))
+    execution = time.perf_counter() - start
+
+    print(f"{statements} instruções, {nodes} nós, {len(tokens)} tokens")
+    print(f"  árvore        {tree_size / 2 ** 20:8.2f} MiB  ({tree_size / nodes:6.1f} bytes/nó)")
+    print(f"  tokens        {token_size / 2 ** 20:8.2f} MiB  ({token_size / len(tokens):6.1f} bytes/token)")
+    print(f"  análise       {analysis * 1000:8.2f} ms  (parser, resolução e tipos)")
+    print(f"  execução      {execution * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Mede a memória da AST do Arbor em programas grandes")
+    arg_parser.add_argument("--statements", type=int, nargs="+", default=[10000, 100000])
+    args = arg_parser.parse_args()
+    for statements in args.statements:
+        report(statements)
@@ -0,0 +1,52 @@
+import argparse
+import time
+
+from common import main, nested_branch_source, nested_while_source
+
+
+def parentheses_source(depth: int) -> str:
+    return f"print {'(' * depth}1 + 2{')' * depth}\n"
+
+
+def sum_chain_source(depth: int) -> str:
+    return f"seed s = 0\ns = {' + '.join(['1'] * depth)}\nprint s\n"
+
+
+SHAPES = {
+    "branch aninhado": nested_branch_source,
+    "grow while aninhado": nested_while_source,
+    "parênteses": parentheses_source,
+    "soma encadeada": sum_chain_source,
+}
+
+
+def measure(code: str):
+    start = time.perf_counter()
+    tree = main.Parser().run(code)
+    parsed = time.perf_counter()
+    main.Resolver().run(tree)
+    main.TypeChecker().run(tree)
+    checked = time.perf_counter()
+    sink = main.CaptureSink()
+    main.execute(tree, main.Frame(tree.layout, runtime=main.Runtime(sink)))
+    executed = time.perf_counter()
+    return parsed - start, checked - parsed, executed - checked
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Mede programas com aninhamento profundo no Arbor")
+    arg_parser.add_argument("--depths", type=int, nargs="+", default=[1000, 10000, 50000])
+    arg_parser.add_argument("--explicit-only", action="store_true",
+                            help="avalia todos os nós com a pilha explícita (SHALLOW_HEIGHT = 0)")
+    args = arg_parser.parse_args()
+    if args.explicit_only:
+        main.SHALLOW_HEIGHT = 0
+
+    for name, source in SHAPES.items():
+        print(name)
+        for depth in args.depths:
+            parse_time, check_time, run_time = measure(source(depth))
+            total = parse_time + check_time + run_time
+            print(f"  profundidade {depth:>7}  análise {parse_time * 1000:9.2f} ms"
+                  f"  resolução {check_time * 1000:9.2f} ms  execução {run_time * 1000:9.2f} ms"
+                  f"  ({total / depth * 1e6:.2f} µs/nível)")
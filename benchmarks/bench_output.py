@@ -0,0 +1,50 @@
+import argparse
+import contextlib
+import os
+import sys
+import tempfile
+
+from common import main, best_of, parse, prepare, print_loop_source
+
+
+def sinks(directory: str):
+    # Cada destino escreve em um arquivo real; "print" é o comportamento anterior (print() por valor)
+    text = open(os.path.join(directory, "saida.txt"), "w")
+    binary = open(os.path.join(directory, "saida.bin"), "wb")
+    return text, binary, [
+        ("print", main.PrintSink()),
+        ("buffer", main.BufferedSink(text)),
+        ("binary", main.BinarySink(binary)),
+        ("capture", main.CaptureSink()),
+    ]
+
+
+def report(label: str, code: str, engines, repeat: int) -> None:
+    tree = parse(code)
+    print(label)
+    console = sys.stdout
+    with tempfile.TemporaryDirectory() as directory:
+        text, binary, destinations = sinks(directory)
+        with text, binary, contextlib.redirect_stdout(text):
+            for engine in engines:
+                baseline = None
+                for name, sink in destinations:
+                    execute = prepare(tree, engine, sink)
+                    elapsed, _ = best_of(repeat, execute)
+                    if isinstance(sink, main.CaptureSink):
+                        sink.parts.clear()
+                    if baseline is None:
+                        baseline = elapsed
+                    print(f"  {engine:<8} {name:<8} {elapsed * 1000:10.2f} ms  {baseline / elapsed:6.2f}x",
+                          file=console)
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Compara os destinos de saída do print no Arbor")
+    arg_parser.add_argument("--iterations", type=int, default=100000)
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    arg_parser.add_argument("--engines", nargs="+", default=list(main.ENGINES), choices=main.ENGINES)
+    args = arg_parser.parse_args()
+
+    report(f"print em loop ({args.iterations} iterações, {2 * args.iterations} linhas)",
+           print_loop_source(args.iterations), args.engines, args.repeat)
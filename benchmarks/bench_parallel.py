@@ -0,0 +1,57 @@
+import argparse
+import os
+
+from common import best_of, main, parse
+
+
+def work_source(items: int, inner: int) -> str:
+    # Corpo independente e custoso: cada item lê só variáveis de fora e imprime um resultado
+    return (
+        "seed factor = 3\n"
+        f"grow x in range(0, {items}) {{\n"
+        "    seed acc = 0\n"
+        "    seed j = 0\n"
+        f"    grow while j < {inner} {{\n"
+        "        acc = acc + (x * factor + j) / 7\n"
+        "        j = j + 1\n"
+        "    }\n"
+        "    print acc\n"
+        "}\n"
+    )
+
+
+def measure(tree, engine: str, jobs: int, repeat: int):
+    runtime = main.Runtime(main.CaptureSink(), jobs)
+    program = main.compile_program(tree, engine)
+
+    def run():
+        runtime.output = main.CaptureSink()
+        program(main.Frame(tree.layout, runtime=runtime))
+        return runtime.output.getvalue()
+    try:
+        # A primeira execução cria o pool de processos, que fica fora da medida
+        run()
+        return best_of(repeat, run)
+    finally:
+        runtime.close()
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(
+        description="Compara um loop 'grow in' com iterações independentes em 1 e em N processos")
+    arg_parser.add_argument("--items", type=int, default=2000)
+    arg_parser.add_argument("--inner", type=int, default=500, help="iterações do laço interno de cada item")
+    arg_parser.add_argument("--jobs", type=int, nargs="+", default=[2, os.cpu_count() or 1])
+    arg_parser.add_argument("--engine", choices=("tree", "closure"), default="tree")
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    tree = parse(work_source(args.items, args.inner))
+    serial_time, expected = measure(tree, args.engine, 1, args.repeat)
+    print(f"{args.items} itens x {args.inner} iterações, motor {args.engine}")
+    print(f"  {'1 processo':<12} {serial_time * 1000:10.2f} ms")
+    for jobs in sorted(set(args.jobs) - {1}):
+        elapsed, output = measure(tree, args.engine, jobs, args.repeat)
+        if output != expected:
+            raise SystemExit(f"Erro: a saída com {jobs} processos difere da execução em 1 processo")
+        print(f"  {f'{jobs} processos':<12} {elapsed * 1000:10.2f} ms  ({serial_time / elapsed:5.2f}x)")
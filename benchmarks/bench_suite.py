@@ -0,0 +1,193 @@
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from common import (ROOT, main, concat_loop_source, counter_loop_source, list_literal_source,
+                    nested_branch_source, nested_loop_source, prepare, range_loop_source, synthetic_source,
+                    test_programs)
+
+FORMAT = "arbor-bench"
+VERSION = 1
+# Comentários e tabulações são tratados pelo próprio Lexer, dentro da tokenização
+PHASES = ("tokenize", "parse", "resolve", "evaluate")
+
+
+class DiscardSink:
+    # Destino do print que descarta a saída, para medir só a execução
+    def write(self, value) -> None:
+        pass
+
+    def flush(self) -> None:
+        pass
+
+
+def workloads(scale: float):
+    # (nome, código) dos programas de tests/ e das cargas sintéticas; 'scale' multiplica os tamanhos
+    size = lambda base: max(1, int(base * scale))
+    for name, code in test_programs():
+        yield name, code
+    yield f"grow while ({size(100000)} iterações)", counter_loop_source(size(100000))
+    yield f"grow in range ({size(100000)} iterações)", range_loop_source(size(100000))
+    yield f"grow while aninhado ({size(300)} x 300)", nested_loop_source(size(300), 300)
+    yield f"lista literal ({size(50000)} elementos)", list_literal_source(size(50000))
+    yield f"concatenação ({size(20000)} iterações)", concat_loop_source(size(20000))
+    yield f"branch aninhado ({size(5000)} níveis)", nested_branch_source(size(5000))
+    yield f"programa grande ({size(5000)} instruções)", synthetic_source(size(5000))
+
+
+def pipeline(code: str, engine: str):
+    # Cada fase recebe a saída da anterior; devolve uma função por fase, na ordem de PHASES
+    state = {}
+
+    def tokenize():
+        state["tokens"] = main.Lexer.tokenize(code)
+
+    def parse():
+        state["tree"] = main.Parser().parseTokens(state["tokens"])
+
+    def resolve():
+        main.Resolver().run(state["tree"])
+        main.TypeChecker().run(state["tree"])
+        state["run"] = prepare(state["tree"], engine, DiscardSink())
+
+    def evaluate():
+        state["run"]()
+
+    return state, (tokenize, parse, resolve, evaluate)
+
+
+def measure(code: str, engine: str, repeat: int) -> dict:
+    times = {phase: [] for phase in PHASES}
+    for _ in range(repeat):
+        # O Resolver e o TypeChecker alteram a árvore; cada repetição parte do código-fonte
+        state, steps = pipeline(code, engine)
+        for phase, step in zip(PHASES, steps):
+            start = time.perf_counter()
+            step()
+            times[phase].append(time.perf_counter() - start)
+
+    # Pico de memória de cada fase numa execução separada, já que o tracemalloc a deixa mais lenta
+    state, steps = pipeline(code, engine)
+    peaks = {}
+    tracemalloc.start()
+    for phase, step in zip(PHASES, steps):
+        base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        step()
+        peaks[phase] = tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+
+    tokens = len(state["tokens"])
+    nodes = main.count_nodes(state["tree"])
+    # Quantidade processada por fase para a vazão; a execução é medida só em tempo
+    amounts = {"tokenize": (len(code), "caracteres"), "parse": (tokens, "tokens"), "resolve": (nodes, "nós"),
+               "evaluate": (None, None)}
+    phases = {}
+    for phase in PHASES:
+        best = min(times[phase])
+        amount, unit = amounts[phase]
+        phases[phase] = {
+            "best_ms": best * 1000,
+            "median_ms": statistics.median(times[phase]) * 1000,
+            "throughput": amount / best if amount is not None and best > 0 else None,
+            "unit": unit,
+            "peak_kib": peaks[phase] / 1024,
+        }
+    return {"characters": len(code), "tokens": tokens, "nodes": nodes, "phases": phases}
+
+
+def commit() -> str | None:
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+def show(name: str, result: dict) -> None:
+    print(f"{name}: {result['characters']} caracteres, {result['tokens']} tokens, {result['nodes']} nós")
+    for phase, data in result["phases"].items():
+        rate = f"{data['throughput']:14,.0f} {data['unit']}/s" if data["throughput"] else " " * 24
+        print(f"  {phase:<10} {data['best_ms']:10.2f} ms  (mediana {data['median_ms']:10.2f} ms)"
+              f"  {rate}  pico {data['peak_kib']:10.1f} KiB")
+
+
+def compare(results: dict, previous: dict, threshold: float, min_ms: float) -> bool:
+    # Compara o melhor tempo de cada fase com uma execução anterior; True se alguma piorou além do
+    # limite. Fases mais rápidas que min_ms nas duas execuções ficam de fora, pois são só ruído
+    regressed = False
+    print(f"\nComparação com {previous.get('commit') or 'execução anterior'} ({previous['timestamp']}):")
+    for name, result in results.items():
+        old = previous["workloads"].get(name)
+        if old is None:
+            continue
+        for phase, data in result["phases"].items():
+            before = old["phases"].get(phase, {}).get("best_ms")
+            if not before or max(before, data["best_ms"]) < min_ms:
+                continue
+            ratio = data["best_ms"] / before
+            mark = ""
+            if ratio > 1 + threshold:
+                mark = "  <- regressão"
+                regressed = True
+            print(f"  {name} / {phase:<10} {before:10.2f} -> {data['best_ms']:10.2f} ms  {ratio:5.2f}x{mark}")
+    return regressed
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(
+        description="Mede o tempo de cada fase do Arbor (tokenização, parser, resolução e execução) "
+                    "nos programas de tests/ e em cargas sintéticas")
+    arg_parser.add_argument("--engine", choices=main.ENGINES, default="tree")
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    arg_parser.add_argument("--scale", type=float, default=1.0, help="multiplica o tamanho das cargas sintéticas")
+    arg_parser.add_argument("--filter", metavar="TEXTO", help="mede só as cargas cujo nome contém TEXTO")
+    arg_parser.add_argument("--output", metavar="ARQUIVO", help="grava os resultados em JSON")
+    arg_parser.add_argument("--compare", metavar="ARQUIVO",
+                            help="compara com resultados gravados por --output; termina com código 1 "
+                                 "se alguma fase ficar mais lenta que --threshold")
+    arg_parser.add_argument("--threshold", type=float, default=0.10, help="piora tolerada (padrão: 0.10)")
+    arg_parser.add_argument("--min-ms", type=float, default=1.0,
+                            help="fases mais rápidas que isso não são comparadas (padrão: 1 ms)")
+    args = arg_parser.parse_args()
+
+    results = {}
+    for name, code in workloads(args.scale):
+        if args.filter and args.filter not in name:
+            continue
+        try:
+            results[name] = measure(code, args.engine, args.repeat)
+        except RecursionError:
+            # Só o motor tree executa aninhamentos profundos
+            print(f"{name}: ignorado, aninhamento profundo demais para o motor {args.engine}")
+            continue
+        show(name, results[name])
+
+    report = {
+        "format": FORMAT,
+        "version": VERSION,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "engine": args.engine,
+        "repeat": args.repeat,
+        "scale": args.scale,
+        "workloads": results,
+    }
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+    if args.compare:
+        with open(args.compare, "r") as file:
+            previous = json.load(file)
+        if previous.get("format") != FORMAT:
+            sys.exit(f"Erro: '{args.compare}' não é um resultado de bench_suite.py")
+        if compare(results, previous, args.threshold, args.min_ms):
+            sys.exit(1)
@@ -0,0 +1,82 @@
+import argparse
+import gc
+import os
+import tempfile
+import tracemalloc
+
+from common import main, best_of, synthetic_source, test_programs
+from legacy_lexer import PrePro, Tokenizer
+
+
+def run_tokenizer(code: str) -> int:
+    tokenizer = Tokenizer(code)
+    count = 1
+    while tokenizer.next.type != "EOF":
+        tokenizer.selectNext()
+        count += 1
+    return count
+
+
+def run_lexer(code: str) -> int:
+    return len(main.Lexer.tokenize(code))
+
+
+def report(label: str, code: str, repeat: int) -> None:
+    old_time, old_count = best_of(repeat, lambda: run_tokenizer(code))
+    new_time, new_count = best_of(repeat, lambda: run_lexer(code))
+    if old_count != new_count:
+        raise SystemExit(f"{label}: contagem de tokens diverge ({old_count} vs {new_count})")
+    print(f"{label}: {new_count} tokens, {len(code)} caracteres")
+    print(f"  Tokenizer  {old_count / old_time:14,.0f} tokens/s  ({old_time * 1000:.2f} ms)")
+    print(f"  Lexer      {new_count / new_time:14,.0f} tokens/s  ({new_time * 1000:.2f} ms)")
+    print(f"  ganho      {old_time / new_time:.2f}x")
+
+
+def read_text(path: str):
+    # Caminho antigo: o arquivo inteiro como string, filtrado pelo PrePro antes do Lexer
+    with open(path, "r") as file:
+        return main.Lexer.tokenize(PrePro.filter(file.read()))
+
+
+def read_mapped(path: str):
+    with open(path, "rb") as file:
+        return main.Lexer.tokenize(main.map_source(file))
+
+
+def file_report(megabytes: int, repeat: int) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "grande.arbor")
+        block = synthetic_source(20000)
+        with open(path, "w") as file:
+            for _ in range(max(1, megabytes * 2 ** 20 // len(block))):
+                file.write(block)
+        print(f"arquivo de {os.path.getsize(path) / 2 ** 20:.1f} MiB")
+        for label, load in (("texto + PrePro", read_text), ("mmap", read_mapped)):
+            elapsed, tokens = best_of(repeat, lambda: load(path))
+            count = len(tokens)
+            del tokens
+            # Pico numa execução separada, já que o tracemalloc deixa tudo mais lento
+            gc.collect()
+            tracemalloc.start()
+            tokens = load(path)
+            retained, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            del tokens
+            print(f"  {label:<15} {elapsed:8.2f} s  {count:12,} tokens  pico {peak / 2 ** 20:9.1f} MiB"
+                  f"  (tokens {retained / 2 ** 20:9.1f} MiB)")
+        print("  as páginas mapeadas pelo mmap não entram no pico, que mede só a memória alocada pelo Python")
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Compara o Tokenizer legado com o Lexer de passada única")
+    arg_parser.add_argument("--statements", type=int, default=20000, help="tamanho do programa sintético")
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    arg_parser.add_argument("--file-mb", type=int, metavar="MB",
+                            help="também tokeniza um arquivo gerado com esse tamanho, lido como texto e via mmap")
+    args = arg_parser.parse_args()
+
+    tests_code = "\n".join(PrePro.filter(code) for _, code in test_programs())
+    report("tests/*.arbor", tests_code, args.repeat)
+    report("sintético", PrePro.filter(synthetic_source(args.statements)), args.repeat)
+    if args.file_mb:
+        file_report(args.file_mb, args.repeat)
@@ -0,0 +1,68 @@
+import argparse
+
+from common import best_of, main, parse, prepare
+
+
+class LastValueSink:
+    # Guarda só o último valor impresso, para conferir que as versões calculam o mesmo resultado
+    def __init__(self):
+        self.value = None
+
+    def write(self, value) -> None:
+        self.value = value
+
+    def flush(self) -> None:
+        pass
+
+
+def vector_source(size: int) -> str:
+    first = ", ".join(str(i) for i in range(size))
+    second = ", ".join(str(i + 1) for i in range(size))
+    return (
+        f"seed a = [{first}]\n"
+        f"seed b = [{second}]\n"
+        "print sum((a * b + a) / b - a)\n"
+    )
+
+
+def scalar_source(size: int) -> str:
+    # O mesmo cálculo elemento a elemento com um grow in
+    return (
+        "seed total = 0\n"
+        f"grow i in range(0, {size}) {{\n"
+        "    total = total + ((i * (i + 1) + i) / (i + 1) - i)\n"
+        "}\n"
+        "print total\n"
+    )
+
+
+def measure(code: str, engine: str, repeat: int):
+    sink = LastValueSink()
+    run = prepare(parse(code), engine, sink)
+    elapsed, _ = best_of(repeat, run)
+    return elapsed, sink.value
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(
+        description="Compara operações elemento a elemento entre listas com o laço escalar equivalente")
+    arg_parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 100000])
+    arg_parser.add_argument("--engine", choices=main.ENGINES, default="tree")
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    args = arg_parser.parse_args()
+
+    numpy = main.numpy_module()
+    if numpy is None:
+        print("NumPy não instalado: as listas usam só o caminho em Python")
+    for size in args.sizes:
+        print(f"{size} elementos")
+        scalar_time, expected = measure(scalar_source(size), args.engine, args.repeat)
+        print(f"  laço escalar     {scalar_time * 1000:10.2f} ms")
+        modes = [("listas (Python)", False)] + ([("listas (NumPy)", True)] if numpy is not None else [])
+        for name, vectorize in modes:
+            main.VECTORIZE = vectorize
+            elapsed, result = measure(vector_source(size), args.engine, args.repeat)
+            if result != expected:
+                raise SystemExit(f"Erro: {name} calculou {result}, o laço escalar {expected}")
+            print(f"  {name:<16} {elapsed * 1000:10.2f} ms  ({scalar_time / elapsed:5.2f}x)")
+        main.VECTORIZE = True
@@ -0,0 +1,177 @@
+import contextlib
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TESTS_DIR = os.path.join(ROOT, "tests")
+sys.path.insert(0, ROOT)
+
+import main  # noqa: E402
+
+
+def test_programs():
+    names = sorted(name for name in os.listdir(TESTS_DIR) if name.endswith(".arbor"))
+    programs = []
+    for name in names:
+        with open(os.path.join(TESTS_DIR, name), "r") as file:
+            programs.append((name, file.read()))
+    return programs
+
+
+def synthetic_source(statements: int) -> str:
+    # Programa sintético com declarações, expressões, condicionais, listas e loops
+    lines = ["seed v0 = 0"]
+    for i in range(1, statements + 1):
+        kind = i % 4
+        if kind == 0:
+            lines.append(f"seed v{i} = (v{i - 1} + {i}) * 3 - {i} / 2  // comentário {i}")
+        elif kind == 1:
+            lines.append(f"seed v{i} = v{i - 1}")
+            lines.append(f"branch v{i} >= {i} then {{")
+            lines.append(f'\tprint "valor {i}"')
+            lines.append("} else {")
+            lines.append(f"\tv{i} = v{i} + 1")
+            lines.append("}")
+        elif kind == 2:
+            lines.append(f"seed v{i} = [{i}, {i + 1}, \"x{i}\", v{i - 1}]")
+        else:
+            lines.append(f"seed v{i} = {i}")
+            lines.append(f"grow while v{i} < {i + 2} {{")
+            lines.append(f"    v{i} = v{i} + 1")
+            lines.append("}")
+    return "\n".join(lines) + "\n"
+
+
+def best_of(repeat: int, func):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, result
+
+
+def counter_loop_source(iterations: int) -> str:
+    return (
+        "seed i = 0\n"
+        "seed total = 0\n"
+        f"grow while i < {iterations} {{\n"
+        "    total = total + i * 2\n"
+        "    i = i + 1\n"
+        "}\n"
+        "print total\n"
+    )
+
+
+def range_loop_source(iterations: int) -> str:
+    return (
+        "seed total = 0\n"
+        f"grow i in range(0, {iterations}) {{\n"
+        "    total = total + i * 2\n"
+        "}\n"
+        "print total\n"
+    )
+
+
+def nested_loop_source(outer: int, inner: int) -> str:
+    return (
+        "seed i = 0\n"
+        "seed total = 0\n"
+        f"grow while i < {outer} {{\n"
+        "    seed j = 0\n"
+        f"    grow while j < {inner} {{\n"
+        "        total = total + i - j\n"
+        "        j = j + 1\n"
+        "    }\n"
+        "    i = i + 1\n"
+        "}\n"
+        "print total\n"
+    )
+
+
+def print_loop_source(iterations: int) -> str:
+    return (
+        "seed i = 0\n"
+        f"grow while i < {iterations} {{\n"
+        "    print i\n"
+        "    print \"linha de saída\"\n"
+        "    i = i + 1\n"
+        "}\n"
+    )
+
+
+def list_literal_source(elements: int) -> str:
+    # Uma lista literal grande, percorrida e somada com grow in
+    values = ", ".join(str(i) for i in range(elements))
+    return (
+        f"seed values = [{values}]\n"
+        "seed total = 0\n"
+        "grow v in values {\n"
+        "    total = total + v\n"
+        "}\n"
+        "print total\n"
+    )
+
+
+def concat_loop_source(iterations: int) -> str:
+    return (
+        "seed i = 0\n"
+        "seed text = \"\"\n"
+        f"grow while i < {iterations} {{\n"
+        "    text = text + \"ab\"\n"
+        "    i = i + 1\n"
+        "}\n"
+        "print text\n"
+    )
+
+
+def nested_branch_source(depth: int) -> str:
+    opening = "".join(f"branch x < {level + 1} then {{\n" for level in range(depth))
+    return f"seed x = 0\n{opening}x = x + 1\n" + "}\n" * depth + "print x\n"
+
+
+def nested_while_source(depth: int) -> str:
+    # Os corpos não declaram nada, então todos os loops compartilham o escopo global
+    opening = "".join(f"grow while i < {level + 1} {{\n" for level in range(depth))
+    return f"seed i = 0\n{opening}i = i + 1\n" + "}\n" * depth + "print i\n"
+
+
+def parse(code: str):
+    tree = main.Parser().run(code)
+    main.Resolver().run(tree)
+    main.TypeChecker().run(tree)
+    return tree
+
+
+def prepare(tree, engine: str, sink=None):
+    # Compila uma vez; a função devolvida executa o programa com a saída descartada,
+    # ou escrita em 'sink' quando um destino é informado
+    runtime = lambda: main.Runtime(sink)
+    if engine == "vm":
+        code = main.Compiler().compile(tree)
+        run = lambda: main.VM().run(code, main.Frame(code.layout, runtime=runtime()))
+    elif engine == "closure":
+        program = main.ClosureCompiler().compile(tree)
+        run = lambda: program(main.Frame(tree.layout, runtime=runtime()))
+    elif engine == "python":
+        program = main.Transpiler().compile(tree)
+        run = lambda: program(sink.write) if sink is not None else program()
+    else:
+        run = lambda: main.execute(tree, main.Frame(tree.layout, runtime=runtime()))
+
+    def execute():
+        if sink is not None:
+            run()
+            sink.flush()
+            return
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            run()
+    return execute
+
+
+def execute(tree, engine: str) -> None:
+    prepare(tree, engine)()
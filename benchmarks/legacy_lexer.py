@@ -0,0 +1,150 @@
+# Pré-processador e tokenizador caractere a caractere que o interpretador usava antes do Lexer de
+# passada única; ficam aqui só como base de comparação dos benchmarks
+import re
+from typing import Any
+
+from common import main
+
+
+class PrePro:
+    # Usado com o Tokenizer legado; o Lexer já ignora comentários e tabulações por conta própria
+    @staticmethod
+    def filter(code: str) -> str:
+        filtered = re.sub(r'//.*$', '', code, flags=re.MULTILINE)
+        filtered = re.sub(r'[\t]+', ' ', filtered).rstrip()
+        return filtered
+
+
+class Token:
+    __slots__ = ("type", "value")
+
+    def __init__(self, type: str, value: Any):
+        self.type = type
+        self.value = value
+
+
+class Tokenizer:
+    def __init__(self, source: str, position: int = 0):
+        self.source = source
+        self.position = position
+        self.next: Token | None = None
+        self.selectNext()
+
+    def selectNext(self) -> None:
+        while self.position < len(self.source) and self.source[self.position].isspace() and self.source[self.position] != '\n':
+            self.position += 1
+
+        if self.position >= len(self.source):
+            self.next = Token("EOF", None)
+            return
+
+        token = self.source[self.position]
+        if token.isdigit():
+            result = ""
+            while self.position < len(self.source) and self.source[self.position].isdigit():
+                result += self.source[self.position]
+                self.position += 1
+            self.next = Token("NUMBER", int(result))
+        elif token == '+':
+            self.next = Token("PLUS", 0)
+            self.position += 1
+        elif token == '-':
+            self.next = Token("MINUS", 0)
+            self.position += 1
+        elif token == '*':
+            self.next = Token("MULT", 0)
+            self.position += 1
+        elif token == '/':
+            self.next = Token("DIV", 0)
+            self.position += 1
+        elif token == '(':
+            self.next = Token("LPAREN", 0)
+            self.position += 1
+        elif token == ')':
+            self.next = Token("RPAREN", 0)
+            self.position += 1
+        elif token == '{':
+            self.next = Token("LBRACE", 0)
+            self.position += 1
+        elif token == '}':
+            self.next = Token("RBRACE", 0)
+            self.position += 1
+        elif token == '[':
+            self.next = Token("LBRACKET", 0)
+            self.position += 1
+        elif token == ']':
+            self.next = Token("RBRACKET", 0)
+            self.position += 1
+        elif token == ',':
+            self.next = Token("COMMA", 0)
+            self.position += 1
+        elif token == '>':
+            if self.position + 1 < len(self.source) and self.source[self.position + 1] == '=':
+                self.next = Token("GE", 0)
+                self.position += 2
+            else:
+                self.next = Token("GT", 0)
+                self.position += 1
+        elif token == '<':
+            if self.position + 1 < len(self.source) and self.source[self.position + 1] == '=':
+                self.next = Token("LE", 0)
+                self.position += 2
+            else:
+                self.next = Token("LT", 0)
+                self.position += 1
+        elif token == '=':
+            if self.position + 1 < len(self.source) and self.source[self.position + 1] == '=':
+                self.next = Token("EQ", 0)
+                self.position += 2
+            else:
+                self.next = Token("ASSIGN", 0)
+                self.position += 1
+        elif token == '!':
+            if self.position + 1 < len(self.source) and self.source[self.position + 1] == '=':
+                self.next = Token("NE", 0)
+                self.position += 2
+            else:
+                raise ValueError(f"Token inválido: {token}")
+        elif token == '"':
+            self.position += 1
+            result = ""
+            while self.position < len(self.source) and self.source[self.position] != '"':
+                result += self.source[self.position]
+                self.position += 1
+            if self.position >= len(self.source):
+                raise ValueError("String literal não terminada")
+            self.next = Token("STRING", result)
+            self.position += 1
+        elif token == '\n':
+            self.next = Token("NEWLINE", 0)
+            self.position += 1
+        elif token.isalpha() or token == '_':
+            result = ""
+            while self.position < len(self.source) and (self.source[self.position].isalnum() or self.source[self.position] == '_'):
+                result += self.source[self.position]
+                self.position += 1
+            if result == "seed":
+                self.next = Token("SEED", 0)
+            elif result == "branch":
+                self.next = Token("BRANCH", 0)
+            elif result == "then":
+                self.next = Token("THEN", 0)
+            elif result == "else":
+                self.next = Token("ELSE", 0)
+            elif result == "grow":
+                self.next = Token("GROW", 0)
+            elif result == "while":
+                self.next = Token("WHILE", 0)
+            elif result == "in":
+                self.next = Token("IN", 0)
+            elif result == "print":
+                self.next = Token("PRINT", 0)
+            else:
+                self.next = Token("IDENTIFIER", result)
+        else:
+            raise ValueError(f"Token inválido: {token}")
+
+
+def materialize(tokens: main.TokenArray) -> list:
+    # Um objeto Token por token, como o Tokenizer produzia, a partir dos arrays do Lexer
+    return [Token(main.TOKEN_NAMES[kind], value) for kind, value in zip(tokens.types, tokens.values)]
@@ -1,20 +1,32 @@
 import sys
+import io
+import os
 import re
-from typing import Any, Tuple, List
-
-# Pré-processador
-class PrePro:
-    @staticmethod
-    def filter(code: str) -> str:
-        filtered = re.sub(r'//.*$', '', code, flags=re.MULTILINE)
-        filtered = re.sub(r'[\t]+', ' ', filtered).rstrip()
-        return filtered
+import gc
+import hashlib
+import hmac
+import json
+import mmap
+import pickle
+import tempfile
+import time
+import tracemalloc
+import argparse
+import operator
+from array import array
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from functools import partial
+from itertools import accumulate
+from bisect import bisect_left, bisect_right
+from typing import Any, Callable, Iterable, Iterator, Tuple, List
 
 # Tabela de Símbolos
 class SymbolTable:
-    def __init__(self, parent: 'SymbolTable' = None):
+    def __init__(self, parent: 'SymbolTable' = None, runtime: 'Runtime' = None):
         self.parent = parent
         self.table = {}
+        self.runtime = parent.runtime if parent is not None else runtime or Runtime()
 
     def create(self, key: str, value: Any = None):
         if key in self.table:
@@ -38,81 +50,598 @@ class SymbolTable:
             current = current.parent
         raise ValueError(f"Variável '{key}' não definida")
 
+    def child(self, layout: 'FrameLayout' = None) -> 'SymbolTable':
+        return SymbolTable(parent=self)
+
+# Marca de slot ainda não declarado; preserva a identidade ao ser serializada
+class Undefined:
+    def __repr__(self) -> str:
+        return "UNDEFINED"
+
+    def __reduce__(self) -> str:
+        return "UNDEFINED"
+
+UNDEFINED = Undefined()
+
+# Disposição estática de um escopo: nome -> índice do slot
+class FrameLayout:
+    def __init__(self):
+        self.names = {}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def slot(self, name: str) -> int:
+        if name not in self.names:
+            self.names[name] = len(self.names)
+        return self.names[name]
+
+# Escopo em tempo de execução para árvores resolvidas: um vetor de slots por escopo.
+# Os acessos por nome existem para identificadores que só podem ser resolvidos dinamicamente.
+class Frame:
+    __slots__ = ("layout", "slots", "parent", "runtime")
+
+    def __init__(self, layout: FrameLayout, parent: 'Frame' = None, runtime: 'Runtime' = None):
+        self.layout = layout
+        self.slots = [UNDEFINED] * len(layout.names)
+        self.parent = parent
+        self.runtime = parent.runtime if parent is not None else runtime or Runtime()
+
+    def child(self, layout: FrameLayout) -> 'Frame':
+        return Frame(layout, self)
+
+    def grow(self) -> None:
+        # Acompanha o layout quando ele ganha nomes depois da criação do frame (modo streaming)
+        missing = len(self.layout.names) - len(self.slots)
+        if missing > 0:
+            self.slots.extend([UNDEFINED] * missing)
+
+    def load(self, depth: int, slot: int) -> Any:
+        frame = self
+        for _ in range(depth):
+            frame = frame.parent
+        return frame.slots[slot]
+
+    def store(self, depth: int, slot: int, value: Any) -> None:
+        frame = self
+        for _ in range(depth):
+            frame = frame.parent
+        frame.slots[slot] = value
+
+    def create(self, key: str, value: Any = None):
+        slot = self.layout.slot(key)
+        if slot >= len(self.slots):
+            self.slots.extend([UNDEFINED] * (slot + 1 - len(self.slots)))
+        if self.slots[slot] is not UNDEFINED:
+            raise ValueError(f"Variável '{key}' já existe no escopo atual")
+        self.slots[slot] = value
+
+    def set(self, key: str, value: Any):
+        current = self
+        while current is not None:
+            slot = current.layout.names.get(key)
+            if slot is not None and current.slots[slot] is not UNDEFINED:
+                current.slots[slot] = value
+                return
+            current = current.parent
+        raise ValueError(f"Variável '{key}' não definida")
+
+    def get(self, key: str) -> Any:
+        current = self
+        while current is not None:
+            slot = current.layout.names.get(key)
+            if slot is not None and current.slots[slot] is not UNDEFINED:
+                return current.slots[slot]
+            current = current.parent
+        raise ValueError(f"Variável '{key}' não definida")
+
+# Saída do programa
+# Destinos do comando print; cada um recebe o valor e escreve str(valor) seguido de uma linha
+class PrintSink:
+    # Comportamento original: print() a cada valor, respeitando redirecionamentos de sys.stdout
+    def write(self, value: Any) -> None:
+        print(value)
+
+    def flush(self) -> None:
+        sys.stdout.flush()
+
+class BufferedSink:
+    # Acumula o texto em memória e o escreve de uma vez ao passar de 'limit' caracteres;
+    # limit 0 escreve a cada valor
+    def __init__(self, stream: Any = None, limit: int = 1 << 20):
+        self.stream = stream if stream is not None else sys.stdout
+        self.limit = limit
+        self.parts: List[str] = []
+        self.size = 0
+
+    def write(self, value: Any) -> None:
+        text = f"{value}\n"
+        self.parts.append(text)
+        self.size += len(text)
+        if self.size >= self.limit:
+            self.flush()
+
+    def flush(self) -> None:
+        if self.parts:
+            self.emit("".join(self.parts))
+            self.parts.clear()
+            self.size = 0
+        self.stream.flush()
+
+    def emit(self, text: str) -> None:
+        self.stream.write(text)
+
+class BinarySink(BufferedSink):
+    # Escreve bytes UTF-8 direto em um arquivo binário, sem a camada de texto do Python
+    def __init__(self, file: Any = None, limit: int = 1 << 20):
+        super().__init__(file if file is not None else sys.stdout.buffer, limit)
+
+    def emit(self, text: str) -> None:
+        self.stream.write(text.encode())
+
+class CaptureSink:
+    # Guarda a saída em memória, para testes e para quem embute o interpretador
+    def __init__(self):
+        self.parts: List[str] = []
+
+    def write(self, value: Any) -> None:
+        self.parts.append(f"{value}\n")
+
+    def flush(self) -> None:
+        pass
+
+    def getvalue(self) -> str:
+        return "".join(self.parts)
+
+# Limites de execução
+class LimitExceeded(Exception):
+    # Distinta do ValueError dos erros da linguagem: o programa não está errado, só passou do limite
+    pass
+
+class Budget:
+    # Limites de uma execução: iterações de loops, tempo e tamanho de listas e strings. Só os
+    # loops contam passos, já que sem eles um programa termina em tempo proporcional ao seu
+    # tamanho; o relógio é consultado a cada CLOCK_STEPS iterações
+    CLOCK_STEPS = 1024
+
+    __slots__ = ("max_steps", "time_limit", "max_size", "steps", "deadline", "checkpoint")
+
+    def __init__(self, max_steps: int | None = None, time_limit: float | None = None, max_size: int | None = None):
+        self.max_steps = max_steps
+        self.time_limit = time_limit
+        self.max_size = max_size
+        self.steps = 0
+        # O prazo conta a partir da criação, que deve ser logo antes da execução
+        self.deadline = time.perf_counter() + time_limit if time_limit is not None else None
+        self.checkpoint = 0
+        self.check()
+
+    def step(self) -> None:
+        self.steps += 1
+        if self.steps >= self.checkpoint:
+            self.check()
+
+    def check(self) -> None:
+        if self.max_steps is not None and self.steps > self.max_steps:
+            raise LimitExceeded(f"Limite de {self.max_steps} iterações excedido")
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            raise LimitExceeded(f"Limite de tempo de {self.time_limit:g} s excedido")
+        self.checkpoint = self.steps + self.CLOCK_STEPS
+        if self.max_steps is not None:
+            self.checkpoint = min(self.checkpoint, self.max_steps + 1)
+
+    def size(self, value: Any) -> None:
+        # Listas e strings; os StrBuilder já sabem o próprio tamanho
+        if self.max_size is not None:
+            size = value.length if type(value) is StrBuilder else len(value)
+            if size > self.max_size:
+                raise LimitExceeded(f"Limite de tamanho de {self.max_size} excedido: valor com {size} elementos")
+
+def check_limits(engine: str, limits: tuple) -> None:
+    # Só o motor tree conta iterações e mede valores; os outros ignorariam os limites em silêncio
+    if engine != "tree" and any(limit is not None for limit in limits):
+        raise ValueError("Limites de execução só podem ser usados com o motor tree")
+
+# Estado compartilhado por todos os escopos de uma execução
+class Runtime:
+    def __init__(self, output: Any = None, jobs: int = 1, budget: Budget | None = None):
+        self.output = output if output is not None else PrintSink()
+        # Processos dos loops 'in' paralelos; o pool só é criado no primeiro loop que o usa
+        self.jobs = jobs
+        self.pool = None
+        # Limites desta execução, ou None; os loops leem o atributo uma vez antes de começar
+        self.budget = budget
+
+    def workers(self) -> Any:
+        if self.pool is None:
+            import multiprocessing
+            # Os processos herdam os buffers de saída; esvaziá-los antes evita texto repetido
+            self.output.flush()
+            sys.stdout.flush()
+            self.pool = multiprocessing.Pool(self.jobs)
+        return self.pool
+
+    def close(self) -> None:
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool = None
+
+# Tipo de um valor em tempo de execução, como reportado por Identifier.evaluate
+def value_type(value: Any) -> str:
+    if isinstance(value, bool):
+        return "bool"
+    elif isinstance(value, int):
+        return "int"
+    elif isinstance(value, (str, StrBuilder)):
+        return "str"
+    elif isinstance(value, (list, IntVector)):
+        return "list"
+    elif value is None:
+        return "none"
+    return "unknown"
+
+# Listas de inteiros vetorizadas
+# Operações aritméticas com listas valem elemento a elemento. Listas só de inteiros, com ao
+# menos VECTOR_MIN elementos, são convertidas para arrays int64 do NumPy, e o resultado fica
+# como IntVector, de modo que operações encadeadas não voltam a converter. Sem NumPy, com
+# tipos misturados ou quando o resultado pode não caber em 64 bits, cada par de elementos
+# passa por BinOp.compute, com os mesmos resultados e erros das operações entre escalares.
+VECTOR_MIN = 64
+# Desligado, todas as operações usam o caminho elemento a elemento em Python
+VECTORIZE = True
+INT64_LIMIT = 2 ** 63
+# Módulo numpy, importado na primeira operação vetorial; False se não estiver instalado
+NUMPY: Any = None
+
+def numpy_module() -> Any:
+    global NUMPY
+    if NUMPY is None:
+        try:
+            import numpy
+            NUMPY = numpy
+        except ImportError:
+            NUMPY = False
+    return NUMPY or None
+
+class IntVector:
+    # Lista de inteiros guardada num array int64; para o programa é uma lista como outra qualquer
+    __slots__ = ("array",)
+
+    def __init__(self, array: Any):
+        self.array = array
+
+    def tolist(self) -> List[int]:
+        return self.array.tolist()
+
+    def __len__(self) -> int:
+        return len(self.array)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.array.tolist())
+
+    def __repr__(self) -> str:
+        return repr(self.array.tolist())
+
+    def __eq__(self, other: Any) -> bool:
+        return self.array.tolist() == plain_list(other)
+
+    def __ne__(self, other: Any) -> bool:
+        return self.array.tolist() != plain_list(other)
+
+    def __lt__(self, other: Any) -> bool:
+        return self.array.tolist() < plain_list(other)
+
+    def __le__(self, other: Any) -> bool:
+        return self.array.tolist() <= plain_list(other)
+
+    def __gt__(self, other: Any) -> bool:
+        return self.array.tolist() > plain_list(other)
+
+    def __ge__(self, other: Any) -> bool:
+        return self.array.tolist() >= plain_list(other)
+
+    __hash__ = None
+
+def plain_list(value: Any) -> Any:
+    return value.tolist() if isinstance(value, IntVector) else value
+
+def magnitude(array: Any) -> int:
+    # Maior valor absoluto, calculado com inteiros Python para não estourar em -2 ** 63
+    if not len(array):
+        return 0
+    return max(-int(array.min()), int(array.max()), 0)
+
+def int_operand(numpy: Any, value: Any) -> Tuple[Any, int] | None:
+    # (operando para o NumPy, maior valor absoluto), ou None se o valor não pode ser vetorizado
+    if isinstance(value, IntVector):
+        return value.array, magnitude(value.array)
+    if type(value) is int:
+        return (value, abs(value)) if -INT64_LIMIT < value < INT64_LIMIT else None
+    if type(value) is list and len(value) >= VECTOR_MIN and set(map(type, value)) == {int}:
+        try:
+            array = numpy.array(value, dtype=numpy.int64)
+        except OverflowError:
+            return None
+        return array, magnitude(array)
+    return None
+
+def vectorized(op: str, left: Any, right: Any) -> IntVector | None:
+    numpy = numpy_module() if VECTORIZE else None
+    if numpy is None:
+        return None
+    left_operand, right_operand = int_operand(numpy, left), int_operand(numpy, right)
+    if left_operand is None or right_operand is None:
+        return None
+    (a, left_size), (b, right_size) = left_operand, right_operand
+    if op == "/":
+        if numpy.any(numpy.equal(b, 0)):
+            raise ValueError("Divisão por zero")
+        # Só -2 ** 63 // -1 não cabe em 64 bits
+        if left_size >= INT64_LIMIT:
+            return None
+        return IntVector(numpy.floor_divide(a, b))
+    bound = left_size * right_size if op == "*" else left_size + right_size
+    if bound >= INT64_LIMIT:
+        return None
+    func = numpy.multiply if op == "*" else numpy.add if op == "+" else numpy.subtract
+    return IntVector(func(a, b))
+
+def elementwise(op: str, left: Any, left_type: str, right: Any, right_type: str) -> list | IntVector:
+    # Operação aritmética com ao menos uma lista; um escalar vale para todos os elementos
+    if left_type == right_type == "list" and len(left) != len(right):
+        raise ValueError(f"Operador '{op}' requer listas do mesmo tamanho, obteve {len(left)} e {len(right)}")
+    result = vectorized(op, left, right)
+    if result is not None:
+        return result
+    left, right = plain_list(left), plain_list(right)
+    if left_type == right_type == "list":
+        pairs = list(zip(left, right))
+    elif left_type == "list":
+        pairs = [(item, right) for item in left]
+    else:
+        pairs = [(left, item) for item in right]
+    types = set(map(type, left if left_type == "list" else (left,)))
+    types.update(map(type, right if right_type == "list" else (right,)))
+    if types == {int}:
+        func = Compiler.OPERATORS[op]
+        return [func(a, b) for a, b in pairs]
+    compute = BinOp.compute
+    return [compute(op, a, value_type(a), b, value_type(b))[0] for a, b in pairs]
+
+# Concatenação de strings
+# 's = s + linha' num loop copiaria a string inteira a cada iteração. A partir de ROPE_MIN
+# caracteres o resultado vira um StrBuilder, que guarda os pedaços e só os junta quando o
+# texto é necessário: ao imprimir, comparar ou colocar a string numa lista.
+ROPE_MIN = 512
+
+class StrBuilder:
+    # Os primeiros 'count' itens de 'parts' formam o texto. Acrescentar ao builder mais
+    # recente reaproveita a lista de pedaços, e os anteriores continuam vendo só o seu prefixo;
+    # acrescentar a um builder antigo copia os pedaços dele antes
+    __slots__ = ("parts", "count", "length", "text")
+
+    def __init__(self, parts: List[str], count: int, length: int):
+        self.parts = parts
+        self.count = count
+        self.length = length
+        self.text: str | None = None
+
+    def append(self, value: Any) -> 'StrBuilder':
+        if type(value) is not str:
+            value = str(value)
+        parts, count = self.parts, self.count
+        if len(parts) != count:
+            parts = parts[:count]
+        parts.append(value)
+        return StrBuilder(parts, count + 1, self.length + len(value))
+
+    def __str__(self) -> str:
+        if self.text is None:
+            parts = self.parts
+            self.text = "".join(parts if len(parts) == self.count else parts[:self.count])
+        return self.text
+
+    def __repr__(self) -> str:
+        return repr(str(self))
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __add__(self, other: Any) -> 'StrBuilder':
+        if not isinstance(other, (str, StrBuilder)):
+            return NotImplemented
+        return self.append(other)
+
+    def __radd__(self, other: Any) -> str:
+        if not isinstance(other, str):
+            return NotImplemented
+        return concat(other, str(self))
+
+    def __eq__(self, other: Any) -> bool:
+        return str(self) == other
+
+    def __ne__(self, other: Any) -> bool:
+        return str(self) != other
+
+    def __lt__(self, other: Any) -> bool:
+        return str(self) < plain_str(other)
+
+    def __le__(self, other: Any) -> bool:
+        return str(self) <= plain_str(other)
+
+    def __gt__(self, other: Any) -> bool:
+        return str(self) > plain_str(other)
+
+    def __ge__(self, other: Any) -> bool:
+        return str(self) >= plain_str(other)
+
+    def __hash__(self) -> int:
+        return hash(str(self))
+
+def plain_str(value: Any) -> Any:
+    return str(value) if isinstance(value, StrBuilder) else value
+
+def concat(left: Any, right: Any) -> Any:
+    if type(left) is StrBuilder:
+        return left.append(right)
+    if type(right) is not str:
+        right = str(right)
+    if len(left) + len(right) < ROPE_MIN:
+        return left + right
+    return StrBuilder([left, right], 2, len(left) + len(right))
+
 # Nós da AST
+# Slots de cada classe de nó, incluindo os herdados
+SLOT_NAMES: dict = {}
+
+def slot_names(cls: type) -> Tuple[str, ...]:
+    names = SLOT_NAMES.get(cls)
+    if names is None:
+        names = SLOT_NAMES[cls] = tuple(name for base in reversed(cls.__mro__)
+                                        for name in base.__dict__.get("__slots__", ()))
+    return names
+
+# Nós sem filhos compartilham a mesma tupla vazia em vez de uma lista cada
+NO_CHILDREN: Tuple = ()
+
+# Todos os nós usam __slots__: sem __dict__ por instância, a árvore ocupa menos da metade da
+# memória. Subclasses que só mudam comportamento (como as especializadas pelo TypeChecker)
+# declaram __slots__ vazio para que a troca de __class__ continue possível.
 class Node:
+    __slots__ = ("value", "children", "deep")
+
     def __init__(self, value: Any, children: List['Node']):
         self.value = value
         self.children = children
+        # Marcado por mark_deep quando a subárvore é alta demais para evaluate recursivo
+        self.deep = False
+
+    def __getstate__(self) -> tuple:
+        # Estado compacto para o cache: os valores dos slots na ordem de slot_names, sem os nomes
+        return tuple(getattr(self, name, UNDEFINED) for name in slot_names(type(self)))
+
+    def __setstate__(self, state: tuple) -> None:
+        for name, value in zip(slot_names(type(self)), state):
+            if value is not UNDEFINED:
+                setattr(self, name, value)
 
     def evaluate(self, st: SymbolTable) -> Tuple[Any, str]:
         pass
 
+    def steps(self, st: SymbolTable) -> Iterator[Tuple['Node', SymbolTable]]:
+        # evaluate para a pilha explícita de execute: cada filho a avaliar é pedido com
+        # 'yield (filho, escopo)', que devolve o resultado; o retorno é o de evaluate
+        return self.evaluate(st)
+        yield
+
+    def fetch(self, st: SymbolTable) -> Any:
+        # Apenas o valor de evaluate; nós com tipo conhecido o calculam sem montar a tupla
+        return self.evaluate(st)[0]
+
+    def label(self) -> str:
+        return f"{self.__class__.__name__}({self.value})"
+
+    def sections(self) -> List[Tuple[str | None, List['Node']]]:
+        # Grupos de filhos na impressão da árvore, com o título que os precede (ou None)
+        return [(None, self.children)]
+
     def to_string(self, indent: int = 0) -> str:
-        indent_str = "  " * indent
-        result = f"{indent_str}{self.__class__.__name__}({self.value})\n"
-        for child in self.children:
-            result += child.to_string(indent + 1)
-        return result
+        output = io.StringIO()
+        AstWriter(output).write(self, indent)
+        return output.getvalue()
 
 class Declaration(Node):
+    __slots__ = ("maybe_declared",)
+
     def __init__(self, children: List[Node]):
         if len(children) not in [1, 2]:
             raise ValueError("Declaração deve ter 1 ou 2 filhos")
         super().__init__("declaration", children)
+        # Preenchido pelo Resolver: o nome pode já ter sido declarado em algum caminho até aqui
+        self.maybe_declared = False
 
-    def to_string(self, indent: int = 0) -> str:
-        indent_str = "  " * indent
-        result = f"{indent_str}Declaration\n"
-        for child in self.children:
-            result += child.to_string(indent + 1)
-        return result
+    def label(self) -> str:
+        return "Declaration"
 
     def evaluate(self, st: SymbolTable) -> Tuple[None, str]:
-        identifier = self.children[0].value
+        target = self.children[0]
         if len(self.children) == 2:
             value, _ = self.children[1].evaluate(st)
         else:
             value = None
-        st.create(identifier, value)
+        if target.slot is None:
+            st.create(target.value, value)
+        elif st.slots[target.slot] is not UNDEFINED:
+            raise ValueError(f"Variável '{target.value}' já existe no escopo atual")
+        else:
+            st.slots[target.slot] = value
+        return (None, "none")
+
+    def steps(self, st: SymbolTable) -> Iterator[Tuple[Node, SymbolTable]]:
+        target = self.children[0]
+        if len(self.children) == 2:
+            value, _ = yield (self.children[1], st)
+        else:
+            value = None
+        if target.slot is None:
+            st.create(target.value, value)
+        elif st.slots[target.slot] is not UNDEFINED:
+            raise ValueError(f"Variável '{target.value}' já existe no escopo atual")
+        else:
+            st.slots[target.slot] = value
         return (None, "none")
 
 class Assignment(Node):
+    __slots__ = ()
+
     def __init__(self, children: List[Node]):
         if len(children) != 2:
             raise ValueError("Atribuição deve ter exatamente 2 filhos")
         super().__init__("assignment", children)
 
-    def to_string(self, indent: int = 0) -> str:
-        indent_str = "  " * indent
-        result = f"{indent_str}Assignment\n"
-        for child in self.children:
-            result += child.to_string(indent + 1)
-        return result
+    def label(self) -> str:
+        return "Assignment"
 
     def evaluate(self, st: SymbolTable) -> Tuple[None, str]:
-        identifier = self.children[0].value
+        target = self.children[0]
         value, value_type = self.children[1].evaluate(st)
-        st.get(identifier)
-        st.set(identifier, value)
+        if target.depth == 0:
+            st.slots[target.slot] = value
+        elif target.depth is None:
+            st.get(target.value)
+            st.set(target.value, value)
+        else:
+            st.store(target.depth, target.slot, value)
+        return (None, "none")
+
+    def steps(self, st: SymbolTable) -> Iterator[Tuple[Node, SymbolTable]]:
+        target = self.children[0]
+        value, value_type = yield (self.children[1], st)
+        if target.depth == 0:
+            st.slots[target.slot] = value
+        elif target.depth is None:
+            st.get(target.value)
+            st.set(target.value, value)
+        else:
+            st.store(target.depth, target.slot, value)
         return (None, "none")
 
 class Conditional(Node):
+    __slots__ = ()
+
     def __init__(self, children: List[Node]):
         if len(children) not in [2, 3]:
             raise ValueError("Condicional deve ter 2 ou 3 filhos")
         super().__init__("conditional", children)
 
-    def to_string(self, indent: int = 0) -> str:
-        indent_str = "  " * indent
-        result = f"{indent_str}Conditional\n"
-        result += f"{indent_str}  Condition:\n"
-        result += self.children[0].to_string(indent + 2)
-        result += f"{indent_str}  Then:\n"
-        result += self.children[1].to_string(indent + 2)
+    def label(self) -> str:
+        return "Conditional"
+
+    def sections(self) -> List[Tuple[str | None, List[Node]]]:
+        sections = [("Condition:", self.children[:1]), ("Then:", self.children[1:2])]
         if len(self.children) == 3:
-            result += f"{indent_str}  Else:\n"
-            result += self.children[2].to_string(indent + 2)
-        return result
+            sections.append(("Else:", self.children[2:]))
+        return sections
 
     def evaluate(self, st: SymbolTable) -> Tuple[None, str]:
         condition_val, condition_type = self.children[0].evaluate(st)
@@ -124,198 +653,410 @@ class Conditional(Node):
             return self.children[2].evaluate(st)
         return (None, "none")
 
+    def steps(self, st: SymbolTable) -> Iterator[Tuple[Node, SymbolTable]]:
+        condition_val, condition_type = yield (self.children[0], st)
+        if condition_type != "bool":
+            raise ValueError(f"Condição deve ser bool, obteve {condition_type}")
+        if condition_val:
+            return (yield (self.children[1], st))
+        elif len(self.children) == 3:
+            return (yield (self.children[2], st))
+        return (None, "none")
+
 class LoopWhile(Node):
+    # 'counted' só é usado por CountedLoopWhile
+    __slots__ = ("scoped", "layout", "counted")
+
     def __init__(self, children: List[Node]):
         if len(children) != 2:
             raise ValueError("LoopWhile deve ter exatamente 2 filhos")
         super().__init__("loop_while", children)
+        # Preenchidos pelo Resolver: corpos que não declaram nada dispensam o escopo por iteração
+        self.scoped = True
+        self.layout: FrameLayout | None = None
+        self.counted: Tuple[int, bool, List[Node]] | None = None
 
-    def to_string(self, indent: int = 0) -> str:
-        indent_str = "  " * indent
-        result = f"{indent_str}WhileLoop\n"
-        result += f"{indent_str}  Condition:\n"
-        result += self.children[0].to_string(indent + 2)
-        result += f"{indent_str}  Body:\n"
-        result += self.children[1].to_string(indent + 2)
-        return result
+    def label(self) -> str:
+        return "WhileLoop"
+
+    def sections(self) -> List[Tuple[str | None, List[Node]]]:
+        return [("Condition:", self.children[:1]), ("Body:", self.children[1:])]
 
     def evaluate(self, st: SymbolTable) -> Tuple[None, str]:
+        budget = st.runtime.budget
         while True:
             condition_val, condition_type = self.children[0].evaluate(st)
             if condition_type != "bool":
                 raise ValueError(f"Condição do while deve ser bool, obteve {condition_type}")
             if not condition_val:
                 break
-            loop_st = SymbolTable(parent=st)
-            self.children[1].evaluate(loop_st)
+            if budget is not None:
+                budget.step()
+            self.children[1].evaluate(st.child(self.layout) if self.scoped else st)
+        return (None, "none")
+
+    def steps(self, st: SymbolTable) -> Iterator[Tuple[Node, SymbolTable]]:
+        budget = st.runtime.budget
+        while True:
+            condition_val, condition_type = yield (self.children[0], st)
+            if condition_type != "bool":
+                raise ValueError(f"Condição do while deve ser bool, obteve {condition_type}")
+            if not condition_val:
+                break
+            if budget is not None:
+                budget.step()
+            yield (self.children[1], st.child(self.layout) if self.scoped else st)
         return (None, "none")
 
 class LoopIn(Node):
-    def __init__(self, identifier: str, list_identifier: str, block: Node):
-        super().__init__("loop_in", [block])
+    # 'reads' só é usado por ParallelLoopIn
+    __slots__ = ("identifier", "scoped", "layout", "reads")
+
+    def __init__(self, identifier: str, source: Node, block: Node):
+        # 'source' é o que o laço percorre: uma variável, uma lista literal ou um range(...)
+        super().__init__("loop_in", [source, block])
         self.identifier = identifier
-        self.list_identifier = list_identifier
+        # Preenchidos pelo Resolver; a variável do laço ocupa o slot 0. Corpos que não declaram
+        # nada reaproveitam o mesmo escopo em todas as iterações
+        self.scoped = True
+        self.layout: FrameLayout | None = None
+        self.reads: dict | None = None
 
-    def to_string(self, indent: int = 0) -> str:
-        indent_str = "  " * indent
-        result = f"{indent_str}InLoop(var: {self.identifier}, list: {self.list_identifier})\n"
-        result += f"{indent_str}  Body:\n"
-        result += self.children[0].to_string(indent + 2)
-        return result
+    def label(self) -> str:
+        source = self.children[0]
+        if isinstance(source, Identifier):
+            return f"InLoop(var: {self.identifier}, list: {source.value})"
+        return f"InLoop(var: {self.identifier})"
+
+    def sections(self) -> List[Tuple[str | None, List[Node]]]:
+        source, block = self.children
+        if isinstance(source, Identifier):
+            return [("Body:", [block])]
+        return [("Iterable:", [source]), ("Body:", [block])]
+
+    @staticmethod
+    def iterable(value: Any) -> list | range:
+        # Listas e os intervalos de range(), que produzem os números sob demanda
+        if isinstance(value, IntVector):
+            return value.tolist()
+        if not isinstance(value, (list, range)):
+            raise ValueError(f"Espera-se lista para loop 'in', obteve {type(plain_str(value)).__name__}")
+        return value
 
     def evaluate(self, st: SymbolTable) -> Tuple[None, str]:
-        list_val = st.get(self.list_identifier)
-        if not isinstance(list_val, list):
-            raise ValueError(f"Espera-se lista para loop 'in', obteve {type(list_val).__name__}")
-        for item in list_val:
-            loop_st = SymbolTable(parent=st)
-            loop_st.create(self.identifier, item)
-            self.children[0].evaluate(loop_st)
+        return self.loop(st, LoopIn.iterable(self.children[0].fetch(st)))
+
+    def loop(self, st: SymbolTable, values: list | range) -> Tuple[None, str]:
+        block, layout, budget = self.children[1], self.layout, st.runtime.budget
+        if layout is not None and not self.scoped:
+            loop_st = Frame(layout, st)
+            slots = loop_st.slots
+            for item in values:
+                if budget is not None:
+                    budget.step()
+                slots[0] = item
+                block.evaluate(loop_st)
+            return (None, "none")
+        for item in values:
+            if budget is not None:
+                budget.step()
+            if layout is None:
+                loop_st = SymbolTable(parent=st)
+                loop_st.create(self.identifier, item)
+            else:
+                loop_st = Frame(layout, st)
+                loop_st.slots[0] = item
+            block.evaluate(loop_st)
+        return (None, "none")
+
+    def steps(self, st: SymbolTable) -> Iterator[Tuple[Node, SymbolTable]]:
+        value, _ = yield (self.children[0], st)
+        return (yield from self.loopSteps(st, LoopIn.iterable(value)))
+
+    def loopSteps(self, st: SymbolTable, values: list | range) -> Iterator[Tuple[Node, SymbolTable]]:
+        block, layout, budget = self.children[1], self.layout, st.runtime.budget
+        if layout is not None and not self.scoped:
+            loop_st = Frame(layout, st)
+            for item in values:
+                if budget is not None:
+                    budget.step()
+                loop_st.slots[0] = item
+                yield (block, loop_st)
+            return (None, "none")
+        for item in values:
+            if budget is not None:
+                budget.step()
+            if layout is None:
+                loop_st = SymbolTable(parent=st)
+                loop_st.create(self.identifier, item)
+            else:
+                loop_st = Frame(layout, st)
+                loop_st.slots[0] = item
+            yield (block, loop_st)
         return (None, "none")
 
 class Print(Node):
+    __slots__ = ()
+
     def __init__(self, children: List[Node]):
         if len(children) != 1:
             raise ValueError("Print deve ter exatamente 1 filho")
         super().__init__("print", children)
 
-    def to_string(self, indent: int = 0) -> str:
-        indent_str = "  " * indent
-        result = f"{indent_str}Print\n"
-        result += self.children[0].to_string(indent + 1)
-        return result
+    def label(self) -> str:
+        return "Print"
 
     def evaluate(self, st: SymbolTable) -> Tuple[None, str]:
         value, value_type = self.children[0].evaluate(st)
-        print(value)
+        st.runtime.output.write(value)
+        return (None, "none")
+
+    def steps(self, st: SymbolTable) -> Iterator[Tuple[Node, SymbolTable]]:
+        value, value_type = yield (self.children[0], st)
+        st.runtime.output.write(value)
         return (None, "none")
 
 class Block(Node):
+    # 'layout' é o escopo global, preenchido por Resolver.run na raiz do programa
+    __slots__ = ("layout",)
+
     def __init__(self, children: List[Node]):
         super().__init__("block", children)
 
-    def to_string(self, indent: int = 0) -> str:
-        indent_str = "  " * indent
-        result = f"{indent_str}Block\n"
-        for child in self.children:
-            result += child.to_string(indent + 1)
-        return result
+    def label(self) -> str:
+        return "Block"
 
     def evaluate(self, st: SymbolTable) -> Tuple[None, str]:
         for child in self.children:
             child.evaluate(st)
         return (None, "none")
 
+    def steps(self, st: SymbolTable) -> Iterator[Tuple[Node, SymbolTable]]:
+        for child in self.children:
+            yield (child, st)
+        return (None, "none")
+
 class BinOp(Node):
+    # 'func' só é usado pelas subclasses especializadas pelo TypeChecker
+    __slots__ = ("func",)
+
     def __init__(self, value: str, children: List[Node]):
         if len(children) != 2:
             raise ValueError("BinOp deve ter exatamente 2 filhos")
         super().__init__(value, children)
 
-    def to_string(self, indent: int = 0) -> str:
-        indent_str = "  " * indent
-        result = f"{indent_str}BinOp({self.value})\n"
-        for child in self.children:
-            result += child.to_string(indent + 1)
-        return result
+    def label(self) -> str:
+        return f"BinOp({self.value})"
 
     def evaluate(self, st: SymbolTable) -> Tuple[Any, str]:
         left_val, left_type = self.children[0].evaluate(st)
         right_val, right_type = self.children[1].evaluate(st)
+        result = BinOp.compute(self.value, left_val, left_type, right_val, right_type)
+        if result[1] == "str" and st.runtime.budget is not None:
+            st.runtime.budget.size(result[0])
+        return result
+
+    def steps(self, st: SymbolTable) -> Iterator[Tuple[Node, SymbolTable]]:
+        left_val, left_type = yield (self.children[0], st)
+        right_val, right_type = yield (self.children[1], st)
+        result = BinOp.compute(self.value, left_val, left_type, right_val, right_type)
+        if result[1] == "str" and st.runtime.budget is not None:
+            st.runtime.budget.size(result[0])
+        return result
 
+    @staticmethod
+    def compute(op: str, left_val: Any, left_type: str, right_val: Any, right_type: str) -> Tuple[Any, str]:
         # Verificação de tipos para operações aritméticas
-        if self.value in ["+", "-", "*", "/"]:
+        if op in ["+", "-", "*", "/"]:
             # Caso especial para concatenação de strings
-            if self.value == "+" and left_type == "str" and right_type == "str":
-                return (left_val + right_val, "str")
-            
+            if op == "+" and left_type == "str" and right_type == "str":
+                return (concat(left_val, right_val), "str")
+
+            # Listas operam elemento a elemento
+            if left_type == "list" or right_type == "list":
+                return (elementwise(op, left_val, left_type, right_val, right_type), "list")
+
             # Operações aritméticas requerem inteiros
             if not (left_type == "int" and right_type == "int"):
-                if self.value == "+":
+                if op == "+":
                     raise ValueError(f"Operador '+' requer dois inteiros ou duas strings, obteve {left_type} e {right_type}")
                 else:
-                    raise ValueError(f"Operador '{self.value}' requer operandos int, obteve {left_type} e {right_type}")
+                    raise ValueError(f"Operador '{op}' requer operandos int, obteve {left_type} e {right_type}")
             
-            if self.value == "+":
+            if op == "+":
                 return (left_val + right_val, "int")
-            elif self.value == "-":
+            elif op == "-":
                 return (left_val - right_val, "int")
-            elif self.value == "*":
+            elif op == "*":
                 return (left_val * right_val, "int")
-            elif self.value == "/":
+            elif op == "/":
                 if right_val == 0:
                     raise ValueError("Divisão por zero")
                 return (left_val // right_val, "int")
 
         # Operadores de comparação
-        elif self.value in [">", "<", "==", "<=", ">=", "!="]:
+        elif op in [">", "<", "==", "<=", ">=", "!="]:
             if left_type != right_type:
-                raise ValueError(f"Operador '{self.value}' requer operandos do mesmo tipo, obteve {left_type} e {right_type}")
-            if self.value == ">":
+                raise ValueError(f"Operador '{op}' requer operandos do mesmo tipo, obteve {left_type} e {right_type}")
+            if op == ">":
                 return (left_val > right_val, "bool")
-            elif self.value == "<":
+            elif op == "<":
                 return (left_val < right_val, "bool")
-            elif self.value == "==":
+            elif op == "==":
                 return (left_val == right_val, "bool")
-            elif self.value == "<=":
+            elif op == "<=":
                 return (left_val <= right_val, "bool")
-            elif self.value == ">=":
+            elif op == ">=":
                 return (left_val >= right_val, "bool")
-            elif self.value == "!=":
+            elif op == "!=":
                 return (left_val != right_val, "bool")
 
-        raise ValueError(f"Operador binário desconhecido: {self.value}")
+        raise ValueError(f"Operador binário desconhecido: {op}")
 
 class IntVal(Node):
+    __slots__ = ()
+
     def __init__(self, value: int):
-        super().__init__(value, [])
+        super().__init__(value, NO_CHILDREN)
 
-    def to_string(self, indent: int = 0) -> str:
-        indent_str = "  " * indent
-        return f"{indent_str}IntVal({self.value})\n"
+    def label(self) -> str:
+        return f"IntVal({self.value})"
 
     def evaluate(self, st: SymbolTable) -> Tuple[int, str]:
         return (self.value, "int")
 
+    def fetch(self, st: SymbolTable) -> int:
+        return self.value
+
 class StrVal(Node):
+    __slots__ = ()
+
     def __init__(self, value: str):
-        super().__init__(value, [])
+        super().__init__(value, NO_CHILDREN)
 
-    def to_string(self, indent: int = 0) -> str:
-        indent_str = "  " * indent
-        return f"{indent_str}StrVal({self.value})\n"
+    def label(self) -> str:
+        return f"StrVal({self.value})"
 
     def evaluate(self, st: SymbolTable) -> Tuple[str, str]:
         return (self.value, "str")
 
+    def fetch(self, st: SymbolTable) -> str:
+        return self.value
+
 class ListVal(Node):
+    __slots__ = ()
+
     def __init__(self, elements: List[Node]):
-        super().__init__(elements, [])
+        super().__init__(elements, NO_CHILDREN)
 
-    def to_string(self, indent: int = 0) -> str:
-        indent_str = "  " * indent
-        result = f"{indent_str}ListVal\n"
-        for elem in self.value:
-            result += elem.to_string(indent + 1)
-        return result
+    def label(self) -> str:
+        return "ListVal"
+
+    def sections(self) -> List[Tuple[str | None, List[Node]]]:
+        return [(None, self.value)]
 
     def evaluate(self, st: SymbolTable) -> Tuple[List[Any], str]:
         values = []
         for elem in self.value:
             val, _ = elem.evaluate(st)
-            values.append(val)
+            values.append(str(val) if type(val) is StrBuilder else val)
+        if st.runtime.budget is not None:
+            st.runtime.budget.size(values)
         return (values, "list")
 
+class RangeVal(Node):
+    __slots__ = ()
+
+    # range(início, fim) em um loop 'in': os inteiros de início até fim - 1, sem montar uma lista
+    def __init__(self, children: List[Node]):
+        if len(children) != 2:
+            raise ValueError("Range deve ter exatamente 2 filhos")
+        super().__init__("range", children)
+
+    def label(self) -> str:
+        return "Range"
+
+    def evaluate(self, st: SymbolTable) -> Tuple[range, str]:
+        start, start_type = self.children[0].evaluate(st)
+        end, end_type = self.children[1].evaluate(st)
+        return (RangeVal.build(start, start_type, end, end_type), "range")
+
+    def steps(self, st: SymbolTable) -> Iterator[Tuple[Node, SymbolTable]]:
+        start, start_type = yield (self.children[0], st)
+        end, end_type = yield (self.children[1], st)
+        return (RangeVal.build(start, start_type, end, end_type), "range")
+
+    @staticmethod
+    def build(start: Any, start_type: str, end: Any, end_type: str) -> range:
+        if start_type != "int" or end_type != "int":
+            raise ValueError(f"range requer operandos int, obteve {start_type} e {end_type}")
+        return range(start, end)
+
+class Reduction(Node):
+    __slots__ = ()
+    NAMES = ("sum", "min", "max")
+
+    # sum(lista), min(lista) ou max(lista) de uma lista de inteiros
+    def __init__(self, value: str, children: List[Node]):
+        if len(children) != 1:
+            raise ValueError("Reduction deve ter exatamente 1 filho")
+        super().__init__(value, children)
+
+    def label(self) -> str:
+        return f"Reduction({self.value})"
+
+    def evaluate(self, st: SymbolTable) -> Tuple[int, str]:
+        value, value_kind = self.children[0].evaluate(st)
+        return (Reduction.compute(self.value, value, value_kind), "int")
+
+    def steps(self, st: SymbolTable) -> Iterator[Tuple[Node, SymbolTable]]:
+        value, value_kind = yield (self.children[0], st)
+        return (Reduction.compute(self.value, value, value_kind), "int")
+
+    @staticmethod
+    def compute(name: str, value: Any, kind: str) -> int:
+        if kind != "list":
+            raise ValueError(f"{name} requer uma lista, obteve {kind}")
+        if not len(value):
+            if name == "sum":
+                return 0
+            raise ValueError(f"{name} de lista vazia")
+        if isinstance(value, IntVector):
+            array = value.array
+            if name == "min":
+                return int(array.min())
+            if name == "max":
+                return int(array.max())
+            if magnitude(array) * len(array) < INT64_LIMIT:
+                return int(array.sum())
+            value = array.tolist()
+        elif set(map(type, value)) != {int}:
+            other = next(item for item in value if type(item) is not int)
+            raise ValueError(f"{name} requer uma lista de int, obteve elemento {value_type(other)}")
+        return sum(value) if name == "sum" else min(value) if name == "min" else max(value)
+
 class Identifier(Node):
+    # 'type' só é usado por TypedIdentifier
+    __slots__ = ("depth", "slot", "binding", "type")
+
     def __init__(self, value: str):
-        super().__init__(value, [])
+        super().__init__(value, NO_CHILDREN)
+        # Endereço (profundidade, slot) preenchido pelo Resolver; None resolve pelo nome
+        self.depth: int | None = None
+        self.slot: int | None = None
+        # Declaração estática (layout, slot) a que o nome se refere, usada pelo Optimizer
+        self.binding: Tuple[FrameLayout, int] | None = None
 
-    def to_string(self, indent: int = 0) -> str:
-        indent_str = "  " * indent
-        return f"{indent_str}Identifier({self.value})\n"
+    def label(self) -> str:
+        return f"Identifier({self.value})"
 
     def evaluate(self, st: SymbolTable) -> Tuple[Any, str]:
-        value = st.get(self.value)
+        if self.depth == 0:
+            value = st.slots[self.slot]
+        elif self.depth is None:
+            value = st.get(self.value)
+        else:
+            value = st.load(self.depth, self.slot)
         if isinstance(value, int):
             return (value, "int")
         elif isinstance(value, str):
@@ -324,395 +1065,3851 @@ class Identifier(Node):
             return (value, "list")
         elif value is None:
             return (value, "none")
+        elif isinstance(value, IntVector):
+            return (value, "list")
+        elif isinstance(value, StrBuilder):
+            return (value, "str")
         return (value, "unknown")
 
-# Tokenizer
-class Token:
-    def __init__(self, type: str, value: Any):
-        self.type = type
-        self.value = value
-
-class Tokenizer:
-    def __init__(self, source: str, position: int = 0):
-        self.source = source
-        self.position = position
-        self.next: Token | None = None
-        self.selectNext()
+# Avaliação sem limite de profundidade
+# Subárvores com altura até SHALLOW_HEIGHT usam evaluate, recursivo e mais rápido; acima disso
+# execute percorre os nós com uma pilha explícita de geradores (steps), então a pilha nativa
+# nunca passa de SHALLOW_HEIGHT níveis, qualquer que seja o aninhamento do programa.
+SHALLOW_HEIGHT = 100
 
-    def selectNext(self) -> None:
-        while self.position < len(self.source) and self.source[self.position].isspace() and self.source[self.position] != '\n':
-            self.position += 1
+def postorder(tree: Node, targets: bool = True) -> List[Node]:
+    # Filhos da esquerda para a direita antes do pai, sem recursão: é a pré-ordem que visita
+    # os filhos da direita para a esquerda, invertida. Com targets=False, os alvos de
+    # declarações e atribuições ficam de fora
+    order = []
+    pending = [tree]
+    while pending:
+        node = pending.pop()
+        order.append(node)
+        if isinstance(node, ListVal):
+            pending.extend(node.value)
+        elif not targets and isinstance(node, (Declaration, Assignment)):
+            pending.extend(node.children[1:])
+        else:
+            pending.extend(node.children)
+    order.reverse()
+    return order
 
-        if self.position >= len(self.source):
-            self.next = Token("EOF", None)
-            return
+def mark_deep(tree: Node) -> None:
+    # A árvore é percorrida nível a nível; a maioria dos programas termina aqui, sem nós profundos
+    levels = [[tree]]
+    while levels[-1]:
+        levels.append([child for node in levels[-1]
+                       for child in (node.value if isinstance(node, ListVal) else node.children)])
+    if len(levels) - 1 <= SHALLOW_HEIGHT:
+        return
+    heights = {}
+    for level in reversed(levels):
+        for node in level:
+            children = node.value if isinstance(node, ListVal) else node.children
+            height = 1 + max([heights[id(child)] for child in children], default=0)
+            heights[id(node)] = height
+            if height > SHALLOW_HEIGHT:
+                node.deep = True
 
-        token = self.source[self.position]
-        if token.isdigit():
-            result = ""
-            while self.position < len(self.source) and self.source[self.position].isdigit():
-                result += self.source[self.position]
-                self.position += 1
-            self.next = Token("NUMBER", int(result))
-        elif token == '+':
-            self.next = Token("PLUS", 0)
-            self.position += 1
-        elif token == '-':
-            self.next = Token("MINUS", 0)
-            self.position += 1
-        elif token == '*':
-            self.next = Token("MULT", 0)
-            self.position += 1
-        elif token == '/':
-            self.next = Token("DIV", 0)
-            self.position += 1
-        elif token == '(':
-            self.next = Token("LPAREN", 0)
-            self.position += 1
-        elif token == ')':
-            self.next = Token("RPAREN", 0)
-            self.position += 1
-        elif token == '{':
-            self.next = Token("LBRACE", 0)
-            self.position += 1
-        elif token == '}':
-            self.next = Token("RBRACE", 0)
-            self.position += 1
-        elif token == '[':
-            self.next = Token("LBRACKET", 0)
-            self.position += 1
-        elif token == ']':
-            self.next = Token("RBRACKET", 0)
-            self.position += 1
-        elif token == ',':
-            self.next = Token("COMMA", 0)
-            self.position += 1
-        elif token == '>':
-            if self.position + 1 < len(self.source) and self.source[self.position + 1] == '=':
-                self.next = Token("GE", 0)
-                self.position += 2
-            else:
-                self.next = Token("GT", 0)
-                self.position += 1
-        elif token == '<':
-            if self.position + 1 < len(self.source) and self.source[self.position + 1] == '=':
-                self.next = Token("LE", 0)
-                self.position += 2
-            else:
-                self.next = Token("LT", 0)
-                self.position += 1
-        elif token == '=':
-            if self.position + 1 < len(self.source) and self.source[self.position + 1] == '=':
-                self.next = Token("EQ", 0)
-                self.position += 2
-            else:
-                self.next = Token("ASSIGN", 0)
-                self.position += 1
-        elif token == '!':
-            if self.position + 1 < len(self.source) and self.source[self.position + 1] == '=':
-                self.next = Token("NE", 0)
-                self.position += 2
-            else:
-                raise ValueError(f"Token inválido: {token}")
-        elif token == '"':
-            self.position += 1
-            result = ""
-            while self.position < len(self.source) and self.source[self.position] != '"':
-                result += self.source[self.position]
-                self.position += 1
-            if self.position >= len(self.source):
-                raise ValueError("String literal não terminada")
-            self.next = Token("STRING", result)
-            self.position += 1
-        elif token == '\n':
-            self.next = Token("NEWLINE", 0)
-            self.position += 1
-        elif token.isalpha() or token == '_':
-            result = ""
-            while self.position < len(self.source) and (self.source[self.position].isalnum() or self.source[self.position] == '_'):
-                result += self.source[self.position]
-                self.position += 1
-            if result == "seed":
-                self.next = Token("SEED", 0)
-            elif result == "branch":
-                self.next = Token("BRANCH", 0)
-            elif result == "then":
-                self.next = Token("THEN", 0)
-            elif result == "else":
-                self.next = Token("ELSE", 0)
-            elif result == "grow":
-                self.next = Token("GROW", 0)
-            elif result == "while":
-                self.next = Token("WHILE", 0)
-            elif result == "in":
-                self.next = Token("IN", 0)
-            elif result == "print":
-                self.next = Token("PRINT", 0)
+def execute(tree: Node, st: SymbolTable) -> Tuple[Any, str]:
+    # Requer uma árvore resolvida: o Resolver marca os nós profundos
+    if not tree.deep:
+        return tree.evaluate(st)
+    # Sem o coletor de ciclos, que percorreria a pilha de geradores inteira a cada coleta;
+    # valores e escopos do Arbor não formam ciclos
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        stack = []
+        current = tree.steps(st)
+        result = None
+        while True:
+            try:
+                child, scope = current.send(result)
+            except StopIteration as stop:
+                if not stack:
+                    return stop.value
+                current = stack.pop()
+                result = stop.value
+                continue
+            if child.deep:
+                stack.append(current)
+                current = child.steps(scope)
+                result = None
             else:
-                self.next = Token("IDENTIFIER", result)
-        else:
-            raise ValueError(f"Token inválido: {token}")
+                result = child.evaluate(scope)
+    finally:
+        if enabled:
+            gc.enable()
 
-# Parser
-class Parser:
-    def __init__(self):
-        self.tokenizer: Tokenizer | None = None
-
-    def parseFactor(self) -> Node:
-        if self.tokenizer.next.type == "NUMBER":
-            result = IntVal(self.tokenizer.next.value)
-            self.tokenizer.selectNext()
-        elif self.tokenizer.next.type == "STRING":
-            result = StrVal(self.tokenizer.next.value)
-            self.tokenizer.selectNext()
-        elif self.tokenizer.next.type == "IDENTIFIER":
-            result = Identifier(self.tokenizer.next.value)
-            self.tokenizer.selectNext()
-        elif self.tokenizer.next.type == "LPAREN":
-            self.tokenizer.selectNext()
-            result = self.parseExpression()
-            if self.tokenizer.next.type != "RPAREN":
-                raise ValueError(f"Espera-se RPAREN, obteve {self.tokenizer.next.type}")
-            self.tokenizer.selectNext()
-        elif self.tokenizer.next.type == "LBRACKET":
-            result = self.parseList()
-        else:
-            raise ValueError(f"Espera-se NUMBER, STRING, IDENTIFIER, LBRACKET ou LPAREN, obteve {self.tokenizer.next.type}")
-        return result
+# Perfil de execução
+# Com --profile, install troca evaluate, fetch e steps de todas as classes de nó por versões que
+# contam execuções e medem o tempo de cada nó; uninstall devolve os métodos originais. Sem o
+# profiler instalado, a avaliação não paga nenhum custo extra.
+class Profiler:
+    METHODS = ("evaluate", "fetch")
+    # Quantidade de linhas e de nós mostrados no relatório
+    TOP = 15
 
-    def parseTerm(self) -> Node:
-        result = self.parseFactor()
-        while self.tokenizer.next.type in ["MULT", "DIV"]:
-            op = "*" if self.tokenizer.next.type == "MULT" else "/"
-            self.tokenizer.selectNext()
-            right = self.parseFactor()
-            result = BinOp(op, [result, right])
-        return result
+    def __init__(self, tree: Node, positions: dict | None = None, tokens: 'TokenArray | None' = None):
+        self.tree = tree
+        self.tokens = tokens
+        # Nó -> [execuções, tempo acumulado, tempo próprio]
+        self.stats: dict = {}
+        # Nós em avaliação: [nó, início, tempo gasto nos filhos, caminho]
+        self.stack: List[list] = []
+        # Caminhos de chamada para as pilhas colapsadas: (caminho pai, nó) -> índice, com o pai,
+        # o nó e o tempo próprio de cada caminho nas listas abaixo
+        self.paths: dict = {}
+        self.path_parents: List[int] = []
+        self.path_nodes: List[Node] = []
+        self.path_times: List[float] = []
+        self.saved: List[Tuple[type, str, Any]] = []
+        self.locations = self.locate(tree, positions or {})
 
-    def parseExpression(self) -> Node:
-        result = self.parseTerm()
-        while self.tokenizer.next.type in ["PLUS", "MINUS"]:
-            op = "+" if self.tokenizer.next.type == "PLUS" else "-"
-            self.tokenizer.selectNext()
-            right = self.parseTerm()
-            result = BinOp(op, [result, right])
-        return result
+    @staticmethod
+    def locate(tree: Node, positions: dict) -> dict:
+        # Nós sem posição anotada (operações, blocos, nós criados pelo Optimizer) herdam a do
+        # primeiro filho que tiver uma e, se nenhum tiver, a do pai
+        locations = dict(positions)
+        order = postorder(tree)
+        for node in order:
+            if node not in locations:
+                children = node.value if isinstance(node, ListVal) else node.children
+                for child in children:
+                    if child in locations:
+                        locations[node] = locations[child]
+                        break
+        for node in reversed(order):
+            if node in locations:
+                for child in node.value if isinstance(node, ListVal) else node.children:
+                    if child not in locations:
+                        locations[child] = locations[node]
+        return locations
 
-    def parseCondition(self) -> Node:
-        left = self.parseExpression()
-        if self.tokenizer.next.type in ["GT", "LT", "EQ", "LE", "GE", "NE"]:
-            op = ">" if self.tokenizer.next.type == "GT" else \
-                 "<" if self.tokenizer.next.type == "LT" else \
-                 "==" if self.tokenizer.next.type == "EQ" else \
-                 "<=" if self.tokenizer.next.type == "LE" else \
-                 ">=" if self.tokenizer.next.type == "GE" else "!="
-            self.tokenizer.selectNext()
-            right = self.parseExpression()
-            return BinOp(op, [left, right])
-        raise ValueError(f"Espera-se GT, LT, EQ, LE, GE ou NE, obteve {self.tokenizer.next.type}")
+    def install(self) -> None:
+        pending = [Node]
+        while pending:
+            cls = pending.pop()
+            pending.extend(cls.__subclasses__())
+            for name in self.METHODS:
+                if name in cls.__dict__:
+                    self.saved.append((cls, name, cls.__dict__[name]))
+                    setattr(cls, name, self.wrap(cls.__dict__[name]))
+            if "steps" in cls.__dict__:
+                self.saved.append((cls, "steps", cls.__dict__["steps"]))
+                setattr(cls, "steps", self.wrapSteps(cls.__dict__["steps"]))
 
-    def parseList(self) -> Node:
-        if self.tokenizer.next.type != "LBRACKET":
-            raise ValueError(f"Espera-se LBRACKET, obteve {self.tokenizer.next.type}")
-        self.tokenizer.selectNext()
-        elements = []
-        if self.tokenizer.next.type != "RBRACKET":
-            elements.append(self.parseListElement())
-            while self.tokenizer.next.type == "COMMA":
-                self.tokenizer.selectNext()
-                elements.append(self.parseListElement())
-        if self.tokenizer.next.type != "RBRACKET":
-            raise ValueError(f"Espera-se RBRACKET, obteve {self.tokenizer.next.type}")
-        self.tokenizer.selectNext()
+    def uninstall(self) -> None:
+        for cls, name, method in reversed(self.saved):
+            setattr(cls, name, method)
+        self.saved.clear()
+
+    def enter(self, node: Node) -> list:
+        stack = self.stack
+        key = (stack[-1][3] if stack else -1, node)
+        path = self.paths.get(key)
+        if path is None:
+            path = self.paths[key] = len(self.path_nodes)
+            self.path_parents.append(key[0])
+            self.path_nodes.append(node)
+            self.path_times.append(0.0)
+        entry = [node, 0.0, 0.0, path]
+        stack.append(entry)
+        entry[1] = time.perf_counter()
+        return entry
+
+    def leave(self) -> None:
+        end = time.perf_counter()
+        node, start, children, path = self.stack.pop()
+        elapsed = end - start
+        stat = self.stats.get(node)
+        if stat is None:
+            stat = self.stats[node] = [0, 0.0, 0.0]
+        stat[0] += 1
+        stat[1] += elapsed
+        stat[2] += elapsed - children
+        self.path_times[path] += elapsed - children
+        if self.stack:
+            self.stack[-1][2] += elapsed
+
+    def wrap(self, method: Callable) -> Callable:
+        stack = self.stack
+
+        def profiled(node: Node, st: SymbolTable) -> Any:
+            # fetch que recai em evaluate (ou o contrário) conta uma única execução do nó
+            if stack and stack[-1][0] is node:
+                return method(node, st)
+            self.enter(node)
+            try:
+                return method(node, st)
+            finally:
+                self.leave()
+        return profiled
+
+    def wrapSteps(self, method: Callable) -> Callable:
+        stack = self.stack
+
+        def profiled(node: Node, st: SymbolTable) -> Iterator[Tuple[Node, SymbolTable]]:
+            entry = self.enter(node)
+            try:
+                return (yield from method(node, st))
+            finally:
+                # Geradores abandonados por um erro só são fechados depois, fora de ordem
+                if stack and stack[-1] is entry:
+                    self.leave()
+        return profiled
+
+    def line(self, node: Node) -> int | None:
+        index = self.locations.get(node)
+        return None if index is None or self.tokens is None else self.tokens.lines[index]
+
+    def position(self, node: Node) -> str:
+        index = self.locations.get(node)
+        if index is None or self.tokens is None:
+            return "?"
+        line, column = self.tokens.position(index)
+        return f"{line}:{column}"
+
+    def frame(self, node: Node) -> str:
+        label = node.label().replace(";", ",").replace("\n", " ")
+        if len(label) > 40:
+            label = label[:37] + "..."
+        line = self.line(node)
+        return label if line is None else f"{label} (linha {line})"
+
+    def report(self, source: str, file: Any = sys.stderr) -> None:
+        total = sum(stat[2] for stat in self.stats.values())
+        evaluations = sum(stat[0] for stat in self.stats.values())
+        share = lambda seconds: seconds / total * 100 if total else 0.0
+        print(f"\nPerfil de execução: {total * 1000:.2f} ms em {evaluations} avaliações de nós", file=file)
+
+        # Por linha, o tempo próprio de todos os nós da linha; as execuções são as do nó mais executado
+        lines: dict = {}
+        for node, (count, _, own) in self.stats.items():
+            line = self.line(node)
+            if line is not None:
+                executions, seconds = lines.get(line, (0, 0.0))
+                lines[line] = (max(executions, count), seconds + own)
+        if lines:
+            source_lines = source.splitlines()
+            print("\nLinhas mais custosas:", file=file)
+            print(f"{'linha':>7} {'execuções':>11} {'tempo próprio':>15} {'%':>7}  código", file=file)
+            for line, (executions, seconds) in sorted(lines.items(), key=lambda item: -item[1][1])[:self.TOP]:
+                text = source_lines[line - 1].strip() if line <= len(source_lines) else ""
+                print(f"{line:>7} {executions:>11} {seconds * 1000:>12.2f} ms {share(seconds):>6.1f}%  {text[:60]}",
+                      file=file)
+
+        print("\nNós mais custosos:", file=file)
+        print(f"{'tempo próprio':>15} {'acumulado':>12} {'execuções':>11}  {'posição':<9} nó", file=file)
+        for node, (count, cumulative, own) in sorted(self.stats.items(), key=lambda item: -item[1][2])[:self.TOP]:
+            print(f"{own * 1000:>12.2f} ms {cumulative * 1000:>9.2f} ms {count:>11}  {self.position(node):<9} "
+                  f"{node.label()[:60]}", file=file)
+
+    def collapsed(self) -> Iterator[str]:
+        # Formato de pilhas colapsadas do flamegraph.pl e do speedscope: 'raiz;...;nó valor',
+        # com o tempo próprio de cada caminho em microssegundos
+        names: List[str] = []
+        for path, node in enumerate(self.path_nodes):
+            parent = self.path_parents[path]
+            name = self.frame(node)
+            names.append(name if parent < 0 else f"{names[parent]};{name}")
+            micros = round(self.path_times[path] * 1e6)
+            if micros > 0:
+                yield f"{names[path]} {micros}"
+
+# Estatísticas de memória
+class MemoryStats:
+    # Relatório do --stats: o tracemalloc mede a memória atual e o pico de cada fase. Na
+    # execução, os construtores de escopo e os métodos dos nós são trocados, como no Profiler,
+    # para contar os escopos e guardar o tamanho das maiores listas e strings produzidas
+    FORMAT = "arbor-stats"
+    VERSION = 1
+
+    def __init__(self):
+        self.phases: dict = {}
+        self.tokens: int | None = None
+        self.nodes: dict = {}
+        self.scopes = 0
+        self.max_depth = 0
+        self.largest_list = 0
+        self.largest_string = 0
+        # Profundidade de cada escopo vivo, pelo id: um escopo pai continua vivo enquanto o filho
+        # existir, então o seu id não pode ter sido reaproveitado
+        self.depths: dict = {}
+        self.saved: List[Tuple[type, str, Any]] = []
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            current, peak = tracemalloc.get_traced_memory()
+            self.phases[name] = {
+                "elapsed_ms": elapsed * 1000,
+                "current_kib": current / 1024,
+                "allocated_kib": (current - base) / 1024,
+                "peak_kib": peak / 1024,
+            }
+
+    def count(self, tree: Node) -> None:
+        # Nós da árvore que será executada, pela classe (já especializada pelo TypeChecker)
+        self.nodes = {}
+        for node in postorder(tree):
+            name = type(node).__name__
+            self.nodes[name] = self.nodes.get(name, 0) + 1
+
+    def observe(self, value: Any) -> None:
+        kind = type(value)
+        if kind is list or kind is IntVector:
+            if len(value) > self.largest_list:
+                self.largest_list = len(value)
+        elif kind is str:
+            if len(value) > self.largest_string:
+                self.largest_string = len(value)
+        elif kind is StrBuilder:
+            if value.length > self.largest_string:
+                self.largest_string = value.length
+
+    def install(self) -> None:
+        for cls in (SymbolTable, Frame):
+            self.saved.append((cls, "__init__", cls.__dict__["__init__"]))
+            cls.__init__ = self.wrapScope(cls.__dict__["__init__"])
+        pending = [Node]
+        while pending:
+            cls = pending.pop()
+            pending.extend(cls.__subclasses__())
+            for name, wrap in (("evaluate", self.wrapEvaluate), ("fetch", self.wrapFetch),
+                               ("steps", self.wrapSteps)):
+                if name in cls.__dict__:
+                    self.saved.append((cls, name, cls.__dict__[name]))
+                    setattr(cls, name, wrap(cls.__dict__[name]))
+
+    def uninstall(self) -> None:
+        for cls, name, method in reversed(self.saved):
+            setattr(cls, name, method)
+        self.saved.clear()
+        self.depths.clear()
+
+    def wrapScope(self, method: Callable) -> Callable:
+        depths = self.depths
+
+        def counted(scope: Any, *args: Any, **kwargs: Any) -> None:
+            method(scope, *args, **kwargs)
+            depth = 1 if scope.parent is None else depths.get(id(scope.parent), 0) + 1
+            depths[id(scope)] = depth
+            self.scopes += 1
+            if depth > self.max_depth:
+                self.max_depth = depth
+        return counted
+
+    def wrapEvaluate(self, method: Callable) -> Callable:
+        def observed(node: Node, st: SymbolTable) -> Tuple[Any, str]:
+            result = method(node, st)
+            self.observe(result[0])
+            return result
+        return observed
+
+    def wrapFetch(self, method: Callable) -> Callable:
+        def observed(node: Node, st: SymbolTable) -> Any:
+            value = method(node, st)
+            self.observe(value)
+            return value
+        return observed
+
+    def wrapSteps(self, method: Callable) -> Callable:
+        def observed(node: Node, st: SymbolTable) -> Iterator[Tuple[Node, SymbolTable]]:
+            result = yield from method(node, st)
+            self.observe(result[0])
+            return result
+        return observed
+
+    def report(self, filename: str, engine: str) -> dict:
+        return {
+            "format": self.FORMAT,
+            "version": self.VERSION,
+            "interpreter": VERSION,
+            "program": filename,
+            "engine": engine,
+            "phases": self.phases,
+            "tokens": self.tokens,
+            "nodes": {"total": sum(self.nodes.values()), "classes": dict(sorted(self.nodes.items()))},
+            "scopes": {"created": self.scopes, "max_depth": self.max_depth},
+            "largest": {"list": self.largest_list, "string": self.largest_string},
+        }
+
+# Escrita e serialização da AST
+class AstWriter:
+    # Escreve a árvore no formato de to_string direto em um arquivo, em tempo linear e sem recursão
+    BATCH = 4096
+
+    def __init__(self, output: Any):
+        self.output = output
+
+    def write(self, tree: Node, indent: int = 0) -> None:
+        parts = []
+        pending = [(tree, indent)]
+        while pending:
+            item, level = pending.pop()
+            # Títulos de seção (Condition:, Body:...) ficam na pilha como texto
+            parts.append(f"{'  ' * level}{item if isinstance(item, str) else item.label()}\n")
+            if len(parts) >= self.BATCH:
+                self.output.write("".join(parts))
+                parts.clear()
+            if isinstance(item, str):
+                continue
+            for title, nodes in reversed(item.sections()):
+                child_level = level + 1 if title is None else level + 2
+                pending.extend((child, child_level) for child in reversed(nodes))
+                if title is not None:
+                    pending.append((title, level + 1))
+        self.output.write("".join(parts))
+
+class AstCodec:
+    # A árvore é gravada em pré-ordem como registros (tipo, valor, número de filhos), o que
+    # permite ler e escrever árvores de qualquer profundidade sem recursão. Nós especializados
+    # pelo TypeChecker são gravados com o tipo base; a especialização é refeita ao carregar.
+    KINDS = ("Node", "Block", "Declaration", "Assignment", "Conditional", "LoopWhile", "LoopIn",
+             "Print", "BinOp", "IntVal", "StrVal", "ListVal", "Identifier", "RangeVal",
+             "Reduction")
+    # Nós cujo valor é gravado, e como: texto ou inteiro
+    VALUES = {"Node": "str", "LoopIn": "str", "BinOp": "str", "IntVal": "int", "StrVal": "str",
+              "Identifier": "str", "Reduction": "str"}
+    FORMAT = "arbor-ast"
+    # Versão 2: o loop 'in' grava o que percorre como primeiro filho, em vez do nome da lista
+    VERSION = 2
+    MAGIC = b"ARBT"
+    EXTENSIONS = (".arbt", ".json")
+
+    @staticmethod
+    def records(tree: Node) -> Iterator[Tuple[str, Any, int]]:
+        pending = [tree]
+        while pending:
+            node = pending.pop()
+            kind = next(cls.__name__ for cls in type(node).__mro__ if cls.__name__ in AstCodec.KINDS)
+            children = node.value if kind == "ListVal" else node.children
+            if kind == "LoopIn":
+                value = node.identifier
+            else:
+                value = node.value if kind in AstCodec.VALUES else None
+            yield (kind, value, len(children))
+            pending.extend(reversed(children))
+
+    @staticmethod
+    def build(records: Iterable[Tuple[str, Any, int]]) -> Node:
+        # Cada entrada da pilha é um nó à espera dos filhos: [tipo, valor, quantidade, filhos]
+        stack = []
+        root = None
+        for kind, value, count in records:
+            if root is not None or kind not in AstCodec.KINDS:
+                raise ValueError("AST serializada inválida")
+            stack.append([kind, value, count, []])
+            while stack and len(stack[-1][3]) == stack[-1][2]:
+                try:
+                    node = AstCodec.make(*stack.pop())
+                except (IndexError, TypeError, KeyError):
+                    raise ValueError("AST serializada inválida")
+                if stack:
+                    stack[-1][3].append(node)
+                else:
+                    root = node
+        if root is None:
+            raise ValueError("AST serializada inválida")
+        return root
+
+    @staticmethod
+    def make(kind: str, value: Any, count: int, children: List[Node]) -> Node:
+        if kind == "Node":
+            return Node(value, children)
+        if kind == "LoopIn":
+            return LoopIn(value, children[0], children[1])
+        if kind in ("BinOp", "Reduction"):
+            return globals()[kind](value, children)
+        if kind in ("IntVal", "StrVal", "Identifier"):
+            return globals()[kind](value)
+        return globals()[kind](children)
+
+    @staticmethod
+    def toJson(tree: Node) -> str:
+        nodes = [list(record) for record in AstCodec.records(tree)]
+        return json.dumps({"format": AstCodec.FORMAT, "version": AstCodec.VERSION, "nodes": nodes},
+                          ensure_ascii=False, separators=(",", ":"))
+
+    @staticmethod
+    def fromJson(text: str) -> Node:
+        data = json.loads(text)
+        if not isinstance(data, dict) or data.get("format") != AstCodec.FORMAT \
+                or data.get("version") != AstCodec.VERSION:
+            raise ValueError("AST serializada inválida")
+        return AstCodec.build(tuple(node) for node in data["nodes"])
+
+    @staticmethod
+    def toBinary(tree: Node) -> bytes:
+        # Cabeçalho, e então por nó: tipo (1 byte), número de filhos e valor em varints;
+        # textos são prefixados pelo tamanho em bytes UTF-8, inteiros usam zigzag
+        out = bytearray(AstCodec.MAGIC)
+        out.append(AstCodec.VERSION)
+
+        def varint(number: int) -> None:
+            while number > 0x7F:
+                out.append((number & 0x7F) | 0x80)
+                number >>= 7
+            out.append(number)
+
+        def text(value: str) -> None:
+            data = value.encode()
+            varint(len(data))
+            out.extend(data)
+
+        kinds = {kind: code for code, kind in enumerate(AstCodec.KINDS)}
+        for kind, value, count in AstCodec.records(tree):
+            out.append(kinds[kind])
+            varint(count)
+            encoding = AstCodec.VALUES.get(kind)
+            if encoding == "str":
+                text(value)
+            elif encoding == "int":
+                varint(value << 1 if value >= 0 else ((-value) << 1) - 1)
+        return bytes(out)
+
+    @staticmethod
+    def fromBinary(data: bytes) -> Node:
+        if data[:len(AstCodec.MAGIC)] != AstCodec.MAGIC or data[len(AstCodec.MAGIC):len(AstCodec.MAGIC) + 1] != bytes([AstCodec.VERSION]):
+            raise ValueError("AST serializada inválida")
+        position = len(AstCodec.MAGIC) + 1
+
+        def varint() -> int:
+            nonlocal position
+            number, shift = 0, 0
+            while True:
+                byte = data[position]
+                position += 1
+                number |= (byte & 0x7F) << shift
+                if byte < 0x80:
+                    return number
+                shift += 7
+
+        def text() -> str:
+            nonlocal position
+            size = varint()
+            position += size
+            return data[position - size:position].decode()
+
+        def records() -> Iterator[Tuple[str, Any, int]]:
+            nonlocal position
+            while position < len(data):
+                code = data[position]
+                position += 1
+                if code >= len(AstCodec.KINDS):
+                    raise ValueError("AST serializada inválida")
+                kind = AstCodec.KINDS[code]
+                count = varint()
+                encoding = AstCodec.VALUES.get(kind)
+                value = None
+                if encoding == "str":
+                    value = text()
+                elif encoding == "int":
+                    number = varint()
+                    value = number >> 1 if number & 1 == 0 else -((number + 1) >> 1)
+                yield (kind, value, count)
+
+        try:
+            return AstCodec.build(records())
+        except (IndexError, UnicodeDecodeError):
+            raise ValueError("AST serializada inválida")
+
+    @staticmethod
+    def load(data: bytes) -> Node:
+        if data.startswith(AstCodec.MAGIC):
+            return AstCodec.fromBinary(data)
+        try:
+            text = data.decode()
+        except UnicodeDecodeError:
+            raise ValueError("AST serializada inválida")
+        return AstCodec.fromJson(text)
+
+    @staticmethod
+    def save(tree: Node, path: str) -> None:
+        # O formato segue a extensão: .json grava JSON, qualquer outra o formato binário
+        if path.endswith(".json"):
+            with open(path, 'w') as file:
+                file.write(AstCodec.toJson(tree))
+        else:
+            with open(path, 'wb') as file:
+                file.write(AstCodec.toBinary(tree))
+
+# Lexer de passada única
+TOKEN_NAMES = (
+    "EOF", "NEWLINE", "NUMBER", "STRING", "IDENTIFIER",
+    "PLUS", "MINUS", "MULT", "DIV", "LPAREN", "RPAREN",
+    "LBRACE", "RBRACE", "LBRACKET", "RBRACKET", "COMMA",
+    "GT", "LT", "EQ", "LE", "GE", "NE", "ASSIGN",
+    "SEED", "BRANCH", "THEN", "ELSE", "GROW", "WHILE", "IN", "PRINT",
+)
+(T_EOF, T_NEWLINE, T_NUMBER, T_STRING, T_IDENTIFIER,
+ T_PLUS, T_MINUS, T_MULT, T_DIV, T_LPAREN, T_RPAREN,
+ T_LBRACE, T_RBRACE, T_LBRACKET, T_RBRACKET, T_COMMA,
+ T_GT, T_LT, T_EQ, T_LE, T_GE, T_NE, T_ASSIGN,
+ T_SEED, T_BRANCH, T_THEN, T_ELSE, T_GROW, T_WHILE, T_IN, T_PRINT) = range(len(TOKEN_NAMES))
+
+class TokenArray:
+    def __init__(self, source: str = ""):
+        self.source = source
+        self.types = array('B')
+        self.values: List[Any] = []
+        self.lines = array('I')
+        self.line_starts: List[int] | None = None
+
+    def __len__(self) -> int:
+        return len(self.types)
+
+    def text(self, start: int, end: int) -> str:
+        # Trecho do código-fonte; arquivos mapeados são decodificados só nesse trecho
+        text = self.source[start:end]
+        return text if isinstance(text, str) else text.decode().replace("\r\n", "\n")
+
+    def position(self, index: int) -> Tuple[int, int]:
+        # A coluna é calculada sob demanda, relendo apenas as linhas do token
+        line = self.lines[index]
+        source = self.source
+        newline = "\n" if isinstance(source, str) else b"\n"
+        if self.line_starts is None:
+            self.line_starts = [0]
+            found = source.find(newline)
+            while found >= 0:
+                self.line_starts.append(found + 1)
+                found = source.find(newline, found + 1)
+        line_start = self.line_starts[line - 1]
+        if index == len(self.types) - 1:
+            return (line, len(self.text(line_start, len(source))) + 1)
+        first = bisect_left(self.lines, line)
+        # Strings com quebras de linha começam em uma linha anterior
+        while first > 0 and self.types[first - 1] == T_STRING and \
+                self.lines[first - 1] + self.values[first - 1].count("\n") == line:
+            first = bisect_left(self.lines, self.lines[first - 1])
+        start = self.line_starts[self.lines[first] - 1]
+        end = source.find(newline, line_start)
+        text = self.text(start, len(source) if end < 0 else end + 1)
+        offset = len(self.text(start, line_start))
+        # Comentários casam com o padrão, mas não geram tokens
+        matches = (match for match in Lexer.PATTERN.finditer(text) if not match.group(1).startswith("//"))
+        for _ in range(index - first):
+            next(matches)
+        return (line, next(matches).start(1) - offset + 1)
+
+class Lexer:
+    KEYWORDS = {
+        "seed": T_SEED, "branch": T_BRANCH, "then": T_THEN, "else": T_ELSE,
+        "grow": T_GROW, "while": T_WHILE, "in": T_IN, "print": T_PRINT,
+    }
+    OPERATORS = {
+        "+": T_PLUS, "-": T_MINUS, "*": T_MULT, "/": T_DIV,
+        "(": T_LPAREN, ")": T_RPAREN, "{": T_LBRACE, "}": T_RBRACE,
+        "[": T_LBRACKET, "]": T_RBRACKET, ",": T_COMMA,
+        ">": T_GT, "<": T_LT, "==": T_EQ, "<=": T_LE, ">=": T_GE, "!=": T_NE,
+        "=": T_ASSIGN,
+    }
+    # Lexemas de valor fixo: palavras-chave, operadores e quebra de linha
+    FIXED = {**KEYWORDS, **OPERATORS, "\n": T_NEWLINE}
+    # Cada casamento consome os espaços e tabulações à esquerda e exatamente um lexema;
+    # comentários casam como um lexema que não gera token
+    PATTERN = re.compile(r'[^\S\n]*(\n|\d+|[^\W\d]\w*|"[^"]*"|//[^\n]*|>=|<=|==|!=|\S)')
+    TABS = re.compile(r'\t+')
+    # Tamanho aproximado dos trechos do código lidos por vez, para não montar a lista de
+    # lexemas do arquivo inteiro nem, em arquivos mapeados, uma cópia decodificada dele
+    CHUNK = 1 << 20
+
+    @staticmethod
+    def chunks(source: str | bytes) -> Iterator[List[str]]:
+        # Lexemas do código em trechos que terminam em quebras de linha. 'source' pode ser um
+        # texto ou os bytes UTF-8 de um arquivo (bytes, mmap), decodificados trecho a trecho
+        encoded = not isinstance(source, str)
+        newline = b"\n" if encoded else "\n"
+        size = len(source)
+        start = 0
+        while start < size:
+            limit = Lexer.CHUNK
+            while True:
+                end = size if size - start <= limit else source.find(newline, start + limit) + 1 or size
+                text = source[start:end]
+                if encoded:
+                    text = text.decode()
+                    if "\r" in text:
+                        text = text.replace("\r\n", "\n")
+                lexemes = Lexer.PATTERN.findall(text)
+                # Uma aspa sozinha é uma string que continua depois do trecho, ou que nunca termina
+                if end == size or '"' not in lexemes:
+                    break
+                limit *= 2
+            yield lexemes
+            start = end
+
+    @staticmethod
+    def tokenize(source: str | bytes) -> TokenArray:
+        tokens = TokenArray(source)
+        add_type, add_value, add_line = tokens.types.append, tokens.values.append, tokens.lines.append
+        fixed = Lexer.FIXED.get
+        intern = sys.intern
+        line = 1
+        for lexemes in Lexer.chunks(source):
+            for text in lexemes:
+                code = fixed(text)
+                if code is not None:
+                    add_type(code)
+                    add_value(None)
+                    add_line(line)
+                    if code == T_NEWLINE:
+                        line += 1
+                    continue
+                first = text[0]
+                if first == '"':
+                    if len(text) == 1:
+                        raise ValueError("String literal não terminada")
+                    value = text[1:-1]
+                    add_type(T_STRING)
+                    add_value(Lexer.TABS.sub(" ", value) if "\t" in value else value)
+                    add_line(line)
+                    if "\n" in text:
+                        line += text.count("\n")
+                    continue
+                if first.isdigit():
+                    add_type(T_NUMBER)
+                    add_value(int(text))
+                elif first.isalpha() or first == '_':
+                    add_type(T_IDENTIFIER)
+                    # Todas as ocorrências de um nome compartilham a mesma string na árvore
+                    add_value(intern(text))
+                elif text.startswith("//"):
+                    continue
+                else:
+                    raise ValueError(f"Token inválido: {text}")
+                add_line(line)
+        add_type(T_EOF)
+        add_value(None)
+        add_line(line)
+        return tokens
+
+    @staticmethod
+    def offsets(source: str) -> List[int]:
+        # Posição de cada token (sem o EOF) no texto, na mesma ordem de tokenize. Um lexema que
+        # começa com '//' é sempre um comentário, então basta descartar essas posições
+        starts = [match.start(1) for match in Lexer.PATTERN.finditer(source)]
+        if "//" in source:
+            comments = {match.start() for match in re.finditer("//", source)}
+            starts = [start for start in starts if start not in comments]
+        return starts
+
+def map_source(file: Any) -> bytes | mmap.mmap:
+    # O arquivo é mapeado em memória em vez de lido para uma string; o Lexer decodifica um
+    # trecho por vez. Arquivos vazios (e os que não podem ser mapeados) são lidos normalmente
+    try:
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (ValueError, OSError):
+        return file.read()
+
+# Parser
+class Parser:
+    COMPARISON_OPS = {T_GT: ">", T_LT: "<", T_EQ: "==", T_LE: "<=", T_GE: ">=", T_NE: "!="}
+    ARITHMETIC_OPS = {T_PLUS: "+", T_MINUS: "-", T_MULT: "*", T_DIV: "/"}
+    PRECEDENCE = {"+": 1, "-": 1, "*": 2, "/": 2}
+
+    def __init__(self, positions: dict | None = None):
+        self.tokens: TokenArray | None = None
+        self.position = 0
+        self.current = T_EOF
+        # Com um dicionário, anota nele o índice do primeiro token de operandos e instruções;
+        # usado pelo Profiler para mapear os nós às linhas do código-fonte
+        self.positions = positions
+        # Blocos abertos: (instruções já lidas, função que monta a instrução quando o bloco fecha)
+        self.blocks: List[Tuple[List[Node], Callable[[Block], Node | None] | None]] = []
+
+    def selectNext(self) -> None:
+        self.position += 1
+        self.current = self.tokens.types[self.position]
+
+    def currentValue(self) -> Any:
+        return self.tokens.values[self.position]
+
+    def currentName(self) -> str:
+        return TOKEN_NAMES[self.current]
+
+    def locate(self, node: Node, index: int) -> Node:
+        if self.positions is not None:
+            self.positions[node] = index
+        return node
+
+    def parseOperand(self) -> Node:
+        start = self.position
+        if self.current == T_NUMBER:
+            result = IntVal(self.currentValue())
+            self.selectNext()
+        elif self.current == T_STRING:
+            result = StrVal(self.currentValue())
+            self.selectNext()
+        elif self.current == T_IDENTIFIER:
+            # Como 'range', as reduções só são especiais seguidas de parênteses
+            if self.currentValue() in Reduction.NAMES and self.tokens.types[self.position + 1] == T_LPAREN:
+                return self.parseReduction()
+            result = Identifier(self.currentValue())
+            self.selectNext()
+        elif self.current == T_LBRACKET:
+            result = self.parseList()
+        else:
+            raise ValueError(f"Espera-se NUMBER, STRING, IDENTIFIER, LBRACKET ou LPAREN, obteve {self.currentName()}")
+        return self.locate(result, start)
+
+    def parseExpression(self) -> Node:
+        # Precedência por pilhas de operandos e operadores em vez de parseTerm/parseFactor
+        # recursivos; None na pilha de operadores marca um parêntese aberto
+        operands: List[Node] = []
+        operators: List[str | None] = []
+
+        def reduce(precedence: int) -> None:
+            while operators and operators[-1] is not None and self.PRECEDENCE[operators[-1]] >= precedence:
+                right = operands.pop()
+                operands.append(BinOp(operators.pop(), [operands.pop(), right]))
+
+        while True:
+            while self.current == T_LPAREN:
+                operators.append(None)
+                self.selectNext()
+            operands.append(self.parseOperand())
+            while self.current not in self.ARITHMETIC_OPS:
+                reduce(0)
+                if not operators:
+                    return operands.pop()
+                if self.current != T_RPAREN:
+                    raise ValueError(f"Espera-se RPAREN, obteve {self.currentName()}")
+                operators.pop()
+                self.selectNext()
+            op = self.ARITHMETIC_OPS[self.current]
+            reduce(self.PRECEDENCE[op])
+            operators.append(op)
+            self.selectNext()
+
+    def parseCondition(self) -> Node:
+        left = self.parseExpression()
+        if self.current in self.COMPARISON_OPS:
+            op = self.COMPARISON_OPS[self.current]
+            self.selectNext()
+            right = self.parseExpression()
+            return BinOp(op, [left, right])
+        raise ValueError(f"Espera-se GT, LT, EQ, LE, GE ou NE, obteve {self.currentName()}")
+
+    def parseList(self) -> Node:
+        if self.current != T_LBRACKET:
+            raise ValueError(f"Espera-se LBRACKET, obteve {self.currentName()}")
+        self.selectNext()
+        elements = []
+        if self.current != T_RBRACKET:
+            elements.append(self.parseListElement())
+            while self.current == T_COMMA:
+                self.selectNext()
+                elements.append(self.parseListElement())
+        if self.current != T_RBRACKET:
+            raise ValueError(f"Espera-se RBRACKET, obteve {self.currentName()}")
+        self.selectNext()
         return ListVal(elements)
 
     def parseListElement(self) -> Node:
-        if self.tokenizer.next.type in ["NUMBER", "STRING", "IDENTIFIER"]:
-            if self.tokenizer.next.type == "NUMBER":
-                result = IntVal(self.tokenizer.next.value)
-                self.tokenizer.selectNext()
-            elif self.tokenizer.next.type == "STRING":
-                result = StrVal(self.tokenizer.next.value)
-                self.tokenizer.selectNext()
-            else:
-                result = Identifier(self.tokenizer.next.value)
-                self.tokenizer.selectNext()
-            return result
-        raise ValueError(f"Espera-se NUMBER, STRING ou IDENTIFIER, obteve {self.tokenizer.next.type}")
+        if self.current == T_NUMBER:
+            result = IntVal(self.currentValue())
+        elif self.current == T_STRING:
+            result = StrVal(self.currentValue())
+        elif self.current == T_IDENTIFIER:
+            result = Identifier(self.currentValue())
+        else:
+            raise ValueError(f"Espera-se NUMBER, STRING ou IDENTIFIER, obteve {self.currentName()}")
+        self.locate(result, self.position)
+        self.selectNext()
+        return result
 
     def parseValue(self) -> Node:
-        if self.tokenizer.next.type in ["NUMBER", "STRING", "IDENTIFIER", "LPAREN", "LBRACKET"]:
+        if self.current in (T_NUMBER, T_STRING, T_IDENTIFIER, T_LPAREN, T_LBRACKET):
             return self.parseExpression()
-        raise ValueError(f"Espera-se NUMBER, STRING, IDENTIFIER, LBRACKET ou LPAREN, obteve {self.tokenizer.next.type}")
+        raise ValueError(f"Espera-se NUMBER, STRING, IDENTIFIER, LBRACKET ou LPAREN, obteve {self.currentName()}")
 
     def parseAssignment(self) -> Node:
-        if self.tokenizer.next.type != "IDENTIFIER":
-            raise ValueError(f"Espera-se IDENTIFIER, obteve {self.tokenizer.next.type}")
-        identifier = self.tokenizer.next.value
-        self.tokenizer.selectNext()
-        if self.tokenizer.next.type != "ASSIGN":
-            raise ValueError(f"Espera-se ASSIGN, obteve {self.tokenizer.next.type}")
-        self.tokenizer.selectNext()
+        if self.current != T_IDENTIFIER:
+            raise ValueError(f"Espera-se IDENTIFIER, obteve {self.currentName()}")
+        identifier = self.currentValue()
+        self.selectNext()
+        if self.current != T_ASSIGN:
+            raise ValueError(f"Espera-se ASSIGN, obteve {self.currentName()}")
+        self.selectNext()
         value = self.parseValue()
         return Assignment([Identifier(identifier), value])
 
     def parseDeclaration(self) -> Node:
-        if self.tokenizer.next.type != "SEED":
-            raise ValueError(f"Espera-se SEED, obteve {self.tokenizer.next.type}")
-        self.tokenizer.selectNext()
-        if self.tokenizer.next.type != "IDENTIFIER":
-            raise ValueError(f"Espera-se IDENTIFIER, obteve {self.tokenizer.next.type}")
-        identifier = self.tokenizer.next.value
-        self.tokenizer.selectNext()
-        if self.tokenizer.next.type == "ASSIGN":
-            self.tokenizer.selectNext()
+        if self.current != T_SEED:
+            raise ValueError(f"Espera-se SEED, obteve {self.currentName()}")
+        self.selectNext()
+        if self.current != T_IDENTIFIER:
+            raise ValueError(f"Espera-se IDENTIFIER, obteve {self.currentName()}")
+        identifier = self.currentValue()
+        self.selectNext()
+        if self.current == T_ASSIGN:
+            self.selectNext()
             value = self.parseValue()
             return Declaration([Identifier(identifier), value])
         return Declaration([Identifier(identifier)])
 
-    def parseConditional(self) -> Node:
-        if self.tokenizer.next.type != "BRANCH":
-            raise ValueError(f"Espera-se BRANCH, obteve {self.tokenizer.next.type}")
-        self.tokenizer.selectNext()
+    def parseConditional(self) -> None:
+        if self.current != T_BRANCH:
+            raise ValueError(f"Espera-se BRANCH, obteve {self.currentName()}")
+        start = self.position
+        self.selectNext()
         condition = self.parseCondition()
-        if self.tokenizer.next.type != "THEN":
-            raise ValueError(f"Espera-se THEN, obteve {self.tokenizer.next.type}")
-        self.tokenizer.selectNext()
-        then_block = self.parseBlock()
-        children = [condition, then_block]
-        if self.tokenizer.next.type == "ELSE":
-            self.tokenizer.selectNext()
-            else_block = self.parseBlock()
-            children.append(else_block)
-        return Conditional(children)
-
-    def parseLoop(self) -> Node:
-        if self.tokenizer.next.type != "GROW":
-            raise ValueError(f"Espera-se GROW, obteve {self.tokenizer.next.type}")
-        self.tokenizer.selectNext()
-        if self.tokenizer.next.type == "IDENTIFIER":
-            identifier = self.tokenizer.next.value
-            self.tokenizer.selectNext()
-            if self.tokenizer.next.type == "IN":
-                self.tokenizer.selectNext()
-                if self.tokenizer.next.type == "IDENTIFIER":
-                    list_identifier = self.tokenizer.next.value
-                    self.tokenizer.selectNext()
-                    block = self.parseBlock()
-                    return LoopIn(identifier, list_identifier, block)
-                elif self.tokenizer.next.type == "LBRACKET":
-                    list_node = self.parseList()
-                    block = self.parseBlock()
-                    # Criar uma variável temporária para a lista
-                    temp_var = f"_temp_list_{id(list_node)}"
-                    return Block([
-                        Declaration([Identifier(temp_var), list_node]),
-                        LoopIn(identifier, temp_var, block)
-                    ])
+        if self.current != T_THEN:
+            raise ValueError(f"Espera-se THEN, obteve {self.currentName()}")
+        self.selectNext()
+        self.openBlock(lambda then_block: self.parseElse(start, condition, then_block))
+
+    def parseElse(self, start: int, condition: Node, then_block: Block) -> Node | None:
+        if self.current == T_ELSE:
+            self.selectNext()
+            self.openBlock(lambda else_block: self.locate(Conditional([condition, then_block, else_block]), start))
+            return None
+        return self.locate(Conditional([condition, then_block]), start)
+
+    def parseLoop(self) -> None:
+        start = self.position
+        if self.current != T_GROW:
+            raise ValueError(f"Espera-se GROW, obteve {self.currentName()}")
+        self.selectNext()
+        if self.current == T_IDENTIFIER:
+            identifier = self.currentValue()
+            self.selectNext()
+            if self.current == T_IN:
+                self.selectNext()
+                # 'range' só é especial seguido de parênteses; continua valendo como nome de variável
+                if self.current == T_IDENTIFIER and self.currentValue() == "range" \
+                        and self.tokens.types[self.position + 1] == T_LPAREN:
+                    source = self.parseRange()
+                elif self.current == T_IDENTIFIER:
+                    source = self.locate(Identifier(self.currentValue()), self.position)
+                    self.selectNext()
+                elif self.current == T_LBRACKET:
+                    # A lista literal é percorrida direto, sem uma variável temporária
+                    source = self.parseList()
                 else:
-                    raise ValueError(f"Espera-se IDENTIFIER ou LBRACKET, obteve {self.tokenizer.next.type}")
+                    raise ValueError(f"Espera-se IDENTIFIER ou LBRACKET, obteve {self.currentName()}")
+                self.openBlock(lambda block: self.locate(LoopIn(identifier, source, block), start))
             else:
-                raise ValueError(f"Espera-se IN, obteve {self.tokenizer.next.type}")
-        elif self.tokenizer.next.type == "WHILE":
-            self.tokenizer.selectNext()
+                raise ValueError(f"Espera-se IN, obteve {self.currentName()}")
+        elif self.current == T_WHILE:
+            self.selectNext()
             condition = self.parseCondition()
-            block = self.parseBlock()
-            return LoopWhile([condition, block])
+            self.openBlock(lambda block: self.locate(LoopWhile([condition, block]), start))
         else:
-            raise ValueError(f"Espera-se IDENTIFIER ou WHILE, obteve {self.tokenizer.next.type}")
+            raise ValueError(f"Espera-se IDENTIFIER ou WHILE, obteve {self.currentName()}")
+
+    def parseRange(self) -> Node:
+        start = self.position
+        self.selectNext()
+        if self.current != T_LPAREN:
+            raise ValueError(f"Espera-se LPAREN, obteve {self.currentName()}")
+        self.selectNext()
+        first = self.parseExpression()
+        if self.current != T_COMMA:
+            raise ValueError(f"Espera-se COMMA, obteve {self.currentName()}")
+        self.selectNext()
+        last = self.parseExpression()
+        if self.current != T_RPAREN:
+            raise ValueError(f"Espera-se RPAREN, obteve {self.currentName()}")
+        self.selectNext()
+        return self.locate(RangeVal([first, last]), start)
+
+    def parseReduction(self) -> Node:
+        start = self.position
+        name = self.currentValue()
+        self.selectNext()
+        self.selectNext()
+        value = self.parseExpression()
+        if self.current != T_RPAREN:
+            raise ValueError(f"Espera-se RPAREN, obteve {self.currentName()}")
+        self.selectNext()
+        return self.locate(Reduction(name, [value]), start)
 
     def parsePrint(self) -> Node:
-        if self.tokenizer.next.type != "PRINT":
-            raise ValueError(f"Espera-se PRINT, obteve {self.tokenizer.next.type}")
-        self.tokenizer.selectNext()
-        if self.tokenizer.next.type in ["STRING", "NUMBER", "IDENTIFIER", "LPAREN", "LBRACKET"]:
-            if self.tokenizer.next.type == "LBRACKET":
-                expr = self.parseList()
-            else:
-                expr = self.parseValue()
-            return Print([expr])
-        raise ValueError(f"Espera-se STRING, NUMBER, IDENTIFIER, LPAREN ou LBRACKET, obteve {self.tokenizer.next.type}")
-
-    def parseStatement(self) -> Node:
-        if self.tokenizer.next.type == "NEWLINE":
-            self.tokenizer.selectNext()
-            return Node("noop", [])
-        elif self.tokenizer.next.type == "SEED":
+        if self.current != T_PRINT:
+            raise ValueError(f"Espera-se PRINT, obteve {self.currentName()}")
+        self.selectNext()
+        if self.current in (T_STRING, T_NUMBER, T_IDENTIFIER, T_LPAREN, T_LBRACKET):
+            return Print([self.parseValue()])
+        raise ValueError(f"Espera-se STRING, NUMBER, IDENTIFIER, LPAREN ou LBRACKET, obteve {self.currentName()}")
+
+    def parseStatement(self) -> Node | None:
+        # Instruções com bloco só leem o cabeçalho e abrem o bloco; devolvem None
+        start = self.position
+        if self.current == T_NEWLINE:
+            self.selectNext()
+            return self.locate(Node("noop", NO_CHILDREN), start)
+        elif self.current == T_SEED:
             result = self.parseDeclaration()
-            if self.tokenizer.next.type in ["NEWLINE", "EOF", "PRINT", "GROW", "BRANCH", "IDENTIFIER"]:
-                if self.tokenizer.next.type == "NEWLINE":
-                    self.tokenizer.selectNext()
+            if self.current in (T_NEWLINE, T_EOF, T_PRINT, T_GROW, T_BRANCH, T_IDENTIFIER):
+                if self.current == T_NEWLINE:
+                    self.selectNext()
             else:
-                raise ValueError(f"Espera-se NEWLINE, EOF, PRINT, GROW, BRANCH ou IDENTIFIER, obteve {self.tokenizer.next.type}")
-        elif self.tokenizer.next.type == "IDENTIFIER":
+                raise ValueError(f"Espera-se NEWLINE, EOF, PRINT, GROW, BRANCH ou IDENTIFIER, obteve {self.currentName()}")
+        elif self.current == T_IDENTIFIER:
             result = self.parseAssignment()
-            if self.tokenizer.next.type in ["NEWLINE", "EOF"]:
-                if self.tokenizer.next.type == "NEWLINE":
-                    self.tokenizer.selectNext()
+            if self.current in (T_NEWLINE, T_EOF):
+                if self.current == T_NEWLINE:
+                    self.selectNext()
             else:
-                raise ValueError(f"Espera-se NEWLINE ou EOF, obteve {self.tokenizer.next.type}")
-        elif self.tokenizer.next.type == "BRANCH":
+                raise ValueError(f"Espera-se NEWLINE ou EOF, obteve {self.currentName()}")
+        elif self.current == T_BRANCH:
             result = self.parseConditional()
-        elif self.tokenizer.next.type == "GROW":
+        elif self.current == T_GROW:
             result = self.parseLoop()
-        elif self.tokenizer.next.type == "PRINT":
+        elif self.current == T_PRINT:
             result = self.parsePrint()
-            if self.tokenizer.next.type in ["NEWLINE", "EOF"]:
-                if self.tokenizer.next.type == "NEWLINE":
-                    self.tokenizer.selectNext()
+            if self.current in (T_NEWLINE, T_EOF):
+                if self.current == T_NEWLINE:
+                    self.selectNext()
             else:
-                raise ValueError(f"Espera-se NEWLINE ou EOF, obteve {self.tokenizer.next.type}")
+                raise ValueError(f"Espera-se NEWLINE ou EOF, obteve {self.currentName()}")
         else:
-            raise ValueError(f"Espera-se SEED, IDENTIFIER, BRANCH, GROW, PRINT ou NEWLINE, obteve {self.tokenizer.next.type}")
-        return result
+            raise ValueError(f"Espera-se SEED, IDENTIFIER, BRANCH, GROW, PRINT ou NEWLINE, obteve {self.currentName()}")
+        return result if result is None else self.locate(result, start)
 
-    def parseBlock(self) -> Node:
-        if self.tokenizer.next.type != "LBRACE":
-            raise ValueError(f"Espera-se LBRACE, obteve {self.tokenizer.next.type}")
-        self.tokenizer.selectNext()
-        if self.tokenizer.next.type != "NEWLINE":
-            raise ValueError(f"Espera-se NEWLINE, obteve {self.tokenizer.next.type}")
-        self.tokenizer.selectNext()
-        children = []
-        while self.tokenizer.next.type != "RBRACE":
-            children.append(self.parseStatement())
-        self.tokenizer.selectNext()
-        if self.tokenizer.next.type not in ["NEWLINE", "EOF", "ELSE"]:
-            raise ValueError(f"Espera-se NEWLINE, EOF ou ELSE, obteve {self.tokenizer.next.type}")
-        if self.tokenizer.next.type == "NEWLINE":
-            self.tokenizer.selectNext()
+    def openBlock(self, build: Callable[[Block], Node | None]) -> None:
+        if self.current != T_LBRACE:
+            raise ValueError(f"Espera-se LBRACE, obteve {self.currentName()}")
+        self.selectNext()
+        if self.current != T_NEWLINE:
+            raise ValueError(f"Espera-se NEWLINE, obteve {self.currentName()}")
+        self.selectNext()
+        self.blocks.append(([], build))
+
+    def closeBlock(self, children: List[Node]) -> Block:
+        self.selectNext()
+        if self.current not in (T_NEWLINE, T_EOF, T_ELSE):
+            raise ValueError(f"Espera-se NEWLINE, EOF ou ELSE, obteve {self.currentName()}")
+        if self.current == T_NEWLINE:
+            self.selectNext()
         return Block(children)
 
-    def parseProgram(self) -> Node:
-        children = []
-        while self.tokenizer.next.type != "EOF":
-            if self.tokenizer.next.type == "NEWLINE":
-                self.tokenizer.selectNext()
+    def parseProgram(self, nested: bool = False) -> Node:
+        # Os blocos abertos ficam em self.blocks em vez da pilha de chamadas, então o
+        # aninhamento de branch/grow não tem limite de profundidade. Com nested, o código é um
+        # trecho do corpo de um bloco: linhas vazias viram instruções noop, como dentro de chaves
+        program = []
+        self.blocks = [(program, None)]
+        while len(self.blocks) > 1 or self.current != T_EOF:
+            children, build = self.blocks[-1]
+            if build is None and not nested and self.current == T_NEWLINE:
+                self.selectNext()
                 continue
-            children.append(self.parseStatement())
-        return Block(children)
+            if build is not None and self.current == T_RBRACE:
+                self.blocks.pop()
+                result = build(self.closeBlock(children))
+            else:
+                result = self.parseStatement()
+            if result is not None:
+                self.blocks[-1][0].append(result)
+        return Block(program)
+
+    def statements(self, lines: Iterable[str]) -> Iterator[Node]:
+        # Modo streaming: junta linhas até fechar chaves e strings abertas e analisa cada grupo,
+        # entregando as instruções de nível superior uma a uma
+        pending = []
+        depth = 0
+        in_string = False
+        for line in lines:
+            pending.append(line)
+            for index, part in enumerate(line.split('"')):
+                if index:
+                    in_string = not in_string
+                if not in_string:
+                    # Chaves e aspas depois de '//' fazem parte do comentário
+                    part, comment, _ = part.partition("//")
+                    depth += part.count("{") - part.count("}")
+                    if comment:
+                        break
+            if depth <= 0 and not in_string and line.endswith("\n"):
+                yield from self.run("".join(pending)).children
+                pending.clear()
+                depth = 0
+        if pending:
+            yield from self.run("".join(pending).rstrip()).children
 
     def run(self, code: str) -> Node:
-        self.tokenizer = Tokenizer(code)
-        result = self.parseProgram()
-        if self.tokenizer.next.type != "EOF":
-            raise ValueError(f"Espera-se EOF, obteve {self.tokenizer.next.type}")
+        return self.parseTokens(Lexer.tokenize(code))
+
+    def parseTokens(self, tokens: TokenArray, nested: bool = False) -> Node:
+        self.tokens = tokens
+        self.position = 0
+        self.current = self.tokens.types[0]
+        result = self.parseProgram(nested)
+        if self.current != T_EOF:
+            raise ValueError(f"Espera-se EOF, obteve {self.currentName()}")
         return result
 
+# Análise incremental
+# Para editores e recarga ao vivo: a árvore é mantida entre as edições do código, e cada edição
+# reanalisa só as instruções que alcança, no bloco mais interno que a contém. Os trechos do
+# código ficam em tabelas à parte, como as posições do Parser, em vez de um slot em todos os
+# nós: cada bloco guarda onde o seu conteúdo começa em relação ao início da instrução dona, o
+# tamanho desse conteúdo e o tamanho do trecho de cada filho. O trecho de uma instrução vai do
+# seu primeiro token até o início da seguinte, com espaços, comentários e linhas vazias.
+# Para achar o filho onde cai uma edição sem somar todos os trechos anteriores, os tamanhos
+# também são somados em grupos de SPAN_GROUP filhos.
+SPAN_GROUP = 256
+
+class IncrementalParser:
+    BRACES = re.compile(b"[" + re.escape(bytes([T_LBRACE])) + re.escape(bytes([T_RBRACE])) + b"]")
+
+    def __init__(self, source: str = ""):
+        self.source = ""
+        self.tree: Block | None = None
+        # Bloco -> [início do conteúdo, tamanho do conteúdo, tamanho do trecho de cada filho,
+        # soma de cada grupo de filhos ou None, recalculada quando for usada]
+        self.spans: dict = {}
+        # Instruções cujo trecho não termina em quebra de linha (como o 'seed' de
+        # 'seed x = 1 print x'): a análise delas depende do que vem depois
+        self.open: set = set()
+        # Caracteres analisados na última edição
+        self.reparsed = 0
+        self.edit(0, 0, source)
+
+    def edit(self, offset: int, removed: int, inserted: str) -> Block:
+        # Troca 'removed' caracteres a partir de 'offset' por 'inserted' e devolve a árvore. Se
+        # as instruções alcançadas não formam instruções completas sozinhas, a análise sobe um
+        # bloco, até o programa inteiro; erros de sintaxe deixam a árvore como None
+        if offset < 0 or removed < 0 or offset + removed > len(self.source):
+            raise ValueError("Edição fora do código-fonte")
+        path = self.locate(offset, removed) if self.tree is not None else []
+        self.source = self.source[:offset] + inserted + self.source[offset + removed:]
+        delta = len(inserted) - removed
+        for depth in range(len(path) - 1, -1, -1):
+            if self.replace(path[depth], delta):
+                for block, _, index, _, _, _, body in path[:depth]:
+                    span = self.spans[block]
+                    span[1] += delta
+                    span[2][index] += delta
+                    if span[3] is not None:
+                        span[3][index // SPAN_GROUP] += delta
+                    bodies = [child for child in block.children[index].children if isinstance(child, Block)]
+                    for later in bodies[bodies.index(body) + 1:]:
+                        self.spans[later][0] += delta
+                return self.tree
+        self.load()
+        return self.tree
+
+    def copy(self) -> Node:
+        # O Resolver e o TypeChecker alteram os nós; quem executa a árvore recebe uma cópia e
+        # a do documento continua reaproveitável nas próximas edições
+        return AstCodec.build(AstCodec.records(self.tree))
+
+    def load(self) -> None:
+        self.tree = None
+        self.spans, self.open = {}, set()
+        tokens = Lexer.tokenize(self.source)
+        positions: dict = {}
+        tree = Parser(positions).parseTokens(tokens)
+        spans, opened, lengths = self.measure(tree.children, tokens, positions, self.source)
+        spans[tree] = [0, len(self.source), lengths, None]
+        self.spans, self.open, self.tree = spans, opened, tree
+        self.reparsed = len(self.source)
+
+    def locate(self, offset: int, removed: int) -> List[list]:
+        # Do programa até o bloco mais interno cujo conteúdo contém a edição inteira; cada nível
+        # é [bloco, se é aninhado, primeiro e último filho alcançados, início e fim do trecho
+        # deles, corpo do filho onde a busca desceu]
+        path = []
+        block, content, nested = self.tree, 0, False
+        while True:
+            _, size, lengths, _ = self.spans[block]
+            children = block.children
+            if not children:
+                path.append([block, nested, 0, -1, content, content + size, None])
+                return path
+            first, start = self.child(block, content, offset)
+            last, end = first, start
+            if removed:
+                last, end = self.child(block, content, offset + removed - 1)
+            end += lengths[last]
+            while first > 0 and children[first - 1] in self.open:
+                first -= 1
+                start -= lengths[first]
+            level = [block, nested, first, last, start, end, None]
+            path.append(level)
+            if first != last:
+                return path
+            for body in children[first].children:
+                if isinstance(body, Block):
+                    head, body_size, _, _ = self.spans[body]
+                    if start + head <= offset and offset + removed <= start + head + body_size:
+                        level[6] = body
+                        block, content, nested = body, start + head, True
+                        break
+            else:
+                return path
+
+    def child(self, block: Block, content: int, position: int) -> Tuple[int, int]:
+        # Índice e início do filho cujo trecho contém 'position' (o último, se passar do fim):
+        # primeiro o grupo de filhos, depois o filho dentro dele
+        span = self.spans[block]
+        lengths = span[2]
+        if span[3] is None:
+            span[3] = [sum(lengths[start:start + SPAN_GROUP]) for start in range(0, len(lengths), SPAN_GROUP)]
+        bounds = list(accumulate(span[3], initial=content))
+        group = min(max(bisect_right(bounds, position) - 1, 0), len(span[3]) - 1)
+        first = group * SPAN_GROUP
+        bounds = list(accumulate(lengths[first:first + SPAN_GROUP], initial=bounds[group]))
+        index = min(max(bisect_right(bounds, position) - 1, 0), len(bounds) - 2)
+        return first + index, bounds[index]
+
+    def replace(self, level: list, delta: int) -> bool:
+        # Reanalisa os filhos alcançados num nível; False se o trecho novo não é uma sequência de
+        # instruções completa. O estado só muda depois que a análise dá certo
+        block, nested, first, last, start, end, _ = level
+        span = self.spans[block]
+        size, lengths = span[1], span[2]
+        children = block.children
+        while True:
+            text = self.source[start:end + delta]
+            if not self.separate(text, end + delta):
+                # A edição muda a leitura do que vem depois (um comentário que perdeu a quebra de
+                # linha engole a instrução seguinte, por exemplo): o trecho inclui a próxima
+                if last + 1 < len(children):
+                    last += 1
+                    end += lengths[last]
+                    continue
+                return False
+            try:
+                tokens = Lexer.tokenize(text)
+                positions: dict = {}
+                nodes = Parser(positions).parseTokens(tokens, nested).children
+            except ValueError:
+                return False
+            if not nodes and text and (first > 0 or last + 1 < len(children)):
+                # Só espaços e comentários: o trecho passa a fazer parte de uma instrução vizinha
+                if first > 0:
+                    first -= 1
+                    start -= lengths[first]
+                else:
+                    last += 1
+                    end += lengths[last]
+                continue
+            spans, opened, new_lengths = self.measure(nodes, tokens, positions, text)
+            if nodes and nodes[-1] in opened:
+                if last + 1 < len(children):
+                    last += 1
+                    end += lengths[last]
+                    continue
+                if nested:
+                    return False
+            break
+        self.reparsed = len(text)
+        self.forget(children[first:last + 1])
+        same = len(nodes) == last + 1 - first
+        children[first:last + 1] = nodes
+        lengths[first:last + 1] = new_lengths
+        if span[3] is not None and same:
+            for group in range(first // SPAN_GROUP, last // SPAN_GROUP + 1):
+                span[3][group] = sum(lengths[group * SPAN_GROUP:(group + 1) * SPAN_GROUP])
+        else:
+            span[3] = None
+        span[1] = size + delta
+        self.spans.update(spans)
+        self.open |= opened
+        return True
+
+    def separate(self, text: str, position: int) -> bool:
+        # True se o código a partir de 'position' é lido da mesma forma logo depois de 'text' e
+        # sozinho. Basta conferir a primeira linha: depois de uma quebra de linha fora de
+        # strings e comentários, o Lexer volta ao mesmo estado (strings não terminadas em
+        # 'text' já são rejeitadas pelo Lexer)
+        following = self.source[position:self.source.find("\n", position) + 1 or len(self.source)]
+        pattern = Lexer.PATTERN
+        return pattern.findall(text + following) == pattern.findall(text) + pattern.findall(following)
+
+    def forget(self, nodes: List[Node]) -> None:
+        pending = list(nodes)
+        while pending:
+            node = pending.pop()
+            self.open.discard(node)
+            for child in node.children:
+                if isinstance(child, Block):
+                    del self.spans[child]
+                    pending.extend(child.children)
+
+    @staticmethod
+    def measure(nodes: List[Node], tokens: TokenArray, positions: dict,
+                text: str) -> Tuple[dict, set, array]:
+        # Trechos das instruções analisadas em 'text': (blocos internos, instruções abertas,
+        # tamanho do trecho de cada instrução de nodes)
+        types = tokens.types
+        offsets = Lexer.offsets(text)
+        offsets.append(len(text))
+        # As chaves abrem na mesma ordem em que os blocos aparecem numa pré-ordem da árvore
+        braces = []
+        unclosed = []
+        for match in IncrementalParser.BRACES.finditer(types.tobytes()):
+            if types[match.start()] == T_LBRACE:
+                unclosed.append(len(braces))
+                braces.append([match.start(), None])
+            else:
+                braces[unclosed.pop()][1] = match.start()
+        pairs = iter(braces)
+        owned: dict = {}
+        walk: List[Node] = nodes[::-1]
+        while walk:
+            node = walk.pop()
+            if isinstance(node, Block):
+                owned[node] = next(pairs)
+                walk.extend(reversed(node.children))
+            else:
+                walk.extend(reversed([child for child in node.children if isinstance(child, Block)]))
+        spans: dict = {}
+        opened: set = set()
+
+        def bounds(children: List[Node], start: int, stop: int) -> List[int]:
+            # Limites dos trechos dos filhos entre 'start' e o token 'stop' que encerra o bloco
+            limits = [start]
+            for index, child in enumerate(children):
+                following = positions[children[index + 1]] if index + 1 < len(children) else stop
+                if types[following - 1] != T_NEWLINE:
+                    opened.add(child)
+                limits.append(offsets[following])
+            return limits
+
+        top = bounds(nodes, 0, len(types) - 1)
+        pending: List[Tuple[List[Node], List[int]]] = [(nodes, top)]
+        while pending:
+            children, limits = pending.pop()
+            for index, child in enumerate(children):
+                for body in child.children:
+                    if isinstance(body, Block):
+                        opening, closing = owned[body]
+                        start = offsets[opening + 1] + 1
+                        inner = bounds(body.children, start, closing)
+                        spans[body] = [start - limits[index], offsets[closing] - start,
+                                       array('q', map(operator.sub, inner[1:], inner[:-1])), None]
+                        pending.append((body.children, inner))
+        return spans, opened, array('q', map(operator.sub, top[1:], top[:-1]))
+
+# Resolução de variáveis
+DEFINITE, MAYBE = "definite", "maybe"
+
+def declares_variables(block: Node) -> bool:
+    # Blocos de condicionais compartilham o escopo de quem os contém; corpos de loops não
+    pending = list(block.children)
+    while pending:
+        node = pending.pop()
+        if isinstance(node, Declaration):
+            return True
+        if isinstance(node, (Block, Conditional)):
+            pending.extend(node.children)
+    return False
+
+class Resolver:
+    def __init__(self):
+        # Pilha de escopos estáticos: (layout, estado de declaração de cada nome, registro das
+        # mudanças no ramo de condicional sendo visitado, ou None fora de condicionais)
+        self.scopes: List[Tuple[FrameLayout, dict, list | None]] = []
+        # Método resolveX de cada classe de nó (None: visita só os filhos)
+        self.methods: dict = {}
+
+    def run(self, tree: Node) -> FrameLayout:
+        layout = self.start()
+        self.visit(tree)
+        tree.layout = layout
+        return layout
+
+    def start(self) -> FrameLayout:
+        # Escopo global; no modo streaming cada instrução é visitada nele à medida que chega
+        layout = FrameLayout()
+        self.scopes = [(layout, {}, None)]
+        return layout
+
+    def visit(self, node: Node) -> None:
+        # Percurso com pilha explícita: cada resolveX devolve, na ordem, os nós a visitar e as
+        # ações (funções sem argumentos) a executar entre eles
+        methods = self.methods
+        pending: List[Any] = [node]
+        while pending:
+            item = pending.pop()
+            if not isinstance(item, Node):
+                item()
+                continue
+            cls = type(item)
+            if cls not in methods:
+                methods[cls] = next((getattr(self, f"resolve{base.__name__}") for base in cls.__mro__
+                                     if hasattr(self, f"resolve{base.__name__}")), None)
+            method = methods[cls]
+            work = item.children if method is None else method(item)
+            pending.extend(reversed(work))
+        mark_deep(node)
+
+    def lookup(self, node: Identifier) -> None:
+        # Um nome declarado em todos os caminhos é resolvido estaticamente; se algum escopo
+        # mais interno só o declara em alguns caminhos, a busca fica para o tempo de execução
+        uncertain = False
+        for depth, (layout, state, _) in enumerate(reversed(self.scopes)):
+            status = state.get(node.value)
+            if status == DEFINITE and not uncertain:
+                node.depth, node.slot = depth, layout.names[node.value]
+                node.binding = (layout, node.slot)
+                return
+            if status is not None:
+                uncertain = True
+        if not uncertain:
+            raise ValueError(f"Variável '{node.value}' não definida")
+        node.depth, node.slot = None, None
+        node.binding = None
+
+    def resolveIdentifier(self, node: Identifier) -> list:
+        self.lookup(node)
+        return []
+
+    def resolveDeclaration(self, node: Declaration) -> list:
+        return [*node.children[1:], lambda: self.declare(node)]
+
+    def declare(self, node: Declaration) -> None:
+        target = node.children[0]
+        layout, state, _ = self.scopes[-1]
+        if state.get(target.value) == DEFINITE:
+            raise ValueError(f"Variável '{target.value}' já existe no escopo atual")
+        node.maybe_declared = state.get(target.value) == MAYBE
+        self.mark(target.value, DEFINITE)
+        target.depth, target.slot = 0, layout.slot(target.value)
+        target.binding = (layout, target.slot)
+
+    def resolveAssignment(self, node: Assignment) -> list:
+        return [node.children[1], lambda: self.lookup(node.children[0])]
+
+    def mark(self, name: str, status: str) -> None:
+        layout, state, log = self.scopes[-1]
+        if log is not None:
+            log.append((name, state.get(name)))
+        state[name] = status
+
+    def resolveConditional(self, node: Conditional) -> list:
+        # Os ramos declaram direto no estado do escopo, registrando o valor anterior de cada
+        # nome; ao sair do ramo o estado é restaurado, sem cópias nem camadas por aninhamento
+        layout, state, outer_log = self.scopes[-1]
+        branches = []
+
+        def enter() -> None:
+            self.scopes[-1] = (layout, state, [])
+
+        def leave() -> None:
+            log = self.scopes[-1][2]
+            branches.append({name: state[name] for name, _ in log})
+            for name, previous in reversed(log):
+                if previous is None:
+                    del state[name]
+                else:
+                    state[name] = previous
+
+        def merge() -> None:
+            self.scopes[-1] = (layout, state, outer_log)
+            if len(branches) == 1:
+                branches.append({})
+            for name in set().union(*branches):
+                both = all(branch.get(name, state.get(name)) == DEFINITE for branch in branches)
+                self.mark(name, DEFINITE if both else MAYBE)
+
+        work = [node.children[0]]
+        for block in node.children[1:]:
+            work.extend((enter, block, leave))
+        work.append(merge)
+        return work
+
+    def resolveLoopWhile(self, node: LoopWhile) -> list:
+        node.scoped = declares_variables(node.children[1])
+        if not node.scoped:
+            node.layout = None
+            return node.children
+        node.layout = FrameLayout()
+        return [node.children[0], lambda: self.scopes.append((node.layout, {}, None)),
+                node.children[1], self.scopes.pop]
+
+    def resolveLoopIn(self, node: LoopIn) -> list:
+        # O que o laço percorre é resolvido no escopo de fora, antes da variável do laço existir
+        node.scoped = declares_variables(node.children[1])
+        node.layout = FrameLayout()
+        node.layout.slot(node.identifier)
+        return [node.children[0], lambda: self.scopes.append((node.layout, {node.identifier: DEFINITE}, None)),
+                node.children[1], self.scopes.pop]
+
+    def resolveListVal(self, node: ListVal) -> list:
+        return node.value
+
+# Otimizador da AST
+LITERALS = (IntVal, StrVal)
+
+def count_nodes(tree: Node) -> int:
+    count = 0
+    pending = [tree]
+    while pending:
+        node = pending.pop()
+        count += 1
+        pending.extend(node.children)
+        if isinstance(node, ListVal):
+            pending.extend(node.value)
+    return count
+
+def literal(value: Any) -> Node:
+    # Concatenações dobradas acima de ROPE_MIN produzem um StrBuilder; na árvore, o valor de
+    # um StrVal é sempre str, como o que sai do parser
+    return IntVal(value) if isinstance(value, int) else StrVal(plain_str(value))
+
+class Optimizer:
+    # Passes aplicados em cada nível; o nível 2 repete dobra e poda sobre as constantes propagadas
+    LEVELS = {
+        0: (),
+        1: ("remove_noops", "fold_constants", "prune_branches"),
+        2: ("remove_noops", "fold_constants", "prune_branches",
+            "propagate_constants", "fold_constants", "prune_branches"),
+    }
+
+    def __init__(self, level: int = 2):
+        self.level = level
+        # (passe, nós removidos, nós reescritos) na ordem de execução
+        self.report: List[Tuple[str, int, int]] = []
+        self.rewrites = 0
+
+    def run(self, tree: Node) -> Node:
+        passes = {
+            "remove_noops": lambda tree: self.transform(tree, self.removeNoops),
+            "fold_constants": lambda tree: self.transform(tree, self.foldConstants),
+            "prune_branches": lambda tree: self.transform(tree, self.pruneBranches),
+            "propagate_constants": self.propagateConstants,
+        }
+        for name in Optimizer.LEVELS[self.level]:
+            before = count_nodes(tree)
+            self.rewrites = 0
+            tree = passes[name](tree)
+            self.report.append((name, before - count_nodes(tree), self.rewrites))
+        return tree
+
+    def transform(self, tree: Node, rewrite: Callable[[Node], Node]) -> Node:
+        # Reescrita de baixo para cima: os filhos já chegam otimizados ao passe. Os nós são
+        # reescritos em pós-ordem e os resultados se acumulam em 'done' na ordem original
+        done: List[Node] = []
+        for node in postorder(tree):
+            children = node.value if isinstance(node, ListVal) else node.children
+            if children:
+                first = len(done) - len(children)
+                if isinstance(node, ListVal):
+                    node.value = done[first:]
+                else:
+                    node.children = done[first:]
+                del done[first:]
+            done.append(rewrite(node))
+        return done[0]
+
+    def removeNoops(self, node: Node) -> Node:
+        if isinstance(node, Block):
+            node.children = [child for child in node.children if child.value != "noop"]
+        return node
+
+    @staticmethod
+    def constant(node: Node) -> Tuple[Any, str] | None:
+        # Valor de uma operação entre literais, ou None se ela depende de variáveis ou falha.
+        # Operações que falham ficam na árvore para que o erro ocorra durante a execução.
+        if not (isinstance(node, BinOp) and all(isinstance(child, LITERALS) for child in node.children)):
+            return None
+        left, right = node.children
+        try:
+            return BinOp.compute(node.value, left.value, value_type(left.value),
+                                 right.value, value_type(right.value))
+        except ValueError:
+            return None
+
+    def foldConstants(self, node: Node) -> Node:
+        if isinstance(node, BinOp) and node.value in ("+", "-", "*", "/"):
+            folded = Optimizer.constant(node)
+            if folded is not None:
+                self.rewrites += 1
+                return literal(folded[0])
+        return node
+
+    def pruneBranches(self, node: Node) -> Node:
+        # Condicionais e loops com condição constante; os blocos de uma condicional
+        # compartilham o escopo de quem a contém, então o ramo escolhido é incorporado ao bloco
+        if not isinstance(node, Block):
+            return node
+        children = []
+        for child in node.children:
+            if isinstance(child, Conditional):
+                condition = Optimizer.constant(child.children[0])
+                if condition is not None:
+                    self.rewrites += 1
+                    if condition[0]:
+                        children.extend(child.children[1].children)
+                    elif len(child.children) == 3:
+                        children.extend(child.children[2].children)
+                    continue
+            elif isinstance(child, LoopWhile):
+                condition = Optimizer.constant(child.children[0])
+                if condition is not None and not condition[0]:
+                    self.rewrites += 1
+                    continue
+            children.append(child)
+        node.children = children
+        return node
+
+    def propagateConstants(self, tree: Node) -> Node:
+        Resolver().run(tree)
+        declarations = {}
+        names = {}
+        assigned = set()
+        assigned_names = set()
+        targets = set()
+        pending = [tree]
+        while pending:
+            node = pending.pop()
+            pending.extend(node.children)
+            if isinstance(node, ListVal):
+                pending.extend(node.value)
+            if isinstance(node, Declaration):
+                target = node.children[0]
+                targets.add(id(target))
+                value = node.children[1] if len(node.children) == 2 else None
+                declarations.setdefault(target.binding, []).append(value)
+                names[target.binding] = target.value
+            elif isinstance(node, Assignment):
+                target = node.children[0]
+                targets.add(id(target))
+                if target.binding is None:
+                    assigned_names.add(target.value)
+                else:
+                    assigned.add(target.binding)
+        # Um seed só é propagado se tem um valor literal e nenhuma atribuição pode alcançá-lo
+        constants = {}
+        for binding, values in declarations.items():
+            if (len(values) == 1 and isinstance(values[0], LITERALS)
+                    and binding not in assigned and names[binding] not in assigned_names):
+                constants[binding] = values[0].value
+
+        def substitute(node: Node) -> Node:
+            if isinstance(node, Identifier) and id(node) not in targets and node.binding in constants:
+                self.rewrites += 1
+                return literal(constants[node.binding])
+            return node
+
+        return self.transform(tree, substitute)
+
+# Inferência de tipos
+# Tipos estáticos usam os mesmos nomes de value_type; None é um tipo desconhecido e NEVER
+# marca expressões cujo valor ainda não foi produzido durante o cálculo do ponto fixo.
+NEVER = "never"
+# Valores de exemplo para verificar operações entre tipos conhecidos sem executar o programa
+TYPE_SAMPLES = {"int": 1, "str": "", "list": [], "none": None}
+# Nome do tipo Python usado na mensagem de erro do loop 'in'
+PYTHON_TYPE_NAMES = {"int": "int", "str": "str", "none": "NoneType"}
+
+class IntBinOp(BinOp):
+    __slots__ = ()
+
+    # Operação aritmética entre inteiros comprovados; 'func' é preenchido pelo TypeChecker
+    def evaluate(self, st: SymbolTable) -> Tuple[int, str]:
+        return (self.func(self.children[0].fetch(st), self.children[1].fetch(st)), "int")
+
+    def fetch(self, st: SymbolTable) -> int:
+        return self.func(self.children[0].fetch(st), self.children[1].fetch(st))
+
+class ConcatBinOp(BinOp):
+    __slots__ = ()
+
+    def evaluate(self, st: SymbolTable) -> Tuple[str, str]:
+        value = concat(self.children[0].fetch(st), self.children[1].fetch(st))
+        if st.runtime.budget is not None:
+            st.runtime.budget.size(value)
+        return (value, "str")
+
+    def fetch(self, st: SymbolTable) -> str:
+        value = concat(self.children[0].fetch(st), self.children[1].fetch(st))
+        if st.runtime.budget is not None:
+            st.runtime.budget.size(value)
+        return value
+
+class CompareBinOp(BinOp):
+    __slots__ = ()
+
+    # Comparação entre operandos de mesmo tipo comprovado
+    def evaluate(self, st: SymbolTable) -> Tuple[bool, str]:
+        return (self.func(self.children[0].fetch(st), self.children[1].fetch(st)), "bool")
+
+    def fetch(self, st: SymbolTable) -> bool:
+        return self.func(self.children[0].fetch(st), self.children[1].fetch(st))
+
+class TypedIdentifier(Identifier):
+    __slots__ = ()
+
+    # Variável resolvida estaticamente cujo tipo ('type') nunca muda
+    def evaluate(self, st: SymbolTable) -> Tuple[Any, str]:
+        if self.depth == 0:
+            return (st.slots[self.slot], self.type)
+        return (st.load(self.depth, self.slot), self.type)
+
+    def fetch(self, st: SymbolTable) -> Any:
+        if self.depth == 0:
+            return st.slots[self.slot]
+        return st.load(self.depth, self.slot)
+
+class TypedConditional(Conditional):
+    __slots__ = ()
+
+    def evaluate(self, st: SymbolTable) -> Tuple[None, str]:
+        if self.children[0].fetch(st):
+            return self.children[1].evaluate(st)
+        elif len(self.children) == 3:
+            return self.children[2].evaluate(st)
+        return (None, "none")
+
+class TypedLoopWhile(LoopWhile):
+    __slots__ = ()
+
+    def evaluate(self, st: SymbolTable) -> Tuple[None, str]:
+        condition, body = self.children
+        budget = st.runtime.budget
+        while condition.fetch(st):
+            if budget is not None:
+                budget.step()
+            body.evaluate(st.child(self.layout) if self.scoped else st)
+        return (None, "none")
+
+# Desligado, os loops contadores seguem como TypedLoopWhile, avaliando condição e incremento
+COUNTED_LOOPS = True
+
+class CountedLoopWhile(TypedLoopWhile):
+    __slots__ = ()
+
+    # 'grow while i < N' (ou <=) cujo corpo termina com 'i = i + passo' e não altera i nem N
+    # em outro lugar: percorre um range do Python sem avaliar a condição nem o incremento.
+    # 'counted' guarda (passo, se o limite é inclusivo, instruções do corpo sem o incremento);
+    # o contador é gravado no seu escopo a cada iteração e, ao final, recebe o valor que
+    # encerraria o loop original
+    def plan(self, st: SymbolTable) -> Tuple[List[Any], int, range]:
+        counter, bound = self.children[0].children
+        step, inclusive = self.counted[0], self.counted[1]
+        frame = st
+        for _ in range(counter.depth):
+            frame = frame.parent
+        end = bound.fetch(st) + 1 if inclusive else bound.fetch(st)
+        return frame.slots, counter.slot, range(frame.slots[counter.slot], end, step)
+
+    def evaluate(self, st: SymbolTable) -> Tuple[None, str]:
+        slots, slot, values = self.plan(st)
+        statements, layout, budget = self.counted[2], self.layout, st.runtime.budget
+        for value in values:
+            if budget is not None:
+                budget.step()
+            slots[slot] = value
+            body_st = st.child(layout) if self.scoped else st
+            for statement in statements:
+                statement.evaluate(body_st)
+        if values:
+            slots[slot] = values[-1] + values.step
+        return (None, "none")
+
+    def steps(self, st: SymbolTable) -> Iterator[Tuple[Node, SymbolTable]]:
+        slots, slot, values = self.plan(st)
+        statements, layout, budget = self.counted[2], self.layout, st.runtime.budget
+        for value in values:
+            if budget is not None:
+                budget.step()
+            slots[slot] = value
+            body_st = st.child(layout) if self.scoped else st
+            for statement in statements:
+                yield (statement, body_st)
+        if values:
+            slots[slot] = values[-1] + values.step
+        return (None, "none")
+
+# Loops 'in' paralelos
+# Com Runtime.jobs > 1, um loop 'in' cujas iterações não dependem umas das outras divide a lista
+# em PARALLEL_CHUNKS pedaços por processo. Cada processo recebe o corpo e os valores de fora que
+# ele lê, executa o seu pedaço com o motor tree e devolve o que foi impresso; a saída é escrita
+# na ordem original. Listas com menos de PARALLEL_MIN elementos não compensam o envio.
+PARALLEL_MIN = 256
+PARALLEL_CHUNKS = 4
+
+def parallel_chunk(payload: bytes, items: list | range) -> Tuple[List[str], Exception | None]:
+    # Executa no processo do pool; para no primeiro erro, devolvendo a saída até ele
+    block, layout, scoped, frames = pickle.loads(payload)
+    sink = CaptureSink()
+    st = None
+    for frame_layout, slots in frames:
+        st = Frame(frame_layout, st, runtime=Runtime(sink))
+        st.slots = slots
+    try:
+        loop_st = Frame(layout, st)
+        for item in items:
+            if scoped:
+                loop_st = Frame(layout, st)
+            loop_st.slots[0] = item
+            execute(block, loop_st)
+    except Exception as error:
+        return sink.parts, error
+    return sink.parts, None
+
+class ParallelLoopIn(LoopIn):
+    __slots__ = ()
+
+    # Loop 'in' cujo corpo só atribui a variáveis declaradas dentro dele. 'reads' guarda, por
+    # layout de fora, os slots que o corpo lê, ou é None quando algum nome é resolvido só em
+    # tempo de execução e os escopos vão inteiros
+    def spread(self, st: Frame, values: list | range) -> bool:
+        # Executa o loop no pool de processos; False se ele deve rodar aqui mesmo
+        runtime = st.runtime
+        # Os limites de execução são contados neste processo, então o loop não é dividido
+        if runtime.jobs < 2 or runtime.budget is not None or len(values) < PARALLEL_MIN:
+            return False
+        frames = []
+        frame = st
+        while frame is not None:
+            if self.reads is None:
+                slots = list(frame.slots)
+            else:
+                slots = [UNDEFINED] * len(frame.slots)
+                for slot in self.reads.get(frame.layout, ()):
+                    slots[slot] = frame.slots[slot]
+            frames.append((frame.layout, slots))
+            frame = frame.parent
+        frames.reverse()
+        try:
+            payload = pickle.dumps((self.children[1], self.layout, self.scoped, frames),
+                                   protocol=pickle.HIGHEST_PROTOCOL)
+        except (RecursionError, pickle.PicklingError, TypeError, AttributeError):
+            return False
+        size = -(-len(values) // (runtime.jobs * PARALLEL_CHUNKS))
+        chunks = (values[start:start + size] for start in range(0, len(values), size))
+        output = runtime.output
+        for parts, error in runtime.workers().imap(partial(parallel_chunk, payload), chunks):
+            for part in parts:
+                output.write(part[:-1])
+            if error is not None:
+                raise error
+        return True
+
+    def evaluate(self, st: SymbolTable) -> Tuple[None, str]:
+        values = LoopIn.iterable(self.children[0].fetch(st))
+        if self.spread(st, values):
+            return (None, "none")
+        return self.loop(st, values)
+
+    def steps(self, st: SymbolTable) -> Iterator[Tuple[Node, SymbolTable]]:
+        value, _ = yield (self.children[0], st)
+        values = LoopIn.iterable(value)
+        if self.spread(st, values):
+            return (None, "none")
+        return (yield from self.loopSteps(st, values))
+
+class IntRangeVal(RangeVal):
+    __slots__ = ()
+
+    # range(...) com limites inteiros comprovados
+    def evaluate(self, st: SymbolTable) -> Tuple[range, str]:
+        return (range(self.children[0].fetch(st), self.children[1].fetch(st)), "range")
+
+    def fetch(self, st: SymbolTable) -> range:
+        return range(self.children[0].fetch(st), self.children[1].fetch(st))
+
+# Classe genérica de cada nó especializado; o TypeChecker parte dela ao verificar de novo uma
+# árvore já especializada, como depois do Optimizer
+GENERIC_CLASSES = {
+    IntBinOp: BinOp, ConcatBinOp: BinOp, CompareBinOp: BinOp, TypedIdentifier: Identifier,
+    TypedConditional: Conditional, TypedLoopWhile: LoopWhile, CountedLoopWhile: LoopWhile,
+    ParallelLoopIn: LoopIn, IntRangeVal: RangeVal,
+}
+
+class TypeChecker:
+    def __init__(self):
+        # Tipo de cada declaração (layout, slot); ausente enquanto nenhum valor foi atribuído
+        self.types: dict = {}
+        # Declarações de cada nome, alvos possíveis de atribuições resolvidas pelo nome
+        self.declared: dict = {}
+        # Tipos já calculados de operações aritméticas, válido só depois do ponto fixo (durante specialize)
+        self.arithmetic: dict | None = None
+        # Árvore em especialização e, calculadas sob demanda, as atribuições de cada variável
+        self.root: Node | None = None
+        self.writes: Tuple[dict, dict] | None = None
+        # Acessos de cada loop 'in' já visitado a variáveis de fora dele, durante specialize
+        self.loops: dict | None = None
+
+    def run(self, tree: Node) -> None:
+        # Requer uma árvore resolvida. Cada declaração recebe a junção dos tipos de todos os
+        # valores que podem ser atribuídos a ela; o ponto fixo trata atribuições como
+        # 'n = n + 1', cujo tipo depende do próprio nome. No modo streaming é chamado uma vez
+        # por instrução e os tipos se acumulam entre as chamadas.
+        writes = []
+        dynamic = []
+        pending = [tree]
+        while pending:
+            node = pending.pop()
+            pending.extend(node.children)
+            if isinstance(node, Declaration):
+                target = node.children[0]
+                self.declared.setdefault(target.value, []).append(target.binding)
+                writes.append((target.binding, node.children[1] if len(node.children) == 2 else None))
+            elif isinstance(node, Assignment):
+                target = node.children[0]
+                if target.binding is None:
+                    dynamic.append((target.value, node.children[1]))
+                else:
+                    writes.append((target.binding, node.children[1]))
+            elif isinstance(node, LoopIn):
+                # Os elementos das listas não têm tipo estático; os de um range são inteiros
+                binding = (node.layout, 0)
+                self.declared.setdefault(node.identifier, []).append(binding)
+                self.types[binding] = "int" if isinstance(node.children[0], RangeVal) else None
+        for name, value in dynamic:
+            writes.extend((binding, value) for binding in self.declared.get(name, ()))
+        changed = True
+        while changed:
+            changed = False
+            for binding, value in writes:
+                value_type = self.typeOf(value) if value is not None else "none"
+                if value_type == NEVER:
+                    continue
+                current = self.types.get(binding, NEVER)
+                joined = value_type if current in (NEVER, value_type) else None
+                if joined != current:
+                    self.types[binding] = joined
+                    changed = True
+        self.specialize(tree)
+
+    def typeOf(self, node: Node) -> str | None:
+        if isinstance(node, IntVal):
+            return "int"
+        if isinstance(node, StrVal):
+            return "str"
+        if isinstance(node, ListVal):
+            return "list"
+        if isinstance(node, RangeVal):
+            return "range"
+        if isinstance(node, Reduction):
+            return "int"
+        if isinstance(node, Identifier):
+            return None if node.binding is None else self.types.get(node.binding, NEVER)
+        if isinstance(node, BinOp):
+            if node.value not in ("+", "-", "*", "/"):
+                return "bool"
+            return self.arithmeticType(node)
+        return None
+
+    @staticmethod
+    def combine(op: str, left: str | None, right: str | None) -> str | None:
+        if NEVER in (left, right):
+            return NEVER
+        # Com uma lista, a operação vale elemento a elemento e o resultado é outra lista
+        if "list" in (left, right):
+            return "list"
+        if left == right and (left == "int" or (left == "str" and op == "+")):
+            return left
+        return None
+
+    def arithmeticType(self, node: BinOp) -> str | None:
+        # Operações aninhadas são percorridas com pilha explícita; os demais operandos vêm de typeOf
+        memo = self.arithmetic
+        types = []
+        pending = [(node, False)]
+        while pending:
+            item, ready = pending.pop()
+            if ready:
+                right, left = types.pop(), types.pop()
+                types.append(TypeChecker.combine(item.value, left, right))
+                if memo is not None:
+                    memo[id(item)] = types[-1]
+            elif memo is not None and id(item) in memo:
+                types.append(memo[id(item)])
+            elif isinstance(item, BinOp) and item.value in ("+", "-", "*", "/"):
+                pending.append((item, True))
+                pending.append((item.children[1], False))
+                pending.append((item.children[0], False))
+            else:
+                types.append(self.typeOf(item))
+        return types[0]
+
+    def known(self, node: Node) -> str | None:
+        value_type = self.typeOf(node)
+        return None if value_type == NEVER else value_type
+
+    def specialize(self, tree: Node) -> None:
+        # O alvo de declarações e atribuições não é lido; só o valor é especializado
+        self.arithmetic = {}
+        self.root = tree
+        self.loops = {}
+        for node in postorder(tree, targets=False):
+            self.specializeNode(node)
+        self.arithmetic = None
+        self.root = self.writes = self.loops = None
+
+    def specializeNode(self, node: Node) -> None:
+        # Uma especialização de uma verificação anterior pode não valer mais para a árvore atual
+        generic = GENERIC_CLASSES.get(type(node))
+        if generic is not None:
+            node.__class__ = generic
+        if isinstance(node, BinOp):
+            self.specializeBinOp(node)
+        elif isinstance(node, Identifier):
+            value_type = self.known(node)
+            if value_type is not None:
+                node.__class__ = TypedIdentifier
+                node.type = value_type
+        elif isinstance(node, Conditional):
+            if self.known(node.children[0]) == "bool":
+                node.__class__ = TypedConditional
+        elif isinstance(node, LoopWhile):
+            if self.known(node.children[0]) == "bool":
+                node.__class__ = TypedLoopWhile
+                node.counted = self.countedLoop(node) if COUNTED_LOOPS else None
+                if node.counted is not None:
+                    node.__class__ = CountedLoopWhile
+        elif isinstance(node, LoopIn):
+            list_type = self.known(node.children[0])
+            if list_type in PYTHON_TYPE_NAMES:
+                raise ValueError(f"Espera-se lista para loop 'in', obteve {PYTHON_TYPE_NAMES[list_type]}")
+            reads, writes, dynamic_reads, dynamic_writes = self.access([node.children[1]], node.layout)
+            source = self.access([node.children[0]], None)
+            self.loops[id(node)] = (reads | source[0], writes | source[1], dynamic_reads or source[2],
+                                    dynamic_writes or source[3])
+            if node.layout is not None and not writes and not dynamic_writes:
+                node.__class__ = ParallelLoopIn
+                node.reads = None
+                if not dynamic_reads:
+                    node.reads = {}
+                    for layout, slot in reads:
+                        node.reads.setdefault(layout, []).append(slot)
+        elif isinstance(node, RangeVal):
+            start, end = self.known(node.children[0]), self.known(node.children[1])
+            if start == end == "int":
+                node.__class__ = IntRangeVal
+            elif start in TYPE_SAMPLES and end in TYPE_SAMPLES:
+                raise ValueError(f"range requer operandos int, obteve {start} e {end}")
+        elif isinstance(node, Reduction):
+            value_kind = self.known(node.children[0])
+            if value_kind in PYTHON_TYPE_NAMES:
+                raise ValueError(f"{node.value} requer uma lista, obteve {value_kind}")
+
+    def access(self, roots: List[Node], layout: FrameLayout | None) -> Tuple[set, set, bool, bool]:
+        # Declarações de fora de 'layout' e dos escopos abertos dentro de roots que são lidas e
+        # atribuídas, e se há leituras e atribuições resolvidas pelo nome. Loops 'in' internos,
+        # visitados antes em pós-ordem, entram pelo resumo guardado em self.loops
+        inner = {layout}
+        reads: set = set()
+        writes: set = set()
+        dynamic_reads = dynamic_writes = False
+        pending = list(roots)
+        while pending:
+            item = pending.pop()
+            summary = self.loops.get(id(item))
+            if summary is not None:
+                reads |= summary[0]
+                writes |= summary[1]
+                dynamic_reads = dynamic_reads or summary[2]
+                dynamic_writes = dynamic_writes or summary[3]
+                continue
+            if isinstance(item, Identifier):
+                if item.binding is None:
+                    dynamic_reads = True
+                else:
+                    reads.add(item.binding)
+            elif isinstance(item, Assignment):
+                target = item.children[0]
+                if target.binding is None:
+                    dynamic_writes = True
+                else:
+                    writes.add(target.binding)
+                pending.append(item.children[1])
+                continue
+            elif isinstance(item, Declaration):
+                # O alvo é sempre declarado no escopo corrente, que está dentro de roots
+                pending.extend(item.children[1:])
+                continue
+            elif isinstance(item, LoopWhile):
+                inner.add(item.layout)
+            pending.extend(item.value if isinstance(item, ListVal) else item.children)
+        reads = {binding for binding in reads if binding[0] not in inner}
+        writes = {binding for binding in writes if binding[0] not in inner}
+        return reads, writes, dynamic_reads, dynamic_writes
+
+    def countedLoop(self, node: LoopWhile) -> Tuple[int, bool, List[Node]] | None:
+        # (passo, limite inclusivo, corpo sem o incremento) se o loop é um contador; ver CountedLoopWhile
+        condition, body = node.children
+        if condition.value not in ("<", "<="):
+            return None
+        counter, bound = condition.children
+        if not isinstance(counter, Identifier) or counter.binding is None or self.known(counter) != "int":
+            return None
+        if isinstance(bound, Identifier):
+            if bound.binding in (None, counter.binding) or self.known(bound) != "int":
+                return None
+        elif not isinstance(bound, IntVal):
+            return None
+        # Linhas vazias viram nós 'noop' e podem vir depois do incremento
+        last = next((index for index in range(len(body.children) - 1, -1, -1)
+                     if type(body.children[index]) is not Node), None)
+        if last is None:
+            return None
+        increment = body.children[last]
+        if not isinstance(increment, Assignment) or increment.children[0].binding != counter.binding:
+            return None
+        value = increment.children[1]
+        if not (isinstance(value, BinOp) and value.value == "+" and isinstance(value.children[0], Identifier)
+                and value.children[0].binding == counter.binding and isinstance(value.children[1], IntVal)
+                and value.children[1].value > 0):
+            return None
+        # O incremento deve ser a única atribuição ao contador no corpo, e o limite não pode
+        # ser atribuído; atribuições resolvidas pelo nome podem alcançar qualquer declaração
+        if self.writes is None:
+            self.writes = self.indexWrites(self.root)
+        spans, writes = self.writes
+        start, end = spans[id(body)]
+
+        def count(key: Any) -> int:
+            indices = writes.get(key, ())
+            return bisect_left(indices, end) - bisect_left(indices, start)
+        if count(counter.binding) != 1 or count(counter.value):
+            return None
+        if isinstance(bound, Identifier) and (count(bound.binding) or count(bound.value)):
+            return None
+        return (value.children[1].value, condition.value == "<=", body.children[:last] + body.children[last + 1:])
+
+    @staticmethod
+    def indexWrites(tree: Node) -> Tuple[dict, dict]:
+        # Numera os nós em pré-ordem: a subárvore de cada nó ocupa o intervalo [início, fim).
+        # As atribuições são agrupadas pela declaração do alvo, ou pelo nome quando ele só é
+        # resolvido em tempo de execução, com os índices em ordem crescente
+        spans: dict = {}
+        writes: dict = {}
+        order = 0
+        pending = [(tree, False)]
+        while pending:
+            node, closing = pending.pop()
+            if closing:
+                spans[id(node)] = (spans[id(node)], order)
+                continue
+            spans[id(node)] = order
+            if isinstance(node, Assignment):
+                target = node.children[0]
+                writes.setdefault(target.binding if target.binding is not None else target.value, []).append(order)
+            order += 1
+            pending.append((node, True))
+            pending.extend((child, False) for child in reversed(node.children))
+        return spans, writes
+
+    def specializeBinOp(self, node: BinOp) -> None:
+        op = node.value
+        left, right = self.known(node.children[0]), self.known(node.children[1])
+        if left not in TYPE_SAMPLES or right not in TYPE_SAMPLES or op not in Compiler.OPERATORS:
+            return
+        try:
+            result_type = BinOp.compute(op, TYPE_SAMPLES[left], left, TYPE_SAMPLES[right], right)[1]
+        except TypeError:
+            # Comparações de ordem entre valores none falham no próprio Python; ficam para a execução
+            return
+        # Um ValueError acima é um erro de tipo garantido, reportado antes da execução
+        if result_type == "int":
+            node.__class__ = IntBinOp
+            node.func = Compiler.OPERATORS[op]
+        elif result_type == "str":
+            node.__class__ = ConcatBinOp
+        elif result_type == "bool" and left in ("int", "str"):
+            node.__class__ = CompareBinOp
+            node.func = Compiler.OPERATORS[op]
+
+# Limites de aninhamento dos motores compilados
+# Os compiladores dos motores vm, closure e python percorrem a árvore recursivamente, com cerca
+# de dois frames do Python por nível: MAX_COMPILED_HEIGHT deixa folga no limite de recursão
+# padrão (1000) para quem chama o compilador. O código gerado pelo motor python também precisa
+# caber nos limites do CPython: 99 níveis de indentação, contando o corpo da função run e o 'if'
+# que o Transpiler abre em declarações repetíveis e atribuições resolvidas pelo nome, e 20
+# loops aninhados.
+MAX_COMPILED_HEIGHT = 400
+MAX_PYTHON_INDENT = 99
+MAX_PYTHON_LOOPS = 20
+
+def check_nesting(tree: Node, engine: str) -> None:
+    # Mede a árvore sem recursão antes de compilar, para recusar com um erro da linguagem o que
+    # terminaria em RecursionError ou SyntaxError no meio da compilação
+    height = indent = loops = 0
+    pending = [(tree, 1, 0, 0)]
+    while pending:
+        node, depth, blocks, loop_depth = pending.pop()
+        if isinstance(node, (Conditional, LoopWhile, LoopIn)):
+            blocks += 1
+            loop_depth += not isinstance(node, Conditional)
+        guarded = (isinstance(node, Declaration) and node.maybe_declared
+                   or isinstance(node, Assignment) and node.children[0].binding is None)
+        height, loops = max(height, depth), max(loops, loop_depth)
+        indent = max(indent, 1 + blocks + guarded)
+        children = node.value if isinstance(node, ListVal) else node.children
+        pending.extend((child, depth + 1, blocks, loop_depth) for child in children)
+    if height > MAX_COMPILED_HEIGHT:
+        problem = f"{height} níveis na árvore, o máximo é {MAX_COMPILED_HEIGHT}"
+    elif engine == "python" and indent > MAX_PYTHON_INDENT:
+        problem = f"{indent} níveis de indentação no código gerado, o máximo é {MAX_PYTHON_INDENT}"
+    elif engine == "python" and loops > MAX_PYTHON_LOOPS:
+        problem = f"{loops} loops aninhados, o máximo é {MAX_PYTHON_LOOPS}"
+    else:
+        return
+    raise ValueError(f"Programa aninhado demais para o motor {engine} ({problem}); use o motor tree")
+
+# Tipo conhecido sem executar; None quando só se sabe em tempo de execução
+def known_type(node: Node) -> str | None:
+    if isinstance(node, IntVal):
+        return "int"
+    if isinstance(node, StrVal):
+        return "str"
+    if isinstance(node, ListVal):
+        return "list"
+    if isinstance(node, TypedIdentifier):
+        return node.type
+    if isinstance(node, Reduction):
+        return "int"
+    if isinstance(node, BinOp):
+        if node.value not in ("+", "-", "*", "/"):
+            return "bool"
+        left, right = known_type(node.children[0]), known_type(node.children[1])
+        if node.value == "+" and left == right == "str":
+            return "str"
+        return "int" if left == right == "int" else None
+    return None
+
+# Compilador de bytecode
+# Cada instrução é uma tupla (opcode, a, b, c, alvo) de tamanho fixo, desempacotada de uma
+# vez na VM; os desvios guardam o destino sempre no último campo. A VM despacha em dois
+# níveis: um teste de faixa escolhe um dos blocos abaixo (oito opcodes cada, o último com o
+# restante) e, dentro dele, os mais frequentes vêm primeiro. Sufixos indicam de onde vêm os
+# operandos das superinstruções: L é um slot do frame atual, C uma constante e S o topo da
+# pilha. As versões com sufixo só são emitidas para IntBinOp e CompareBinOp, cujos tipos o
+# TypeChecker já comprovou; BINARY confere os tipos em tempo de execução. Variáveis de
+# escopos externos usam LOAD_OUTER/STORE_OUTER, e LOAD/STORE ficam para os nomes que o
+# Resolver deixou para a execução.
+OPCODE_NAMES = (
+    # Corpo de loops: aritmética tipada sobre slots do frame atual
+    "STORE_BINARY_LC", "BINARY_LC", "STORE_BINARY_LS", "FOR_COUNT", "JUMP_IF_LC", "JUMP_UNLESS_LC",
+    "LOAD_FAST", "STORE_FAST",
+    # Constantes, escopos externos, desvios e saída
+    "LOAD_CONST", "LOAD_OUTER", "STORE_OUTER", "JUMP", "FOR_ITER", "JUMP_IF_FALSE", "JUMP_IF_TRUE", "PRINT",
+    # Operações pela pilha e declarações
+    "BINARY_LL", "BINARY_SC", "BINARY_LS", "BINARY_SL", "BINARY_SS", "BINARY", "CONCAT", "DECLARE",
+    # Escopos, início de loops, nomes dinâmicos e construção de valores
+    "PUSH_SCOPE", "POP_SCOPE", "GET_ITER", "SETUP_COUNT", "LOAD", "STORE", "CHECK_BOOL", "BUILD_LIST",
+    "BUILD_RANGE", "REDUCE",
+)
+(OP_STORE_BINARY_LC, OP_BINARY_LC, OP_STORE_BINARY_LS, OP_FOR_COUNT, OP_JUMP_IF_LC, OP_JUMP_UNLESS_LC, OP_LOAD_FAST,
+ OP_STORE_FAST, OP_LOAD_CONST, OP_LOAD_OUTER, OP_STORE_OUTER, OP_JUMP, OP_FOR_ITER, OP_JUMP_IF_FALSE,
+ OP_JUMP_IF_TRUE, OP_PRINT, OP_BINARY_LL, OP_BINARY_SC, OP_BINARY_LS, OP_BINARY_SL, OP_BINARY_SS, OP_BINARY,
+ OP_CONCAT, OP_DECLARE, OP_PUSH_SCOPE, OP_POP_SCOPE, OP_GET_ITER, OP_SETUP_COUNT, OP_LOAD, OP_STORE,
+ OP_CHECK_BOOL, OP_BUILD_LIST, OP_BUILD_RANGE, OP_REDUCE) = range(len(OPCODE_NAMES))
+
+def int_division(left: int, right: int) -> int:
+    if right == 0:
+        raise ValueError("Divisão por zero")
+    return left // right
+
+class Bytecode:
+    def __init__(self, layout: FrameLayout = None):
+        self.instructions: List[Tuple[int, Any, Any, Any, Any]] = []
+        self.layout = layout
+
+    def __len__(self) -> int:
+        return len(self.instructions)
+
+    def emit(self, op: int, a: Any = None, b: Any = None, c: Any = None, target: int = None) -> int:
+        self.instructions.append((op, a, b, c, target))
+        return len(self.instructions) - 1
+
+    def patch(self, index: int, target: int) -> None:
+        self.instructions[index] = self.instructions[index][:4] + (target,)
+
+    def to_string(self) -> str:
+        result = ""
+        for index, (op, *args) in enumerate(self.instructions):
+            parts = []
+            for arg in args:
+                if isinstance(arg, FrameLayout):
+                    parts.append(f"[{', '.join(arg.names)}]")
+                elif callable(arg):
+                    parts.append(arg.__name__)
+                elif arg is not None:
+                    parts.append(repr(arg))
+            result += f"{index:5d} {OPCODE_NAMES[op]:<16}{' '.join(parts)}\n"
+        return result
+
+class Compiler:
+    OPERATORS = {
+        "+": operator.add, "-": operator.sub, "*": operator.mul, "/": int_division,
+        ">": operator.gt, "<": operator.lt, "==": operator.eq,
+        "<=": operator.le, ">=": operator.ge, "!=": operator.ne,
+    }
+
+    def __init__(self):
+        self.code = Bytecode()
+
+    def compile(self, tree: Node) -> Bytecode:
+        check_nesting(tree, "vm")
+        layout = getattr(tree, "layout", None)
+        if layout is None:
+            layout = Resolver().run(tree)
+        self.code = Bytecode(layout)
+        self.visit(tree)
+        return self.code
+
+    def visit(self, node: Node) -> None:
+        for cls in type(node).__mro__:
+            method = getattr(self, f"compile{cls.__name__}", None)
+            if method is not None:
+                return method(node)
+        raise ValueError(f"Nó não suportado pelo compilador: {type(node).__name__}")
+
+    @staticmethod
+    def isLocal(node: Node) -> bool:
+        return isinstance(node, Identifier) and node.depth == 0
+
+    def compileJump(self, condition: Node, message: str, when: bool) -> int:
+        # Emite o teste da condição seguido de um desvio (a ser corrigido) quando ela for `when`
+        if isinstance(condition, CompareBinOp):
+            left, right = condition.children
+            if self.isLocal(left) and isinstance(right, IntVal):
+                op = OP_JUMP_IF_LC if when else OP_JUMP_UNLESS_LC
+                return self.code.emit(op, condition.func, left.slot, right.value)
+        self.visit(condition)
+        if known_type(condition) != "bool":
+            # Comparações sempre produzem bool; só outras expressões precisam de verificação
+            self.code.emit(OP_CHECK_BOOL, message)
+        return self.code.emit(OP_JUMP_IF_TRUE if when else OP_JUMP_IF_FALSE)
+
+    def compileNode(self, node: Node) -> None:
+        if node.value != "noop":
+            raise ValueError(f"Nó não suportado pelo compilador: {node.value}")
+
+    def compileBlock(self, node: Block) -> None:
+        for child in node.children:
+            self.visit(child)
+
+    def compileDeclaration(self, node: Declaration) -> None:
+        if len(node.children) == 2:
+            self.visit(node.children[1])
+        else:
+            self.code.emit(OP_LOAD_CONST, None)
+        target = node.children[0]
+        self.code.emit(OP_DECLARE, target.slot, target.value)
+
+    def compileAssignment(self, node: Assignment) -> None:
+        target, value = node.children
+        if target.depth == 0 and isinstance(value, IntBinOp) and self.isLocal(value.children[0]):
+            left, right = value.children
+            if isinstance(right, IntVal):
+                self.code.emit(OP_STORE_BINARY_LC, value.func, left.slot, right.value, target.slot)
+            else:
+                self.visit(right)
+                self.code.emit(OP_STORE_BINARY_LS, value.func, left.slot, None, target.slot)
+            return
+        self.visit(value)
+        if target.depth == 0:
+            self.code.emit(OP_STORE_FAST, target.slot)
+        elif target.depth is not None:
+            self.code.emit(OP_STORE_OUTER, -1 - target.depth, target.slot)
+        else:
+            self.code.emit(OP_STORE, target.value)
+
+    def compileConditional(self, node: Conditional) -> None:
+        jump_else = self.compileJump(node.children[0], "Condição deve ser bool", False)
+        self.visit(node.children[1])
+        if len(node.children) == 3:
+            jump_end = self.code.emit(OP_JUMP)
+            self.code.patch(jump_else, len(self.code))
+            self.visit(node.children[2])
+            self.code.patch(jump_end, len(self.code))
+        else:
+            self.code.patch(jump_else, len(self.code))
+
+    def compileLoopWhile(self, node: LoopWhile) -> None:
+        # Laço invertido: o teste fica no fim e desvia de volta para o corpo
+        jump_test = self.code.emit(OP_JUMP)
+        body = len(self.code)
+        self.compileBody(node, node.children[1].children)
+        self.code.patch(jump_test, len(self.code))
+        jump_body = self.compileJump(node.children[0], "Condição do while deve ser bool", True)
+        self.code.patch(jump_body, body)
+
+    def compileCountedLoopWhile(self, node: CountedLoopWhile) -> None:
+        # Como no motor tree, o contador percorre um range; FOR_COUNT grava o próximo valor e
+        # desvia para o corpo, substituindo a condição e o incremento
+        counter, bound = node.children[0].children
+        step, inclusive, statements = node.counted
+        self.visit(bound)
+        self.code.emit(OP_SETUP_COUNT, int(inclusive), step, -1 - counter.depth, counter.slot)
+        jump_test = self.code.emit(OP_JUMP)
+        body = len(self.code)
+        self.compileBody(node, statements)
+        self.code.patch(jump_test, len(self.code))
+        self.code.emit(OP_FOR_COUNT, -1 - counter.depth, counter.slot, target=body)
+
+    def compileBody(self, node: LoopWhile, statements: List[Node]) -> None:
+        if node.scoped:
+            self.code.emit(OP_PUSH_SCOPE, node.layout)
+        for statement in statements:
+            self.visit(statement)
+        if node.scoped:
+            self.code.emit(OP_POP_SCOPE)
+
+    def compileLoopIn(self, node: LoopIn) -> None:
+        self.visit(node.children[0])
+        self.code.emit(OP_GET_ITER)
+        if not node.scoped:
+            # Um único escopo para todas as iterações; o iterador fica na pilha de valores
+            self.code.emit(OP_PUSH_SCOPE, node.layout)
+            start = self.code.emit(OP_FOR_ITER)
+            self.code.emit(OP_STORE_FAST, 0)
+            self.visit(node.children[1])
+            self.code.emit(OP_JUMP, target=start)
+            self.code.patch(start, len(self.code))
+            self.code.emit(OP_POP_SCOPE)
+            return
+        start = self.code.emit(OP_FOR_ITER)
+        self.code.emit(OP_PUSH_SCOPE, node.layout)
+        self.code.emit(OP_STORE_FAST, 0)
+        self.visit(node.children[1])
+        self.code.emit(OP_POP_SCOPE)
+        self.code.emit(OP_JUMP, target=start)
+        self.code.patch(start, len(self.code))
+
+    def compilePrint(self, node: Print) -> None:
+        self.visit(node.children[0])
+        self.code.emit(OP_PRINT)
+
+    def compileBinOp(self, node: BinOp) -> None:
+        if node.value not in self.OPERATORS:
+            raise ValueError(f"Operador binário desconhecido: {node.value}")
+        self.visit(node.children[0])
+        self.visit(node.children[1])
+        self.code.emit(OP_BINARY, self.OPERATORS[node.value], node.value)
+
+    def compileIntBinOp(self, node: IntBinOp) -> None:
+        left, right = node.children
+        if self.isLocal(left):
+            if isinstance(right, IntVal):
+                self.code.emit(OP_BINARY_LC, node.func, left.slot, right.value)
+            elif self.isLocal(right):
+                self.code.emit(OP_BINARY_LL, node.func, left.slot, right.slot)
+            else:
+                self.visit(right)
+                self.code.emit(OP_BINARY_LS, node.func, left.slot)
+            return
+        self.visit(left)
+        if isinstance(right, IntVal):
+            self.code.emit(OP_BINARY_SC, node.func, right.value)
+        elif self.isLocal(right):
+            self.code.emit(OP_BINARY_SL, node.func, right.slot)
+        else:
+            self.visit(right)
+            self.code.emit(OP_BINARY_SS, node.func)
+
+    def compileCompareBinOp(self, node: CompareBinOp) -> None:
+        self.compileIntBinOp(node)
+
+    def compileConcatBinOp(self, node: ConcatBinOp) -> None:
+        self.visit(node.children[0])
+        self.visit(node.children[1])
+        self.code.emit(OP_CONCAT)
+
+    def compileIntVal(self, node: IntVal) -> None:
+        self.code.emit(OP_LOAD_CONST, node.value)
+
+    def compileStrVal(self, node: StrVal) -> None:
+        self.code.emit(OP_LOAD_CONST, node.value)
+
+    def compileListVal(self, node: ListVal) -> None:
+        for elem in node.value:
+            self.visit(elem)
+        self.code.emit(OP_BUILD_LIST, len(node.value))
+
+    def compileRangeVal(self, node: RangeVal) -> None:
+        self.visit(node.children[0])
+        self.visit(node.children[1])
+        self.code.emit(OP_BUILD_RANGE)
+
+    def compileReduction(self, node: Reduction) -> None:
+        self.visit(node.children[0])
+        self.code.emit(OP_REDUCE, node.value)
+
+    def compileIdentifier(self, node: Identifier) -> None:
+        if node.depth == 0:
+            self.code.emit(OP_LOAD_FAST, node.slot)
+        elif node.depth is not None:
+            self.code.emit(OP_LOAD_OUTER, -1 - node.depth, node.slot)
+        else:
+            self.code.emit(OP_LOAD, node.value)
+
+# Máquina virtual
+class VM:
+    def run(self, code: Bytecode, st: Frame = None) -> None:
+        (STORE_BINARY_LC, BINARY_LC, STORE_BINARY_LS, FOR_COUNT, JUMP_IF_LC, JUMP_UNLESS_LC, LOAD_FAST,
+         STORE_FAST, LOAD_CONST, LOAD_OUTER, STORE_OUTER, JUMP, FOR_ITER, JUMP_IF_FALSE, JUMP_IF_TRUE,
+         PRINT, BINARY_LL, BINARY_SC, BINARY_LS, BINARY_SL, BINARY_SS, BINARY, CONCAT, DECLARE,
+         PUSH_SCOPE, POP_SCOPE, GET_ITER, SETUP_COUNT, LOAD, STORE, CHECK_BOOL, BUILD_LIST, BUILD_RANGE,
+         REDUCE) = range(len(OPCODE_NAMES))
+        if st is None:
+            st = Frame(code.layout)
+        # Os slots do frame atual ficam numa variável local, trocada junto com o escopo; 'scopes'
+        # guarda os slots de toda a cadeia de frames, do global ao atual, e uma variável na
+        # profundidade d fica em scopes[-1 - d]
+        slots = st.slots
+        scopes = []
+        frame = st
+        while frame is not None:
+            scopes.append(frame.slots)
+            frame = frame.parent
+        scopes.reverse()
+        write = st.runtime.output.write
+        instructions = code.instructions
+        stack: List[Any] = []
+        push, pop = stack.append, stack.pop
+        compute = BinOp.compute
+        done = object()
+        pc, end = 0, len(instructions)
+        while pc < end:
+            op, a, b, c, target = instructions[pc]
+            pc += 1
+            if op < 8:
+                if op == STORE_BINARY_LC:
+                    slots[target] = a(slots[b], c)
+                elif op == BINARY_LC:
+                    push(a(slots[b], c))
+                elif op == STORE_BINARY_LS:
+                    slots[target] = a(slots[b], pop())
+                elif op == FOR_COUNT:
+                    value = next(stack[-1], done)
+                    if value is done:
+                        pop()
+                        values = pop()
+                        if values:
+                            scopes[a][b] = values[-1] + values.step
+                    else:
+                        scopes[a][b] = value
+                        pc = target
+                elif op == JUMP_IF_LC:
+                    if a(slots[b], c):
+                        pc = target
+                elif op == JUMP_UNLESS_LC:
+                    if not a(slots[b], c):
+                        pc = target
+                elif op == LOAD_FAST:
+                    push(slots[a])
+                else:
+                    slots[a] = pop()
+            elif op < 16:
+                if op == LOAD_CONST:
+                    push(a)
+                elif op == LOAD_OUTER:
+                    push(scopes[a][b])
+                elif op == STORE_OUTER:
+                    scopes[a][b] = pop()
+                elif op == JUMP:
+                    pc = target
+                elif op == FOR_ITER:
+                    item = next(stack[-1], done)
+                    if item is done:
+                        pop()
+                        pc = target
+                    else:
+                        push(item)
+                elif op == JUMP_IF_FALSE:
+                    if not pop():
+                        pc = target
+                elif op == JUMP_IF_TRUE:
+                    if pop():
+                        pc = target
+                else:
+                    write(pop())
+            elif op < 24:
+                if op == BINARY_LL:
+                    push(a(slots[b], slots[c]))
+                elif op == BINARY_SC:
+                    stack[-1] = a(stack[-1], b)
+                elif op == BINARY_LS:
+                    stack[-1] = a(slots[b], stack[-1])
+                elif op == BINARY_SL:
+                    stack[-1] = a(stack[-1], slots[b])
+                elif op == BINARY_SS:
+                    right = pop()
+                    stack[-1] = a(stack[-1], right)
+                elif op == BINARY:
+                    right = pop()
+                    left = stack[-1]
+                    if type(left) is int and type(right) is int:
+                        stack[-1] = a(left, right)
+                    else:
+                        stack[-1] = compute(b, left, value_type(left), right, value_type(right))[0]
+                elif op == CONCAT:
+                    right = pop()
+                    stack[-1] = concat(stack[-1], right)
+                else:
+                    if slots[a] is not UNDEFINED:
+                        raise ValueError(f"Variável '{b}' já existe no escopo atual")
+                    slots[a] = pop()
+            elif op == PUSH_SCOPE:
+                st = Frame(a, st)
+                slots = st.slots
+                scopes.append(slots)
+            elif op == POP_SCOPE:
+                st = st.parent
+                slots = st.slots
+                scopes.pop()
+            elif op == GET_ITER:
+                stack[-1] = iter(LoopIn.iterable(stack[-1]))
+            elif op == SETUP_COUNT:
+                # O limite já está na pilha; é substituído pelo range e seu iterador
+                values = range(scopes[c][target], stack[-1] + a, b)
+                stack[-1] = values
+                push(iter(values))
+            elif op == LOAD:
+                push(st.get(a))
+            elif op == STORE:
+                st.get(a)
+                st.set(a, pop())
+            elif op == CHECK_BOOL:
+                if not isinstance(stack[-1], bool):
+                    raise ValueError(f"{a}, obteve {value_type(stack[-1])}")
+            elif op == BUILD_LIST:
+                if a:
+                    items = stack[-a:]
+                    del stack[-a:]
+                    if StrBuilder in map(type, items):
+                        items = [plain_str(item) for item in items]
+                    push(items)
+                else:
+                    push([])
+            elif op == BUILD_RANGE:
+                last = pop()
+                first = stack[-1]
+                stack[-1] = RangeVal.build(first, value_type(first), last, value_type(last))
+            elif op == REDUCE:
+                stack[-1] = Reduction.compute(a, stack[-1], value_type(stack[-1]))
+            else:
+                raise ValueError(f"Instrução desconhecida: {op}")
+
+# Compilação para closures
+class ClosureCompiler:
+    def compile(self, tree: Node) -> Callable[[Frame], None]:
+        check_nesting(tree, "closure")
+        if getattr(tree, "layout", None) is None:
+            Resolver().run(tree)
+        return self.visit(tree)
+
+    def visit(self, node: Node) -> Callable:
+        for cls in type(node).__mro__:
+            method = getattr(self, f"compile{cls.__name__}", None)
+            if method is not None:
+                return method(node)
+        raise ValueError(f"Nó não suportado pelo compilador: {type(node).__name__}")
+
+    def compileStatements(self, nodes: List[Node]) -> Callable[[Frame], None]:
+        statements = [self.visit(node) for node in nodes if type(node) is not Node]
+        if not statements:
+            return lambda st: None
+        if len(statements) == 1:
+            return statements[0]
+        if len(statements) == 2:
+            first, second = statements
+            def run_two(st):
+                first(st)
+                second(st)
+            return run_two
+        def run_block(st):
+            for statement in statements:
+                statement(st)
+        return run_block
+
+    def compileCondition(self, node: Node, message: str) -> Callable[[Frame], Any]:
+        condition = self.visit(node)
+        if known_type(node) == "bool":
+            return condition
+        def checked(st):
+            value = condition(st)
+            if not isinstance(value, bool):
+                raise ValueError(f"{message}, obteve {value_type(value)}")
+            return value
+        return checked
+
+    def compileNode(self, node: Node) -> Callable:
+        if node.value != "noop":
+            raise ValueError(f"Nó não suportado pelo compilador: {node.value}")
+        return lambda st: None
+
+    def compileBlock(self, node: Block) -> Callable:
+        return self.compileStatements(node.children)
+
+    def compileDeclaration(self, node: Declaration) -> Callable:
+        slot, name = node.children[0].slot, node.children[0].value
+        value = self.visit(node.children[1]) if len(node.children) == 2 else (lambda st: None)
+        def declare(st):
+            result = value(st)
+            slots = st.slots
+            if slots[slot] is not UNDEFINED:
+                raise ValueError(f"Variável '{name}' já existe no escopo atual")
+            slots[slot] = result
+        return declare
+
+    def compileAssignment(self, node: Assignment) -> Callable:
+        target = node.children[0]
+        depth, slot, name = target.depth, target.slot, target.value
+        value = self.visit(node.children[1])
+        if depth == 0:
+            def assign_local(st):
+                st.slots[slot] = value(st)
+            return assign_local
+        if depth is None:
+            def assign_name(st):
+                result = value(st)
+                st.get(name)
+                st.set(name, result)
+            return assign_name
+        def assign_outer(st):
+            st.store(depth, slot, value(st))
+        return assign_outer
+
+    def compileConditional(self, node: Conditional) -> Callable:
+        condition = self.compileCondition(node.children[0], "Condição deve ser bool")
+        then_block = self.compileStatements(node.children[1].children)
+        if len(node.children) == 2:
+            def branch(st):
+                if condition(st):
+                    then_block(st)
+            return branch
+        else_block = self.compileStatements(node.children[2].children)
+        def branch_else(st):
+            if condition(st):
+                then_block(st)
+            else:
+                else_block(st)
+        return branch_else
+
+    def compileLoopWhile(self, node: LoopWhile) -> Callable:
+        condition = self.compileCondition(node.children[0], "Condição do while deve ser bool")
+        body = self.compileStatements(node.children[1].children)
+        layout = node.layout
+        if not node.scoped:
+            def loop(st):
+                while condition(st):
+                    body(st)
+            return loop
+        def loop_scoped(st):
+            while condition(st):
+                body(Frame(layout, st))
+        return loop_scoped
+
+    def compileCountedLoopWhile(self, node: CountedLoopWhile) -> Callable:
+        counter, bound = node.children[0].children
+        step, inclusive, statements = node.counted
+        end, body = self.visit(bound), self.compileStatements(statements)
+        depth, slot, layout, extra = counter.depth, counter.slot, node.layout, int(inclusive)
+
+        def counted_values(st):
+            frame = st
+            for _ in range(depth):
+                frame = frame.parent
+            return frame.slots, range(frame.slots[slot], end(st) + extra, step)
+        if not node.scoped:
+            def counted_loop(st):
+                slots, values = counted_values(st)
+                for value in values:
+                    slots[slot] = value
+                    body(st)
+                if values:
+                    slots[slot] = values[-1] + step
+            return counted_loop
+        def counted_loop_scoped(st):
+            slots, values = counted_values(st)
+            for value in values:
+                slots[slot] = value
+                body(Frame(layout, st))
+            if values:
+                slots[slot] = values[-1] + step
+        return counted_loop_scoped
+
+    def compileLoopIn(self, node: LoopIn) -> Callable:
+        source, layout = self.visit(node.children[0]), node.layout
+        body = self.compileStatements(node.children[1].children)
+        iterable = LoopIn.iterable
+        if not node.scoped:
+            def loop_in_shared(st):
+                frame = Frame(layout, st)
+                slots = frame.slots
+                for item in iterable(source(st)):
+                    slots[0] = item
+                    body(frame)
+            return loop_in_shared
+        def loop_in(st):
+            for item in iterable(source(st)):
+                frame = Frame(layout, st)
+                frame.slots[0] = item
+                body(frame)
+        return loop_in
+
+    def compileParallelLoopIn(self, node: ParallelLoopIn) -> Callable:
+        # Os processos do pool executam o corpo com o motor tree; aqui só sem o pool
+        source, layout, scoped = self.visit(node.children[0]), node.layout, node.scoped
+        body = self.compileStatements(node.children[1].children)
+        iterable = LoopIn.iterable
+        def parallel_loop_in(st):
+            values = iterable(source(st))
+            if node.spread(st, values):
+                return
+            frame = Frame(layout, st)
+            for item in values:
+                if scoped:
+                    frame = Frame(layout, st)
+                frame.slots[0] = item
+                body(frame)
+        return parallel_loop_in
+
+    def compilePrint(self, node: Print) -> Callable:
+        value = self.visit(node.children[0])
+        def print_value(st):
+            st.runtime.output.write(value(st))
+        return print_value
+
+    def compileBinOp(self, node: BinOp) -> Callable:
+        op = node.value
+        if op not in Compiler.OPERATORS:
+            raise ValueError(f"Operador binário desconhecido: {op}")
+        func, compute = Compiler.OPERATORS[op], BinOp.compute
+        left_node, right_node = node.children
+        left, right = self.visit(left_node), self.visit(right_node)
+        left_type, right_type = known_type(left_node), known_type(right_node)
+        # Operandos inteiros conhecidos dispensam as verificações de tipo
+        if left_type == right_type == "int":
+            def int_op(st):
+                return func(left(st), right(st))
+            return int_op
+        if left_type == right_type == "str" and op == "+":
+            def concat_op(st):
+                return concat(left(st), right(st))
+            return concat_op
+        if isinstance(left_node, Identifier) and left_node.depth == 0 and isinstance(right_node, IntVal):
+            slot, constant = left_node.slot, right_node.value
+            def local_const_op(st):
+                value = st.slots[slot]
+                if type(value) is int:
+                    return func(value, constant)
+                return compute(op, value, value_type(value), constant, "int")[0]
+            return local_const_op
+        def checked_op(st):
+            a = left(st)
+            b = right(st)
+            if type(a) is int and type(b) is int:
+                return func(a, b)
+            return compute(op, a, value_type(a), b, value_type(b))[0]
+        return checked_op
+
+    def compileIntVal(self, node: IntVal) -> Callable:
+        value = node.value
+        return lambda st: value
+
+    def compileStrVal(self, node: StrVal) -> Callable:
+        value = node.value
+        return lambda st: value
+
+    def compileListVal(self, node: ListVal) -> Callable:
+        elements = [self.visit(elem) for elem in node.value]
+        # Só variáveis podem guardar um StrBuilder, que entra na lista já como string
+        if any(isinstance(elem, Identifier) for elem in node.value):
+            def build_list_text(st):
+                return [plain_str(elem(st)) for elem in elements]
+            return build_list_text
+        def build_list(st):
+            return [elem(st) for elem in elements]
+        return build_list
+
+    def compileRangeVal(self, node: RangeVal) -> Callable:
+        start, end = self.visit(node.children[0]), self.visit(node.children[1])
+        if isinstance(node, IntRangeVal):
+            return lambda st: range(start(st), end(st))
+        def build_range(st):
+            first, last = start(st), end(st)
+            return RangeVal.build(first, value_type(first), last, value_type(last))
+        return build_range
+
+    def compileReduction(self, node: Reduction) -> Callable:
+        name, operand = node.value, self.visit(node.children[0])
+        def reduce_list(st):
+            value = operand(st)
+            return Reduction.compute(name, value, value_type(value))
+        return reduce_list
+
+    def compileIdentifier(self, node: Identifier) -> Callable:
+        depth, slot, name = node.depth, node.slot, node.value
+        if depth == 0:
+            return lambda st: st.slots[slot]
+        if depth == 1:
+            return lambda st: st.parent.slots[slot]
+        if depth is None:
+            return lambda st: st.get(name)
+        return lambda st: st.load(depth, slot)
+
+# Transpilação para Python
+# Funções de suporte usadas pelo código gerado
+def checked_binary(op: str, left: Any, right: Any) -> Any:
+    return BinOp.compute(op, left, value_type(left), right, value_type(right))[0]
+
+def dynamic_load(name: str, *candidates: Any) -> Any:
+    # Candidatos do escopo mais interno para o mais externo, como em Frame.get
+    for value in candidates:
+        if value is not UNDEFINED:
+            return value
+    raise ValueError(f"Variável '{name}' não definida")
+
+def iterate_list(value: Any) -> list | range:
+    return LoopIn.iterable(value)
+
+def build_range(start: Any, end: Any) -> range:
+    return RangeVal.build(start, value_type(start), end, value_type(end))
+
+def reduce_list(name: str, value: Any) -> int:
+    return Reduction.compute(name, value, value_type(value))
+
+class Transpiler:
+    # Sem recursão na linguagem, cada escopo estático tem no máximo um frame vivo por vez,
+    # então cada declaração vira uma variável local distinta da função gerada. Escopos de
+    # loops são recriados a cada iteração reiniciando suas variáveis com UNDEFINED, o que só
+    # é necessário para nomes cuja existência é verificada em tempo de execução.
+    RUNTIME = ("UNDEFINED", "int_division", "checked_binary", "dynamic_load", "iterate_list", "build_range",
+               "reduce_list", "concat", "plain_str")
+    INLINE_OPERATORS = ("+", "-", "*", ">", "<", "==", "<=", ">=", "!=")
+    # Precedência dos operadores aritméticos, iguais no Arbor e no Python; o operando esquerdo
+    # de mesma precedência ou maior dispensa parênteses, o que mantém cadeias longas como
+    # 1 + 1 + ... + 1 abaixo do limite de parênteses aninhados do Python
+    PRECEDENCE = {"+": 1, "-": 1, "*": 2}
+
+    def __init__(self):
+        self.lines: List[str] = []
+        self.indent = 1
+        self.names: dict = {}
+        self.scopes: List[FrameLayout] = []
+        self.dynamic_names: set = set()
+
+    def compile(self, tree: Node, filename: str = "<arbor>") -> Callable[..., None]:
+        namespace = {name: globals()[name] for name in Transpiler.RUNTIME}
+        source = self.transpile(tree)
+        try:
+            code = compile(source, filename, "exec")
+        except (SyntaxError, RecursionError) as error:
+            # Limites do CPython que check_nesting não mede, como o de parênteses aninhados
+            raise ValueError(f"Programa aninhado demais para o motor python ({getattr(error, 'msg', error)}); "
+                             "use o motor tree") from None
+        exec(code, namespace)
+        return namespace["run"]
+
+    def module(self, tree: Node, filename: str = "<arbor>") -> str:
+        # Versão independente, que importa as funções de suporte deste interpretador
+        return (f"# Gerado a partir de {filename} pelo transpilador do Arbor\n"
+                f"from main import {', '.join(Transpiler.RUNTIME)}\n\n"
+                f"{self.transpile(tree)}\n"
+                "if __name__ == \"__main__\":\n"
+                "    run()\n")
+
+    def transpile(self, tree: Node) -> str:
+        check_nesting(tree, "python")
+        if getattr(tree, "layout", None) is None:
+            Resolver().run(tree)
+        self.lines = ["def run(write=print):"]
+        self.indent = 1
+        self.names = {}
+        self.scopes = [tree.layout]
+        self.dynamic_names = self.findDynamicNames(tree)
+        self.resetScope(tree.layout)
+        self.block(tree.children)
+        return "\n".join(self.lines) + "\n"
+
+    def findDynamicNames(self, tree: Node) -> set:
+        names = set()
+        pending = [tree]
+        while pending:
+            node = pending.pop()
+            pending.extend(node.children)
+            if isinstance(node, ListVal):
+                pending.extend(node.value)
+            if isinstance(node, Identifier) and node.binding is None:
+                names.add(node.value)
+            elif isinstance(node, Declaration) and node.maybe_declared:
+                names.add(node.children[0].value)
+        return names
+
+    def emit(self, line: str) -> None:
+        self.lines.append("    " * self.indent + line)
+
+    def local(self, layout: FrameLayout, name: str) -> str:
+        # Sufixo numérico evita colisões com palavras reservadas e com as funções de suporte
+        key = (layout, layout.names[name])
+        if key not in self.names:
+            self.names[key] = f"{name}_{len(self.names)}"
+        return self.names[key]
+
+    def candidates(self, name: str) -> List[str]:
+        return [self.local(layout, name) for layout in reversed(self.scopes) if name in layout.names]
+
+    def resetScope(self, layout: FrameLayout, keep: str = None) -> None:
+        names = [self.local(layout, name) for name in layout.names if name in self.dynamic_names and name != keep]
+        if names:
+            self.emit(f"{' = '.join(names)} = UNDEFINED")
+
+    def block(self, nodes: List[Node]) -> None:
+        start = len(self.lines)
+        for node in nodes:
+            self.visit(node)
+        if len(self.lines) == start:
+            self.emit("pass")
+
+    def visit(self, node: Node) -> None:
+        for cls in type(node).__mro__:
+            method = getattr(self, f"transpile{cls.__name__}", None)
+            if method is not None:
+                return method(node)
+        raise ValueError(f"Nó não suportado pelo transpilador: {type(node).__name__}")
+
+    def transpileNode(self, node: Node) -> None:
+        if node.value != "noop":
+            raise ValueError(f"Nó não suportado pelo transpilador: {node.value}")
+
+    def transpileBlock(self, node: Block) -> None:
+        for child in node.children:
+            self.visit(child)
+
+    def transpileDeclaration(self, node: Declaration) -> None:
+        target = node.children[0]
+        name = self.local(target.binding[0], target.value)
+        value = self.expression(node.children[1]) if len(node.children) == 2 else "None"
+        if not node.maybe_declared:
+            self.emit(f"{name} = {value}")
+            return
+        message = f"Variável '{target.value}' já existe no escopo atual"
+        self.emit(f"_value = {value}")
+        self.emit(f"if {name} is not UNDEFINED:")
+        self.emit(f"    raise ValueError({message!r})")
+        self.emit(f"{name} = _value")
+
+    def transpileAssignment(self, node: Assignment) -> None:
+        target = node.children[0]
+        value = self.expression(node.children[1])
+        if target.binding is not None:
+            self.emit(f"{self.local(target.binding[0], target.value)} = {value}")
+            return
+        self.emit(f"_value = {value}")
+        keyword = "if"
+        for name in self.candidates(target.value):
+            self.emit(f"{keyword} {name} is not UNDEFINED:")
+            self.emit(f"    {name} = _value")
+            keyword = "elif"
+        message = f"Variável '{target.value}' não definida"
+        error = f"raise ValueError({message!r})"
+        if keyword == "if":
+            self.emit(error)
+        else:
+            self.emit("else:")
+            self.emit(f"    {error}")
+
+    def transpileConditional(self, node: Conditional) -> None:
+        self.emit(f"if {self.expression(node.children[0])}:")
+        self.indent += 1
+        self.block(node.children[1].children)
+        self.indent -= 1
+        if len(node.children) == 3:
+            self.emit("else:")
+            self.indent += 1
+            self.block(node.children[2].children)
+            self.indent -= 1
+
+    def transpileLoopWhile(self, node: LoopWhile) -> None:
+        self.emit(f"while {self.expression(node.children[0])}:")
+        self.indent += 1
+        if node.scoped:
+            self.scopes.append(node.layout)
+            self.resetScope(node.layout)
+            self.block(node.children[1].children)
+            self.scopes.pop()
+        else:
+            self.block(node.children[1].children)
+        self.indent -= 1
+
+    def transpileCountedLoopWhile(self, node: CountedLoopWhile) -> None:
+        counter, bound = node.children[0].children
+        step, inclusive, statements = node.counted
+        name = self.load(counter.value, counter.binding)
+        # Os nomes locais sempre terminam em dígito, então estes não colidem com eles
+        first, last = f"{name}_inicio", f"{name}_fim"
+        self.emit(f"{first}, {last} = {name}, {self.expression(bound)}{' + 1' if inclusive else ''}")
+        self.emit(f"for {name} in range({first}, {last}, {step}):")
+        self.indent += 1
+        if node.scoped:
+            self.scopes.append(node.layout)
+            self.resetScope(node.layout)
+            self.block(statements)
+            self.scopes.pop()
+        else:
+            self.block(statements)
+        self.indent -= 1
+        self.emit(f"if {first} < {last}:")
+        self.indent += 1
+        self.emit(f"{name} += {step}")
+        self.indent -= 1
+
+    def transpileLoopIn(self, node: LoopIn) -> None:
+        source = self.expression(node.children[0])
+        # Listas literais e range(...) dispensam a verificação do tipo
+        if not isinstance(node.children[0], (ListVal, RangeVal)):
+            source = f"iterate_list({source})"
+        self.scopes.append(node.layout)
+        self.emit(f"for {self.local(node.layout, node.identifier)} in {source}:")
+        self.indent += 1
+        self.resetScope(node.layout, keep=node.identifier)
+        self.block(node.children[1].children)
+        self.indent -= 1
+        self.scopes.pop()
+
+    def transpilePrint(self, node: Print) -> None:
+        self.emit(f"write({self.expression(node.children[0])})")
+
+    def load(self, name: str, binding: Tuple[FrameLayout, int] | None) -> str:
+        if binding is not None:
+            return self.local(binding[0], name)
+        return f"dynamic_load({name!r}, {', '.join(self.candidates(name))})"
+
+    def expression(self, node: Node) -> str:
+        if isinstance(node, (IntVal, StrVal)):
+            return repr(node.value)
+        if isinstance(node, ListVal):
+            elements = (f"plain_str({self.expression(elem)})" if isinstance(elem, Identifier) else self.expression(elem)
+                        for elem in node.value)
+            return f"[{', '.join(elements)}]"
+        if isinstance(node, Identifier):
+            return self.load(node.value, node.binding)
+        if isinstance(node, RangeVal):
+            start, end = self.expression(node.children[0]), self.expression(node.children[1])
+            return f"{'range' if isinstance(node, IntRangeVal) else 'build_range'}({start}, {end})"
+        if isinstance(node, Reduction):
+            return f"reduce_list({node.value!r}, {self.expression(node.children[0])})"
+        if isinstance(node, BinOp):
+            op = node.value
+            left, right = self.expression(node.children[0]), self.expression(node.children[1])
+            # Operações com tipos comprovados pelo TypeChecker usam os operadores do Python
+            if isinstance(node, ConcatBinOp):
+                return f"concat({left}, {right})"
+            if isinstance(node, (IntBinOp, CompareBinOp)):
+                left_node = node.children[0]
+                if (op in Transpiler.PRECEDENCE and isinstance(left_node, IntBinOp)
+                        and Transpiler.PRECEDENCE.get(left_node.value, 0) >= Transpiler.PRECEDENCE[op]):
+                    left = left[1:-1]
+                if op in Transpiler.INLINE_OPERATORS:
+                    return f"({left} {op} {right})"
+                if isinstance(node.children[1], IntVal) and node.children[1].value != 0:
+                    return f"({left} // {right})"
+                return f"int_division({left}, {right})"
+            return f"checked_binary({op!r}, {left}, {right})"
+        raise ValueError(f"Nó não suportado pelo transpilador: {type(node).__name__}")
+
+# Cache de programas
+# Árvores já analisadas, resolvidas e otimizadas ficam em disco, como o __pycache__ do Python.
+# A chave combina o código-fonte, as opções que alteram a árvore e a versão do interpretador;
+# a versão inclui o hash deste arquivo para que qualquer mudança nos nós invalide o cache.
+VERSION = "1.0"
+
+class ProgramCache:
+    # Cada entrada é assinada com HMAC-SHA256 sob um segredo legível só pelo dono; o pickle só é
+    # lido depois que a assinatura confere. O segredo fica em secret_path (ARBOR_CACHE_KEY ou
+    # SECRET_PATH por padrão)
+    MAGIC = b"ARBC2"
+    DIRECTORY = "__arborcache__"
+    SECRET_ENV = "ARBOR_CACHE_KEY"
+    SECRET_PATH = os.path.join("~", ".arbor", "cache.key")
+    _fingerprint = None
+    _secrets: dict = {}
+
+    def __init__(self, directory: str, max_bytes: int = 64 * 1024 * 1024, secret_path: str = None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.secret_path = os.path.expanduser(secret_path or os.environ.get(self.SECRET_ENV) or self.SECRET_PATH)
+
+    @classmethod
+    def fingerprint(cls) -> bytes:
+        if cls._fingerprint is None:
+            digest = hashlib.sha256(f"{VERSION}:{sys.version_info[0]}.{sys.version_info[1]}".encode())
+            with open(os.path.abspath(__file__), 'rb') as file:
+                digest.update(file.read())
+            cls._fingerprint = digest.digest()
+        return cls._fingerprint
+
+    def secret(self) -> bytes | None:
+        # Criado na primeira vez com permissão 0600; um segredo que outros usuários podem ler ou
+        # alterar não serve, e sem segredo o cache não é usado
+        path = self.secret_path
+        if path not in ProgramCache._secrets:
+            try:
+                if os.path.dirname(path):
+                    os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+                try:
+                    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+                except FileExistsError:
+                    pass
+                else:
+                    with os.fdopen(fd, 'wb') as file:
+                        file.write(os.urandom(32))
+                with open(path, 'rb') as file:
+                    status = os.fstat(file.fileno())
+                    if os.name == "posix" and (status.st_mode & 0o077 or status.st_uid != os.getuid()):
+                        return None
+                    secret = file.read()
+            except OSError:
+                return None
+            if len(secret) < 32:
+                return None
+            ProgramCache._secrets[path] = secret
+        return ProgramCache._secrets[path]
+
+    def key(self, code: str | bytes, *options: Any) -> bytes:
+        digest = hashlib.sha256(ProgramCache.fingerprint())
+        digest.update(repr(options).encode())
+        digest.update(code.encode() if isinstance(code, str) else code)
+        return digest.digest()
+
+    def path(self, key: bytes) -> str:
+        return os.path.join(self.directory, f"{key.hex()[:32]}.arbc")
+
+    @staticmethod
+    def sign(secret: bytes, key: bytes, payload: bytes) -> bytes:
+        return hmac.new(secret, ProgramCache.MAGIC + key + payload, hashlib.sha256).digest()
+
+    def load(self, key: bytes) -> Any:
+        # Qualquer entrada ilegível, de outra chave ou com assinatura errada é tratada como ausente
+        secret = self.secret()
+        if secret is None:
+            return None
+        path = self.path(key)
+        header = self.MAGIC + key
+        try:
+            with open(path, 'rb') as file:
+                data = file.read()
+            if data[:len(header)] != header:
+                return None
+            signature, payload = data[len(header):len(header) + 32], data[len(header) + 32:]
+            if not hmac.compare_digest(signature, ProgramCache.sign(secret, key, payload)):
+                return None
+            # Sem o coletor de ciclos, que seria disparado várias vezes por árvores grandes
+            enabled = gc.isenabled()
+            gc.disable()
+            try:
+                entry = pickle.loads(payload)
+            finally:
+                if enabled:
+                    gc.enable()
+            os.utime(path)
+        except Exception:
+            return None
+        return entry
+
+    def store(self, key: bytes, entry: Any) -> None:
+        # Escrita atômica; falhas (diretório somente leitura, árvore profunda demais) só deixam de usar o cache
+        secret = self.secret()
+        if secret is None:
+            return
+        try:
+            payload = pickle.dumps(entry, protocol=pickle.HIGHEST_PROTOCOL)
+            os.makedirs(self.directory, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        except (OSError, RecursionError, pickle.PicklingError):
+            return
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                file.write(self.MAGIC + key)
+                file.write(ProgramCache.sign(secret, key, payload))
+                file.write(payload)
+            os.replace(temp_path, self.path(key))
+            self.evict()
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def evict(self) -> None:
+        # Remove as entradas usadas há mais tempo até o diretório caber no limite
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".arbc"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
 # Execução
+ENGINES = ("tree", "vm", "closure", "python")
+
+def stream(lines: Iterable[str], runtime: Runtime = None, flush: bool = False) -> None:
+    # Executa cada instrução de nível superior assim que ela é analisada; só os escopos e os
+    # tipos das variáveis globais são mantidos entre as instruções
+    resolver = Resolver()
+    checker = TypeChecker()
+    frame = Frame(resolver.start(), runtime=runtime)
+    for statement in Parser().statements(lines):
+        resolver.visit(statement)
+        checker.run(statement)
+        frame.grow()
+        execute(statement, frame)
+        if flush:
+            frame.runtime.output.flush()
+
+def compile_program(tree: Node, engine: str, filename: str = "<arbor>") -> Callable[[Frame], None]:
+    # Prepara uma árvore já verificada para o motor escolhido; a função devolvida executa o
+    # programa a partir do escopo global e pode ser chamada de novo a cada execução
+    if engine == "vm":
+        bytecode = Compiler().compile(tree)
+        program = lambda st: VM().run(bytecode, st)
+    elif engine == "closure":
+        program = ClosureCompiler().compile(tree)
+    elif engine == "python":
+        run = Transpiler().compile(tree, filename)
+        program = lambda st: run(st.runtime.output.write)
+    else:
+        return lambda st: execute(tree, st)
+
+    def run_unlimited(st: Frame) -> None:
+        # Um Runtime com Budget montado fora do Interpreter e da linha de comando também é recusado
+        if st.runtime.budget is not None:
+            raise ValueError("Limites de execução só podem ser usados com o motor tree")
+        program(st)
+    return run_unlimited
+
+# API de execução
+class LatencyStats:
+    # Contadores de todas as execuções; média e percentis sobre as últimas WINDOW
+    WINDOW = 10000
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.slowest = 0.0
+        self.samples: deque = deque(maxlen=self.WINDOW)
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.slowest = max(self.slowest, seconds)
+        self.samples.append(seconds)
+
+    def summary(self) -> dict:
+        samples = sorted(self.samples)
+        percentile = lambda fraction: samples[min(len(samples) - 1, int(len(samples) * fraction))] * 1000 \
+            if samples else 0.0
+        return {
+            "count": self.count,
+            "mean_ms": self.total / self.count * 1000 if self.count else 0.0,
+            "p50_ms": percentile(0.50),
+            "p95_ms": percentile(0.95),
+            "p99_ms": percentile(0.99),
+            "max_ms": self.slowest * 1000,
+        }
+
+class RunResult:
+    __slots__ = ("output", "error", "elapsed")
+
+    def __init__(self, output: str, error: str | None, elapsed: float):
+        self.output = output
+        # Tipo e mensagem da exceção ('ValueError: ...'), ou None se o programa terminou
+        self.error = error
+        self.elapsed = elapsed
+
+class Interpreter:
+    # Executa programas a partir do código-fonte e devolve a saída capturada. Os programas já
+    # analisados e compilados ficam guardados, então repetir um código pula parser, verificação e
+    # compilação; só o escopo global é criado de novo a cada execução
+    MAX_PROGRAMS = 256
+
+    def __init__(self, engine: str = "tree", opt_level: int = 0, max_steps: int | None = None,
+                 time_limit: float | None = None, max_size: int | None = None):
+        if engine not in ENGINES:
+            raise ValueError(f"Motor desconhecido: {engine}")
+        if opt_level not in Optimizer.LEVELS:
+            raise ValueError(f"Nível de otimização desconhecido: {opt_level}")
+        # Limites de cada execução (veja Budget); cada run recebe um Budget novo
+        self.limits = (max_steps, time_limit, max_size)
+        check_limits(engine, self.limits)
+        self.engine = engine
+        self.opt_level = opt_level
+        # Código-fonte -> (layout global, programa compilado), do usado há mais tempo ao mais recente
+        self.programs: dict = {}
+        self.latency = LatencyStats()
+        self.errors = 0
+        self.hits = 0
+
+    def prepare(self, code: str, filename: str = "<arbor>") -> Tuple[FrameLayout, Callable[[Frame], None]]:
+        program = self.programs.pop(code, None)
+        if program is None:
+            tree = Parser().run(code)
+            Resolver().run(tree)
+            TypeChecker().run(tree)
+            if self.opt_level > 0:
+                tree = Optimizer(self.opt_level).run(tree)
+                Resolver().run(tree)
+                TypeChecker().run(tree)
+            program = (tree.layout, compile_program(tree, self.engine, filename))
+            if len(self.programs) >= self.MAX_PROGRAMS:
+                del self.programs[next(iter(self.programs))]
+        else:
+            self.hits += 1
+        self.programs[code] = program
+        return program
+
+    def limited(self) -> bool:
+        return any(limit is not None for limit in self.limits)
+
+    def run(self, code: str, filename: str = "<arbor>") -> RunResult:
+        start = time.perf_counter()
+        sink = CaptureSink()
+        error = None
+        try:
+            layout, program = self.prepare(code, filename)
+            budget = Budget(*self.limits) if self.limited() else None
+            program(Frame(layout, runtime=Runtime(sink, budget=budget)))
+        except Exception as exception:
+            error = f"{type(exception).__name__}: {exception}"
+            self.errors += 1
+        elapsed = time.perf_counter() - start
+        self.latency.add(elapsed)
+        return RunResult(sink.getvalue(), error, elapsed)
+
+    def stats(self) -> dict:
+        return {**self.latency.summary(), "errors": self.errors, "cache_hits": self.hits,
+                "programs": len(self.programs)}
+
+# Execução em lote
+# multiprocessing e socketserver são importados só nos modos que os usam, para não somar
+# dezenas de milissegundos à partida de cada execução comum
+def batch_worker(connection: Any, engine: str, opt_level: int, limits: tuple = (None, None, None)) -> None:
+    # Processo do pool: recebe caminhos até receber None e executa cada arquivo com o mesmo
+    # Interpreter, que continua aquecido entre os arquivos
+    interpreter = Interpreter(engine, opt_level, *limits)
+    while True:
+        path = connection.recv()
+        if path is None:
+            break
+        try:
+            with open(path, 'r') as file:
+                code = file.read()
+        except (IOError, UnicodeDecodeError) as exception:
+            connection.send(RunResult("", f"{type(exception).__name__}: {exception}", 0.0))
+            continue
+        connection.send(interpreter.run(code, path))
+
+class BatchRunner:
+    def __init__(self, jobs: int, timeout: float | None = None, engine: str = "tree", opt_level: int = 0,
+                 limits: tuple = (None, None, None)):
+        # Recusa os limites aqui, e não em cada processo do pool, que terminaria sem responder
+        check_limits(engine, limits)
+        self.jobs = max(1, jobs)
+        self.timeout = timeout
+        self.engine = engine
+        self.opt_level = opt_level
+        self.limits = limits
+
+    def spawn(self) -> Tuple[Any, Any]:
+        import multiprocessing
+        connection, child = multiprocessing.Pipe()
+        process = multiprocessing.Process(target=batch_worker,
+                                          args=(child, self.engine, self.opt_level, self.limits), daemon=True)
+        process.start()
+        child.close()
+        return connection, process
+
+    def run(self, paths: List[str]) -> Iterator[Tuple[str, RunResult | None]]:
+        # Entrega (caminho, resultado) na ordem em que os arquivos terminam. Um arquivo que passa
+        # do tempo limite tem o processo encerrado e substituído por um novo, e resultado None
+        from multiprocessing.connection import wait
+        pending = deque(paths)
+        idle = [self.spawn() for _ in range(min(self.jobs, len(paths)))]
+        busy: dict = {}
+        try:
+            while pending or busy:
+                while idle and pending:
+                    connection, process = idle.pop()
+                    path = pending.popleft()
+                    connection.send(path)
+                    busy[connection] = (process, path, time.perf_counter())
+                deadline = None
+                if self.timeout is not None:
+                    first = min(start for _, _, start in busy.values())
+                    deadline = max(0.0, first + self.timeout - time.perf_counter())
+                for connection in wait(list(busy), deadline):
+                    process, path, start = busy.pop(connection)
+                    try:
+                        result = connection.recv()
+                    except EOFError:
+                        # O processo morreu sem responder; outro ocupa o seu lugar
+                        process.join()
+                        connection.close()
+                        idle.append(self.spawn())
+                        yield path, RunResult("", f"Processo encerrado com código {process.exitcode}",
+                                              time.perf_counter() - start)
+                        continue
+                    idle.append((connection, process))
+                    yield path, result
+                if self.timeout is not None:
+                    now = time.perf_counter()
+                    for connection, (process, path, start) in list(busy.items()):
+                        if now - start >= self.timeout:
+                            del busy[connection]
+                            process.terminate()
+                            process.join()
+                            connection.close()
+                            idle.append(self.spawn())
+                            yield path, None
+        finally:
+            for connection, process in idle:
+                connection.send(None)
+            for process, _, _ in busy.values():
+                process.terminate()
+            for _, process in idle:
+                process.join()
+
+def batch_paths(targets: List[str]) -> List[str]:
+    # Diretórios contribuem com os seus arquivos .arbor, em ordem alfabética
+    paths = []
+    for target in targets:
+        if os.path.isdir(target):
+            paths.extend(sorted(os.path.join(target, name) for name in os.listdir(target)
+                                if name.endswith('.arbor')))
+        else:
+            paths.append(target)
+    return paths
+
+def batch(targets: List[str], jobs: int, timeout: float | None, engine: str, opt_level: int,
+          expected_dir: str | None = None, limits: tuple = (None, None, None)) -> bool:
+    # Executa os arquivos e imprime o resultado de cada um e o resumo; True se todos passaram.
+    # Com um arquivo .out (ao lado do programa ou em expected_dir), a saída também é comparada
+    paths = batch_paths(targets)
+    statuses = {}
+    times = {}
+    start = time.perf_counter()
+    for path, result in BatchRunner(jobs, timeout, engine, opt_level, limits).run(paths):
+        detail = ""
+        if result is None:
+            status, detail = "tempo esgotado", f"mais de {timeout:g} s"
+            elapsed = timeout
+        elif result.error is not None:
+            status, detail, elapsed = "erro", result.error, result.elapsed
+        else:
+            elapsed = result.elapsed
+            status = "ok"
+            stem = os.path.splitext(os.path.basename(path))[0]
+            expected_path = os.path.join(expected_dir or os.path.dirname(path), stem + ".out")
+            if os.path.exists(expected_path):
+                with open(expected_path, 'r') as file:
+                    expected = file.read().splitlines()
+                lines = result.output.splitlines()
+                if lines != expected:
+                    status = "diferente"
+                    index = next((index for index, (line, want) in enumerate(zip(lines, expected))
+                                  if line != want), min(len(lines), len(expected)))
+                    got = lines[index] if index < len(lines) else "<fim>"
+                    want = expected[index] if index < len(expected) else "<fim>"
+                    detail = f"linha {index + 1}: esperado {want!r}, obtido {got!r}"
+        statuses[path] = status
+        times[path] = elapsed
+        print(f"{status:<15} {elapsed * 1000:10.2f} ms  {path}" + (f": {detail}" if detail else ""))
+        sys.stdout.flush()
+    wall = time.perf_counter() - start
+
+    counts = {status: 0 for status in ("ok", "erro", "diferente", "tempo esgotado")}
+    for status in statuses.values():
+        counts[status] += 1
+    print(f"\n{len(paths)} arquivos em {wall:.2f} s com {min(jobs, len(paths))} processos: "
+          + ", ".join(f"{count} {status}" for status, count in counts.items()))
+    if times:
+        print(f"Tempo somado dos arquivos: {sum(times.values()):.2f} s; mais lentos:")
+        for path in sorted(times, key=times.get, reverse=True)[:5]:
+            print(f"  {times[path] * 1000:10.2f} ms  {path}")
+    return counts["ok"] == len(paths)
+
+# Daemon
+# Protocolo: cada mensagem é um quadro com o tamanho em 4 bytes (big-endian) seguido de um objeto
+# JSON em UTF-8. Requisições: {"code": "...", "filename": "..."} executa um programa e responde
+# {"output": ..., "error": ..., "elapsed_ms": ...}; {"command": "stats"} responde as latências do
+# interpretador e do daemon. Uma conexão pode enviar várias requisições em sequência.
+def write_frame(file: Any, message: dict) -> None:
+    data = json.dumps(message, ensure_ascii=False).encode("utf-8")
+    file.write(len(data).to_bytes(4, "big") + data)
+    file.flush()
+
+def read_frame(file: Any) -> dict | None:
+    header = file.read(4)
+    if not header:
+        return None
+    if len(header) < 4:
+        raise ValueError("Quadro incompleto")
+    size = int.from_bytes(header, "big")
+    data = file.read(size)
+    if len(data) < size:
+        raise ValueError("Quadro incompleto")
+    return json.loads(data.decode("utf-8"))
+
+def serve(path: str, interpreter: Interpreter) -> None:
+    import socket
+    import socketserver
+    import threading
+    if not hasattr(socketserver, "ThreadingUnixStreamServer"):
+        raise ValueError("O modo daemon requer sockets Unix")
+    if os.path.exists(path):
+        # Um socket que ninguém atende sobrou de um daemon anterior e pode ser removido
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            os.unlink(path)
+        else:
+            raise ValueError(f"Já existe um daemon ouvindo em '{path}'")
+        finally:
+            probe.close()
+    # As conexões são atendidas em threads, mas os programas executam um de cada vez
+    lock = threading.Lock()
+    latency = LatencyStats()
+
+    def respond(request: Any) -> dict:
+        if not isinstance(request, dict):
+            return {"error": "Requisição deve ser um objeto JSON"}
+        if request.get("command") == "stats":
+            return {"interpreter": interpreter.stats(), "daemon": latency.summary()}
+        code = request.get("code")
+        if not isinstance(code, str):
+            return {"error": "Requisição sem 'code' nem 'command'"}
+        with lock:
+            result = interpreter.run(code, request.get("filename") or "<arbor>")
+        return {"output": result.output, "error": result.error, "elapsed_ms": result.elapsed * 1000}
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self) -> None:
+            while True:
+                try:
+                    request = read_frame(self.rfile)
+                except (ValueError, UnicodeDecodeError) as exception:
+                    write_frame(self.wfile, {"error": f"Requisição inválida: {exception}"})
+                    return
+                if request is None:
+                    return
+                start = time.perf_counter()
+                response = respond(request)
+                latency.add(time.perf_counter() - start)
+                write_frame(self.wfile, response)
+
+    server = socketserver.ThreadingUnixStreamServer(path, Handler)
+    server.daemon_threads = True
+    print(f"Daemon do Arbor ouvindo em {path} (motor {interpreter.engine})", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.unlink(path)
+
+class DaemonClient:
+    # Cliente do daemon para programas Python; mantém uma conexão aberta entre as requisições
+    def __init__(self, path: str):
+        import socket
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.socket.connect(path)
+        self.file = self.socket.makefile('rwb')
+
+    def request(self, message: dict) -> dict:
+        write_frame(self.file, message)
+        response = read_frame(self.file)
+        if response is None:
+            raise ValueError("O daemon fechou a conexão")
+        return response
+
+    def run(self, code: str, filename: str | None = None) -> dict:
+        return self.request({"code": code, "filename": filename})
+
+    def stats(self) -> dict:
+        return self.request({"command": "stats"})
+
+    def close(self) -> None:
+        self.file.close()
+        self.socket.close()
+
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
+    arg_parser = argparse.ArgumentParser(prog="main.py", description="Interpretador da linguagem Arbor")
+    arg_parser.add_argument("arquivo", nargs="?", help="programa .arbor a executar")
+    arg_parser.add_argument("--engine", choices=ENGINES, default="tree",
+                            help="motor de execução: árvore (tree), bytecode (vm), closures (closure) "
+                                 "ou código Python gerado (python)")
+    arg_parser.add_argument("--opt-level", type=int, choices=sorted(Optimizer.LEVELS), default=0,
+                            help="nível de otimização da AST antes da execução (padrão: 0)")
+    arg_parser.add_argument("--emit-python", metavar="ARQUIVO",
+                            help="grava o módulo Python gerado pelo transpilador em ARQUIVO")
+    arg_parser.add_argument("--cache", action="store_true",
+                            help=f"lê e grava a árvore já analisada no cache ({ProgramCache.DIRECTORY})")
+    arg_parser.add_argument("--no-cache", action="store_true",
+                            help="não usa o cache, mesmo com --cache ou --cache-dir (o cache já é desligado "
+                                 "por padrão)")
+    arg_parser.add_argument("--cache-dir", metavar="DIRETÓRIO",
+                            help=f"diretório do cache, que também liga o cache e guarda o segredo de "
+                                 f"assinatura (padrão: {ProgramCache.DIRECTORY} ao lado do programa)")
+    arg_parser.add_argument("--cache-size", type=int, default=64, metavar="MB",
+                            help="tamanho máximo do cache antes de remover as entradas mais antigas (padrão: 64)")
+    arg_parser.add_argument("--output", choices=("print", "buffer", "binary"), default="print",
+                            help="destino do print: print() a cada valor (print), buffer de texto em "
+                                 "memória (buffer) ou bytes escritos direto no arquivo (binary)")
+    arg_parser.add_argument("--output-file", metavar="ARQUIVO",
+                            help="arquivo de saída do programa com --output=binary (padrão: saída padrão)")
+    arg_parser.add_argument("--buffer-size", type=int, default=1 << 20, metavar="BYTES",
+                            help="tamanho do buffer antes de escrever, com --output=buffer ou binary; "
+                                 "0 escreve a cada print (padrão: 1 MiB)")
+    arg_parser.add_argument("--stream", action="store_true",
+                            help="executa cada instrução assim que é lida, sem imprimir a árvore; "
+                                 "sem arquivo (ou com '-') lê da entrada padrão")
+    arg_parser.add_argument("--no-ast", action="store_true",
+                            help="não imprime a árvore nem os cabeçalhos, só a saída do programa")
+    arg_parser.add_argument("--save-ast", metavar="ARQUIVO",
+                            help="grava a árvore final em ARQUIVO (.json em JSON, qualquer outra extensão "
+                                 "no formato binário .arbt); arquivos .arbt e .json podem ser executados "
+                                 "diretamente, sem passar pelo parser")
+    arg_parser.add_argument("--batch", nargs="+", metavar="CAMINHO",
+                            help="executa vários programas (arquivos ou diretórios com .arbor) em um pool de "
+                                 "processos e mostra um relatório; a saída de cada um é comparada com o "
+                                 "arquivo .out de mesmo nome, quando existir")
+    arg_parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, metavar="N",
+                            help="processos do --batch (padrão: número de CPUs)")
+    arg_parser.add_argument("--parallel", type=int, default=1, metavar="N",
+                            help="executa em N processos os loops 'grow in' cujo corpo não atribui a "
+                                 "variáveis de fora dele, com --engine=tree ou closure (padrão: 1, desligado)")
+    arg_parser.add_argument("--timeout", type=float, default=60.0, metavar="SEGUNDOS",
+                            help="tempo máximo de cada programa no --batch; 0 desativa (padrão: 60)")
+    arg_parser.add_argument("--expected", metavar="DIRETÓRIO",
+                            help="diretório dos arquivos .out do --batch (padrão: ao lado de cada programa)")
+    arg_parser.add_argument("--daemon", metavar="SOCKET",
+                            help="atende programas enviados por um socket Unix, sem sair entre as execuções")
+    arg_parser.add_argument("--profile", action="store_true",
+                            help="mede execuções e tempo de cada nó e mostra as linhas e os nós mais "
+                                 "custosos na saída de erro (só com --engine=tree)")
+    arg_parser.add_argument("--profile-stacks", metavar="ARQUIVO",
+                            help="com --profile, grava as pilhas colapsadas em ARQUIVO para gerar um "
+                                 "flame graph (flamegraph.pl, speedscope)")
+    arg_parser.add_argument("--stats", metavar="ARQUIVO",
+                            help="grava em JSON a memória de cada fase, os nós por classe, os escopos e as "
+                                 "maiores listas e strings em ARQUIVO ('-' para a saída de erro; só com "
+                                 "--engine=tree)")
+    arg_parser.add_argument("--max-steps", type=int, metavar="N",
+                            help="interrompe o programa depois de N iterações de loops (só com --engine=tree)")
+    arg_parser.add_argument("--time-limit", type=float, metavar="SEGUNDOS",
+                            help="interrompe o programa depois de SEGUNDOS de execução (só com --engine=tree)")
+    arg_parser.add_argument("--max-size", type=int, metavar="N",
+                            help="interrompe o programa quando uma lista ou string passa de N elementos "
+                                 "(só com --engine=tree)")
+    args = arg_parser.parse_args()
+
+    if args.output_file and args.output != "binary":
+        arg_parser.error("--output-file requer --output=binary")
+    if args.profile_stacks and not args.profile:
+        arg_parser.error("--profile-stacks requer --profile")
+    if args.profile and (args.engine != "tree" or args.stream):
+        arg_parser.error("--profile só pode ser usado com --engine=tree, sem --stream")
+    if args.parallel > 1 and (args.engine not in ("tree", "closure") or args.profile):
+        arg_parser.error("--parallel só pode ser usado com --engine=tree ou closure, sem --profile")
+    if args.stats and (args.engine != "tree" or args.stream or args.profile or args.parallel > 1):
+        arg_parser.error("--stats só pode ser usado com --engine=tree, sem --stream, --profile e --parallel")
+    limits = (args.max_steps, args.time_limit, args.max_size)
+    limited = any(limit is not None for limit in limits)
+    if limited and args.engine != "tree":
+        arg_parser.error("--max-steps, --time-limit e --max-size só podem ser usados com --engine=tree")
+    output_file = None
+    if args.output == "buffer":
+        sink = BufferedSink(sys.stdout, args.buffer_size)
+    elif args.output == "binary":
+        if args.output_file:
+            try:
+                output_file = open(args.output_file, 'wb')
+            except IOError:
+                print(f"Erro: Não foi possível escrever o arquivo '{args.output_file}'")
+                sys.exit(1)
+        sink = BinarySink(output_file, args.buffer_size)
+    else:
+        sink = PrintSink()
+    runtime = Runtime(sink, args.parallel)
+
+    if args.batch or args.daemon:
+        if args.arquivo or args.stream or args.profile or args.stats or args.emit_python or args.save_ast:
+            arg_parser.error("--batch e --daemon não aceitam arquivo, --stream, --profile, --stats, "
+                             "--emit-python nem --save-ast")
+        if args.batch:
+            passed = batch(args.batch, args.jobs, args.timeout or None, args.engine, args.opt_level, args.expected,
+                           limits)
+            sys.exit(0 if passed else 1)
+        try:
+            serve(args.daemon, Interpreter(args.engine, args.opt_level, *limits))
+        except (ValueError, OSError) as error:
+            print(f"Erro: {error}")
+            sys.exit(1)
+        sys.exit(0)
+
+    if args.stream:
+        if args.engine != "tree" or args.opt_level > 0 or args.emit_python:
+            arg_parser.error("--stream só pode ser usado com --engine=tree, sem --opt-level e --emit-python")
+        # O prazo de --time-limit conta a partir daqui, junto com a análise de cada instrução
+        runtime.budget = Budget(*limits) if limited else None
+        if args.arquivo in (None, "-"):
+            try:
+                stream(sys.stdin, runtime, flush=True)
+            finally:
+                sink.flush()
+                runtime.close()
+            sys.exit(0)
+
+    if args.arquivo is None:
         print("Uso: python main.py <arquivo.arbor>")
         sys.exit(1)
 
-    filename = sys.argv[1]
-    if not filename.endswith('.arbor'):
+    filename = args.arquivo
+    serialized = filename.endswith(AstCodec.EXTENSIONS)
+    if not filename.endswith('.arbor') and not (serialized and not args.stream):
         print("Erro: O arquivo deve ter extensão .arbor")
         sys.exit(1)
 
+    if args.stream:
+        try:
+            file = open(filename, 'r')
+        except FileNotFoundError:
+            print(f"Erro: Arquivo '{filename}' não encontrado")
+            sys.exit(1)
+        except IOError:
+            print(f"Erro: Não foi possível ler o arquivo '{filename}'")
+            sys.exit(1)
+        with file:
+            try:
+                stream(file, runtime)
+            finally:
+                sink.flush()
+                runtime.close()
+        sys.exit(0)
+
+    # Com --stats, cada fase é medida separadamente; sem ele, as fases não custam nada a mais
+    stats = MemoryStats() if args.stats else None
+    phase = stats.phase if stats is not None else lambda name: nullcontext()
     try:
-        with open(filename, 'r') as file:
-            code = file.read()
+        with open(filename, 'rb') as file, phase("preprocess"):
+            code = file.read() if serialized else map_source(file)
     except FileNotFoundError:
         print(f"Erro: Arquivo '{filename}' não encontrado")
         sys.exit(1)
@@ -720,17 +4917,115 @@ if __name__ == "__main__":
         print(f"Erro: Não foi possível ler o arquivo '{filename}'")
         sys.exit(1)
 
-    code_filtered = PrePro.filter(code)
-    parser = Parser()
-    tree = parser.run(code_filtered)
+    cache = None
+    # O perfil precisa das posições que o parser anota, que não vão para o cache, e as
+    # estatísticas precisam passar por todas as fases
+    use_cache = (args.cache or args.cache_dir is not None) and not args.no_cache
+    if use_cache and not serialized and not args.profile and not args.stats:
+        cache_dir = args.cache_dir or os.path.join(os.path.dirname(os.path.abspath(filename)), ProgramCache.DIRECTORY)
+        # Com --cache-dir, o segredo fica no próprio diretório e nada é gravado na pasta pessoal
+        secret_path = os.path.join(args.cache_dir, "cache.key") if args.cache_dir else None
+        cache = ProgramCache(cache_dir, args.cache_size * 1024 * 1024, secret_path)
+        cache_key = cache.key(code, args.opt_level)
+    entry = cache.load(cache_key) if cache else None
+
+    if entry is None:
+        if serialized:
+            with phase("parse"):
+                tree = AstCodec.load(code)
+        else:
+            parser = Parser({} if args.profile else None)
+            with phase("tokenize"):
+                tokens = Lexer.tokenize(code)
+            with phase("parse"):
+                tree = parser.parseTokens(tokens)
+            if stats is not None:
+                stats.tokens = len(tokens)
+        with phase("resolve"):
+            # Erros de nome e de tipo são verificados no programa original, antes de otimizar
+            Resolver().run(tree)
+            TypeChecker().run(tree)
+            report = []
+            if args.opt_level > 0:
+                optimizer = Optimizer(args.opt_level)
+                tree = optimizer.run(tree)
+                report = optimizer.report
+                Resolver().run(tree)
+                TypeChecker().run(tree)
+        if cache:
+            cache.store(cache_key, (tree, report))
+    else:
+        tree, report = entry
+    for name, removed, rewritten in report:
+        print(f"Otimização {name}: {removed} nós removidos, {rewritten} reescritas", file=sys.stderr)
+    layout = tree.layout
+
+    if args.emit_python:
+        try:
+            with open(args.emit_python, 'w') as file:
+                file.write(Transpiler().module(tree, filename))
+        except IOError:
+            print(f"Erro: Não foi possível escrever o arquivo '{args.emit_python}'")
+            sys.exit(1)
+
+    if args.save_ast:
+        try:
+            AstCodec.save(tree, args.save_ast)
+        except IOError:
+            print(f"Erro: Não foi possível escrever o arquivo '{args.save_ast}'")
+            sys.exit(1)
     
-    # Imprime a árvore antes de avaliar
-    print("\nÁrvore Sintática Abstrata:")
-    print("=" * 50)
-    print(tree.to_string())
-    print("=" * 50)
-    print("\nResultado da execução:")
-    print("-" * 50)
+    # Imprime a árvore antes de avaliar, escrevendo direto na saída em vez de montar uma string
+    if not args.no_ast:
+        print("\nÁrvore Sintática Abstrata:")
+        print("=" * 50)
+        AstWriter(sys.stdout).write(tree)
+        print()
+        print("=" * 50)
+        print("\nResultado da execução:")
+        print("-" * 50)
     
-    st = SymbolTable()
-    tree.evaluate(st)
\ No newline at end of file
+    # A árvore impressa acima precisa sair antes dos bytes escritos direto pelo destino binário
+    sys.stdout.flush()
+    profiler = None
+    if args.profile:
+        profiler = Profiler(tree, None if serialized else parser.positions, None if serialized else parser.tokens)
+        profiler.install()
+    if stats is not None:
+        stats.count(tree)
+        # O escopo global já é criado com os construtores trocados, para contar a profundidade
+        stats.install()
+    st = Frame(layout, runtime=runtime)
+    # O prazo de --time-limit conta a partir da execução, sem a análise e a impressão da árvore
+    runtime.budget = Budget(*limits) if limited else None
+    try:
+        with phase("evaluate"):
+            compile_program(tree, args.engine, filename)(st)
+    finally:
+        sink.flush()
+        runtime.close()
+        if output_file is not None:
+            output_file.close()
+        if stats is not None:
+            stats.uninstall()
+            tracemalloc.stop()
+            try:
+                if args.stats == "-":
+                    json.dump(stats.report(filename, args.engine), sys.stderr, ensure_ascii=False, indent=2)
+                    print(file=sys.stderr)
+                else:
+                    with open(args.stats, 'w') as file:
+                        json.dump(stats.report(filename, args.engine), file, ensure_ascii=False, indent=2)
+            except IOError:
+                print(f"Erro: Não foi possível escrever o arquivo '{args.stats}'")
+        if profiler is not None:
+            profiler.uninstall()
+            profiler.report("" if serialized else code[:].decode())
+            if args.profile_stacks:
+                try:
+                    with open(args.profile_stacks, 'w') as file:
+                        for line in profiler.collapsed():
+                            file.write(line + "\n")
+                except IOError:
+                    print(f"Erro: Não foi possível escrever o arquivo '{args.profile_stacks}'")
+                    sys.exit(1)
\ No newline at end of file
@@ -0,0 +1,62 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import main  # noqa: E402
+
+# Duas metades acima de ROPE_MIN: a dobra de constantes produz um StrBuilder
+HALF = "0123456789" * 30
+LONG_FOLD = f'seed text = "{HALF}" + "{HALF}"\nprint text\n'
+
+
+def optimized(code: str) -> main.Node:
+    tree = main.Parser().run(code)
+    main.Resolver().run(tree)
+    main.TypeChecker().run(tree)
+    return main.Optimizer(1).run(tree)
+
+
+def run_tree(tree: main.Node) -> str:
+    main.Resolver().run(tree)
+    main.TypeChecker().run(tree)
+    sink = main.CaptureSink()
+    main.execute(tree, main.Frame(tree.layout, runtime=main.Runtime(sink)))
+    return sink.getvalue()
+
+
+class FoldedStringTest(unittest.TestCase):
+    def test_fold_produces_plain_str(self):
+        tree = optimized(LONG_FOLD)
+        literals = [node for node in main.AstCodec.records(tree) if node[0] == "StrVal"]
+        self.assertEqual(len(literals), 1)
+        self.assertIs(type(literals[0][1]), str)
+
+    def test_binary_round_trip(self):
+        tree = main.AstCodec.load(main.AstCodec.toBinary(optimized(LONG_FOLD)))
+        self.assertEqual(run_tree(tree), HALF * 2 + "\n")
+
+    def test_json_round_trip(self):
+        tree = main.AstCodec.load(main.AstCodec.toJson(optimized(LONG_FOLD)).encode())
+        self.assertEqual(run_tree(tree), HALF * 2 + "\n")
+
+    def test_save_ast_from_command_line(self):
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, "fold.arbor")
+            with open(source, "w") as file:
+                file.write(LONG_FOLD)
+            for name in ("fold.arbt", "fold.json"):
+                saved = os.path.join(directory, name)
+                subprocess.run([sys.executable, os.path.join(ROOT, "main.py"), "--opt-level=1", "--no-ast",
+                                "--save-ast", saved, source], check=True, capture_output=True)
+                result = subprocess.run([sys.executable, os.path.join(ROOT, "main.py"), "--no-ast", saved],
+                                        check=True, capture_output=True, text=True)
+                self.assertEqual(result.stdout, HALF * 2 + "\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
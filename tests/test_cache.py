@@ -0,0 +1,67 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAIN = os.path.join(ROOT, "main.py")
+sys.path.insert(0, ROOT)
+
+import main  # noqa: E402
+
+PROGRAM = "seed x = 40\nprint x + 2\n"
+
+
+def command_line(home: str, *arguments: str, env: dict = None) -> subprocess.CompletedProcess:
+    # A pasta pessoal aponta para um diretório temporário, para detectar gravações fora do workspace
+    environment = {key: value for key, value in os.environ.items() if key != main.ProgramCache.SECRET_ENV}
+    environment.update(HOME=home, **(env or {}))
+    return subprocess.run([sys.executable, MAIN, "--no-ast", *arguments], capture_output=True, text=True,
+                          env=environment, timeout=30)
+
+
+class ProgramCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.temp = tempfile.TemporaryDirectory()
+        self.home = os.path.join(self.temp.name, "home")
+        os.mkdir(self.home)
+        self.source = os.path.join(self.temp.name, "program.arbor")
+        with open(self.source, "w") as file:
+            file.write(PROGRAM)
+
+    def tearDown(self):
+        self.temp.cleanup()
+
+    def entries(self, directory: str) -> list:
+        return [name for name in os.listdir(directory) if name.endswith(".arbc")]
+
+    def test_cache_dir_keeps_secret_inside(self):
+        cache_dir = os.path.join(self.temp.name, "cache")
+        for _ in range(2):
+            result = command_line(self.home, "--cache-dir", cache_dir, self.source)
+            self.assertEqual(result.stdout, "42\n", result.stderr)
+        self.assertEqual(len(self.entries(cache_dir)), 1)
+        self.assertTrue(os.path.exists(os.path.join(cache_dir, "cache.key")))
+        self.assertEqual(os.listdir(self.home), [])
+
+    def test_secret_from_environment(self):
+        secret_path = os.path.join(self.temp.name, "keys", "arbor.key")
+        result = command_line(self.home, "--cache", self.source, env={main.ProgramCache.SECRET_ENV: secret_path})
+        self.assertEqual(result.stdout, "42\n", result.stderr)
+        self.assertTrue(os.path.exists(secret_path))
+        self.assertEqual(len(self.entries(os.path.join(self.temp.name, main.ProgramCache.DIRECTORY))), 1)
+        self.assertEqual(os.listdir(self.home), [])
+
+    def test_entry_signed_with_other_secret_is_ignored(self):
+        directory = os.path.join(self.temp.name, "cache")
+        first = main.ProgramCache(directory, secret_path=os.path.join(self.temp.name, "first.key"))
+        second = main.ProgramCache(directory, secret_path=os.path.join(self.temp.name, "second.key"))
+        key = first.key(PROGRAM, 0)
+        first.store(key, "entrada")
+        self.assertEqual(first.load(key), "entrada")
+        self.assertIsNone(second.load(key))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import os
+import random
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TESTS_DIR = os.path.join(ROOT, "tests")
+sys.path.insert(0, ROOT)
+
+import main  # noqa: E402
+
+# Caracteres que mudam a leitura do que vem depois: quebras de linha, comentários, strings e blocos
+INSERTIONS = ("\n", "/", "//", '"', "{", "}", " ", "x", "1", "=")
+EDITS_PER_PROGRAM = 300
+# Em programas muito aninhados (13_deep_nesting), uma edição com erro de sintaxe reanalisa cada
+# nível até o programa inteiro; eles ficam de fora para o teste continuar rápido
+MAX_SOURCE = 10000
+
+
+def records(tree):
+    return None if tree is None else list(main.AstCodec.records(tree))
+
+
+def full_parse(source: str):
+    try:
+        return records(main.Parser().run(source))
+    except ValueError:
+        return None
+
+
+def edited(parser: main.IncrementalParser, offset: int, removed: int, inserted: str):
+    try:
+        return records(parser.edit(offset, removed, inserted))
+    except ValueError:
+        return None
+
+
+class IncrementalParserTest(unittest.TestCase):
+    def test_comment_swallows_next_statement(self):
+        source = "seed a = 1\n// c\nseed b = 2\nprint a\n"
+        parser = main.IncrementalParser(source)
+        tree = parser.edit(source.index("// c") + 4, 1, "")
+        self.assertEqual(records(tree), full_parse(parser.source))
+        self.assertEqual(len(tree.children), 2)
+
+    def test_random_edits_match_full_parse(self):
+        names = sorted(name for name in os.listdir(TESTS_DIR) if name.endswith(".arbor"))
+        for name in names:
+            with open(os.path.join(TESTS_DIR, name)) as file:
+                source = file.read()
+            if len(source) > MAX_SOURCE:
+                continue
+            generator = random.Random(name)
+            parser = main.IncrementalParser(source)
+            for _ in range(EDITS_PER_PROGRAM):
+                # Cada edição parte do programa original: a edição é desfeita em seguida
+                offset = generator.randrange(len(source))
+                if generator.random() < 0.5:
+                    removed, inserted = 1, ""
+                else:
+                    removed, inserted = 0, generator.choice(INSERTIONS)
+                result = edited(parser, offset, removed, inserted)
+                self.assertEqual(result, full_parse(parser.source),
+                                 f"{name}: {removed} removido(s) e {inserted!r} inserido em {offset}")
+                edited(parser, offset, len(inserted), source[offset:offset + removed])
+                if parser.tree is None:
+                    parser = main.IncrementalParser(source)
+                self.assertEqual(records(parser.tree), full_parse(source), f"{name}: desfazendo a edição em {offset}")
+
+
+if __name__ == "__main__":
+    unittest.main()
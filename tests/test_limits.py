@@ -0,0 +1,67 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAIN = os.path.join(ROOT, "main.py")
+sys.path.insert(0, ROOT)
+
+import main  # noqa: E402
+
+COMPILED_ENGINES = [engine for engine in main.ENGINES if engine != "tree"]
+ENDLESS = "seed i = 0\ngrow while i >= 0 {\n    i = i + 1\n}\n"
+LIMIT_OPTIONS = (["--max-steps", "10"], ["--time-limit", "1"], ["--max-size", "10"])
+
+
+def command_line(*arguments: str, stdin: str = "") -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, MAIN, *arguments], input=stdin, capture_output=True, text=True,
+                          timeout=30)
+
+
+class EngineLimitsTest(unittest.TestCase):
+    def test_tree_applies_limits(self):
+        result = main.Interpreter("tree", 0, max_steps=100).run(ENDLESS)
+        self.assertTrue(result.error.startswith("LimitExceeded:"), result.error)
+
+    def test_interpreter_rejects_other_engines(self):
+        for engine in COMPILED_ENGINES:
+            for limits in ((10, None, None), (None, 1.0, None), (None, None, 10)):
+                with self.assertRaisesRegex(ValueError, "motor tree"):
+                    main.Interpreter(engine, 0, *limits)
+
+    def test_batch_runner_rejects_other_engines(self):
+        for engine in COMPILED_ENGINES:
+            with self.assertRaisesRegex(ValueError, "motor tree"):
+                main.BatchRunner(1, engine=engine, limits=(10, None, None))
+
+    def test_compiled_program_rejects_budget(self):
+        tree = main.Parser().run(ENDLESS)
+        main.Resolver().run(tree)
+        main.TypeChecker().run(tree)
+        for engine in COMPILED_ENGINES:
+            program = main.compile_program(tree, engine)
+            runtime = main.Runtime(main.CaptureSink(), budget=main.Budget(max_steps=10))
+            with self.assertRaisesRegex(ValueError, "motor tree"):
+                program(main.Frame(tree.layout, runtime=runtime))
+
+    def test_command_line_rejects_other_engines(self):
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, "endless.arbor")
+            with open(source, "w") as file:
+                file.write(ENDLESS)
+            socket_path = os.path.join(directory, "arbor.sock")
+            modes = ([source], ["--batch", directory], ["--daemon", socket_path], ["--stream"])
+            for engine in COMPILED_ENGINES:
+                for limit in LIMIT_OPTIONS:
+                    for mode in modes:
+                        result = command_line("--no-ast", "--engine", engine, *limit, *mode, stdin=ENDLESS)
+                        self.assertEqual(result.returncode, 2, f"{engine} {limit} {mode}")
+                        self.assertIn("só podem ser usados com --engine=tree", result.stderr)
+            # O daemon é recusado antes de criar o socket
+            self.assertFalse(os.path.exists(socket_path))
+
+
+if __name__ == "__main__":
+    unittest.main()
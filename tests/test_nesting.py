@@ -0,0 +1,65 @@
+import os
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TESTS_DIR = os.path.join(ROOT, "tests")
+sys.path.insert(0, ROOT)
+
+import main  # noqa: E402
+
+COMPILED_ENGINES = [engine for engine in main.ENGINES if engine != "tree"]
+
+
+def nested_branches(depth: int) -> str:
+    opening = "".join(f"branch x < {level + 1} then {{\n" for level in range(depth))
+    return f"seed x = 0\n{opening}x = x + 1\n" + "}\n" * depth + "print x\n"
+
+
+def nested_loops(depth: int) -> str:
+    opening = "".join(f"grow while i < {level + 1} {{\n" for level in range(depth))
+    return f"seed i = 0\n{opening}i = i + 1\n" + "}\n" * depth + "print i\n"
+
+
+def nested_parentheses(depth: int) -> str:
+    return "seed x = 1\nprint " + "x - (" * depth + "x" + ")" * depth + "\n"
+
+
+class DeepNestingTest(unittest.TestCase):
+    def test_deep_nesting_on_every_engine(self):
+        with open(os.path.join(TESTS_DIR, "13_deep_nesting.arbor")) as file:
+            code = file.read()
+        with open(os.path.join(TESTS_DIR, "13_deep_nesting.out")) as file:
+            expected = file.read()
+        for engine in main.ENGINES:
+            for opt_level in (0, 1):
+                result = main.Interpreter(engine, opt_level).run(code)
+                self.assertIsNone(result.error, f"{engine} -O{opt_level}")
+                self.assertEqual(result.output, expected, f"{engine} -O{opt_level}")
+
+    def assertTooDeep(self, code: str, engines: list):
+        # O motor tree executa qualquer profundidade; os compilados recusam antes de compilar
+        self.assertIsNone(main.Interpreter("tree").run(code).error)
+        for engine in engines:
+            error = main.Interpreter(engine).run(code).error
+            self.assertIsNotNone(error, engine)
+            self.assertTrue(error.startswith(f"ValueError: Programa aninhado demais para o motor {engine} "), error)
+
+    def test_tree_height_limit(self):
+        self.assertTooDeep(nested_branches(main.MAX_COMPILED_HEIGHT // 2), COMPILED_ENGINES)
+
+    def test_python_indentation_limit(self):
+        # O corpo de run soma um nível de indentação a cada branch
+        self.assertTooDeep(nested_branches(main.MAX_PYTHON_INDENT), ["python"])
+        self.assertIsNone(main.Interpreter("python").run(nested_branches(main.MAX_PYTHON_INDENT - 1)).error)
+
+    def test_python_loop_limit(self):
+        self.assertTooDeep(nested_loops(main.MAX_PYTHON_LOOPS + 1), ["python"])
+        self.assertIsNone(main.Interpreter("python").run(nested_loops(main.MAX_PYTHON_LOOPS)).error)
+
+    def test_python_parentheses_limit(self):
+        self.assertTooDeep(nested_parentheses(250), ["python"])
+
+
+if __name__ == "__main__":
+    unittest.main()